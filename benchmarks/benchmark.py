@@ -0,0 +1,240 @@
+"""
+Benchmark of the acquire and release hot path of the concurrency limit context managers under contention.
+
+Each scenario runs a number of workers, i.e. threads, processes or asyncio tasks, acquiring and releasing execution
+slots of a single key in a loop, for each combination of the given limits, scope durations and worker counts. The
+acquires per second, the p50 and p99 wait times and the Redis commands per acquire are printed and saved as JSON,
+which can be compared against the JSON of an earlier run.
+
+Run against a local Redis server:
+
+    python benchmarks/benchmark.py --url redis://localhost:6379/0 --output results.json
+
+Run against an in-memory fake Redis server, which requires `fakeredis` and `lupa`, and supports no processes:
+
+    python benchmarks/benchmark.py --modes threads,asyncio --output results.json
+
+Compare against an earlier run, failing if the throughput dropped by more than 10 percent:
+
+    python benchmarks/benchmark.py --url redis://localhost:6379/0 --baseline results.json --tolerance 0.1
+
+The command counts of a Redis server are taken from `INFO commandstats`, so other clients of the server skew them.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import uuid
+
+import redis
+
+import concurrency_limit
+from concurrency_limit._load import *
+
+
+def _floats(value: str) -> list:
+    return [float(item) for item in value.split(",")]
+
+
+def _ints(value: str) -> list:
+    return [int(item) for item in value.split(",")]
+
+
+def _strings(value: str) -> list:
+    return value.split(",")
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the acquire and release hot path under contention."
+    )
+    parser.add_argument("--url", help="Redis URL, defaults to an in-memory fake Redis")
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Benchmark the host-local LocalConfiguration instead of Redis",
+    )
+    parser.add_argument("--modes", type=_strings, default=["threads", "asyncio"])
+    parser.add_argument("--limits", type=_ints, default=[1, 8])
+    parser.add_argument("--workers", type=_ints, default=[8, 32])
+    parser.add_argument("--scope-durations", type=_floats, default=[0.0, 0.001])
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--storage", choices=["hash", "zset"], default="hash")
+    parser.add_argument("--notify", action="store_true")
+    parser.add_argument("--output", help="Path of the JSON results")
+    parser.add_argument("--baseline", help="Path of the JSON results to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative drop of acquires per second treated as a regression",
+    )
+
+    return parser.parse_args(argv)
+
+
+class _CommandCounter:
+    """
+    Counts the commands executed by a Redis server or by the in-memory fake clients of a scenario.
+    """
+
+    def __init__(self, url: str = None):
+        self.client = redis.Redis.from_url(url) if url else None
+        self.counter = itertools.count()
+        self.start = 0
+
+    def begin(self):
+        self.start = self._read()
+
+    def end(self) -> int:
+        # The `INFO` command, or the counter increment, of `begin` is counted as well.
+        return self._read() - self.start - 1
+
+    def _read(self) -> int:
+        if self.client is None:
+            return next(self.counter)
+
+        return sum(
+            stats["calls"] for stats in self.client.info("commandstats").values()
+        )
+
+
+def _get_configuration(args: argparse.Namespace, mode: str, counter: _CommandCounter):
+    if args.local:
+        return concurrency_limit.LocalConfiguration()
+
+    if args.url:
+        return concurrency_limit.RedisConfiguration.from_url(args.url)
+
+    if mode == "processes":
+        raise ValueError("The in-memory fake Redis does not support processes")
+
+    import fakeredis
+
+    if mode == "asyncio":
+
+        class _AsyncRedis(fakeredis.FakeAsyncRedis):
+            async def execute_command(self, *args, **kwargs):
+                next(counter.counter)
+                return await super().execute_command(*args, **kwargs)
+
+        return concurrency_limit.AsyncRedisBackend(_AsyncRedis())
+
+    class _Redis(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            next(counter.counter)
+            return super().execute_command(*args, **kwargs)
+
+    return concurrency_limit.RedisBackend(_Redis())
+
+
+def _run_scenario(
+    args: argparse.Namespace, mode: str, limit: int, scope_duration: float, workers: int
+) -> dict:
+    counter = _CommandCounter(None if args.local else args.url)
+    configuration = _get_configuration(args, mode, counter)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key=f"benchmark:{uuid.uuid4()}",
+        limit=limit,
+        limit_timeout=max(args.duration * 10, 10),
+        limit_interval=0.001,
+        limit_storage=args.storage,
+        limit_notify=args.notify,
+    )
+
+    counter.begin()
+    result = run_load(
+        configuration,
+        limit_configuration,
+        workers=workers,
+        duration=args.duration,
+        scope_duration=scope_duration,
+        mode=mode,
+    )
+    commands = None if args.local else counter.end()
+    result["commands_per_acquire"] = (
+        commands / result["acquires"] if commands and result["acquires"] else None
+    )
+
+    return result
+
+
+def _scenario_key(result: dict) -> tuple:
+    return result["mode"], result["limit"], result["scope_duration"], result["workers"]
+
+
+def _format(value, pattern: str) -> str:
+    return "-" if value is None else pattern.format(value)
+
+
+def _print_result(result: dict, baseline: dict = None):
+    line = (
+        f"{result['mode']:>9} limit={result['limit']:<4} "
+        f"scope={result['scope_duration'] * 1000:<6g}ms workers={result['workers']:<4} "
+        f"{result['acquires_per_second']:>10.1f} acquires/s  "
+        f"p50={_format(result['wait_p50'] and result['wait_p50'] * 1000, '{:.3f}')}ms  "
+        f"p99={_format(result['wait_p99'] and result['wait_p99'] * 1000, '{:.3f}')}ms  "
+        f"commands/acquire={_format(result['commands_per_acquire'], '{:.2f}')}"
+    )
+
+    if baseline is not None and baseline["acquires_per_second"]:
+        change = result["acquires_per_second"] / baseline["acquires_per_second"] - 1
+        line += f"  ({change:+.1%} vs. baseline)"
+
+    print(line, flush=True)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    baseline = {}
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = {
+                _scenario_key(result): result for result in json.load(fh)["results"]
+            }
+
+    results = []
+    regressions = []
+
+    for mode, limit, scope_duration, workers in itertools.product(
+        args.modes, args.limits, args.scope_durations, args.workers
+    ):
+        result = _run_scenario(args, mode, limit, scope_duration, workers)
+        previous = baseline.get(_scenario_key(result))
+        _print_result(result, previous)
+        results.append(result)
+
+        if previous is not None and result["acquires_per_second"] < previous[
+            "acquires_per_second"
+        ] * (1 - args.tolerance):
+            regressions.append(result)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(
+                {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "python": platform.python_version(),
+                    "redis": "local" if args.local else args.url or "fakeredis",
+                    "storage": args.storage,
+                    "notify": args.notify,
+                    "duration": args.duration,
+                    "results": results,
+                },
+                fh,
+                indent=2,
+            )
+
+    if regressions:
+        print(f"{len(regressions)} scenarios regressed", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,8 @@
+from .backends import *
 from .configuration import *
 from .context_managers import *
+from .decorators import *
 from .exceptions import *
+from .executors import *
+from .metrics import *
 from .utils import *
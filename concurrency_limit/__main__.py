@@ -0,0 +1,178 @@
+"""
+Command line tool for inspecting, cleaning and load testing concurrency limits on a Redis server.
+
+    python -m concurrency_limit --url redis://localhost:6379/0 list 'tenant:*'
+    python -m concurrency_limit --url redis://localhost:6379/0 holders tenant:1
+    python -m concurrency_limit --url redis://localhost:6379/0 clean 'tenant:*'
+    python -m concurrency_limit --url redis://localhost:6379/0 load tenant:1 --limit 5 --workers 20
+"""
+
+import argparse
+import os
+import sys
+import time
+import typing
+
+import redis
+
+from ._connections import *
+from ._load import *
+from .configuration import *
+from .utils import *
+
+_DEFAULT_URL = "redis://localhost:6379/0"
+"Redis URL used if neither `--url` nor the `CONCURRENCY_LIMIT_URL` environment variable is given."
+
+
+def _parse_args(argv: typing.Optional[typing.Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m concurrency_limit",
+        description="Inspect, clean and load test concurrency limits.",
+    )
+    parser.add_argument(
+        "--url",
+        default=os.environ.get("CONCURRENCY_LIMIT_URL", _DEFAULT_URL),
+        help="Redis URL, defaults to the CONCURRENCY_LIMIT_URL environment variable or %(default)s",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "list", help="List the keys matching a pattern with their slot counts"
+    )
+    command.add_argument("pattern", nargs="?", default="*")
+    command.add_argument("--batch-size", type=int, default=1000)
+
+    command = commands.add_parser(
+        "holders", help="Show the execution slots held on a key"
+    )
+    command.add_argument("key")
+
+    command = commands.add_parser(
+        "clean", help="Clean the stale execution slots of the keys matching a pattern"
+    )
+    command.add_argument("pattern")
+    command.add_argument("--storage", choices=["hash", "zset"], default="hash")
+
+    command = commands.add_parser(
+        "load", help="Hammer a key with concurrent workers and report the throughput"
+    )
+    command.add_argument("key")
+    command.add_argument("--limit", type=int, required=True)
+    command.add_argument("--workers", type=int, default=10)
+    command.add_argument("--duration", type=float, default=10.0)
+    command.add_argument("--scope-duration", type=float, default=0.0)
+    command.add_argument("--timeout", type=float, default=10.0)
+    command.add_argument("--mode", choices=LOAD_MODES, default="threads")
+    command.add_argument("--storage", choices=["hash", "zset"], default="hash")
+    command.add_argument("--notify", action="store_true")
+
+    return parser.parse_args(argv)
+
+
+def _list(configuration: RedisConfiguration, args: argparse.Namespace):
+    print(f"{'KEY':<40} {'COUNT':>8} {'STALE':>8}  NEXT EXPIRY")
+
+    for stats in limit_stats(configuration, args.pattern, args.batch_size):
+        expiry = (
+            _format_time(stats.oldest_expire)
+            if stats.oldest_expire is not None
+            else "-"
+        )
+        print(f"{stats.key:<40} {stats.count:>8} {stats.stale:>8}  {expiry}")
+
+
+def _holders(configuration: RedisConfiguration, args: argparse.Namespace):
+    client = get_redis(configuration)
+    current = time.time()
+
+    if client.type(args.key) in ("zset", b"zset"):
+        holders = client.zrange(args.key, 0, -1, withscores=True)
+    else:
+        holders = list(client.hscan_iter(args.key))
+
+    print(f"{'SLOT':<40} {'EXPIRY':<20} {'TTL':>8}")
+
+    for lock_id, lock_expire in sorted(holders, key=lambda item: _to_float(item[1])):
+        lock_expire = _to_float(lock_expire)
+        ttl = lock_expire - current
+        state = f"{ttl:>7.0f}s" if ttl > 0 else "   stale"
+
+        print(f"{_decode(lock_id):<40} {_format_time(lock_expire):<20} {state}")
+
+
+def _clean(configuration: RedisConfiguration, args: argparse.Namespace):
+    counts = limit_clean_many(configuration, args.pattern, args.storage)
+
+    for key, count in counts.items():
+        if count:
+            print(f"{_decode(key)}: {count}")
+
+    print(f"Cleaned {sum(counts.values())} execution slots of {len(counts)} keys")
+
+
+def _load(configuration: RedisConfiguration, args: argparse.Namespace):
+    result = run_load(
+        configuration,
+        LimitConfiguration(
+            key=args.key,
+            limit=args.limit,
+            limit_timeout=args.timeout,
+            limit_interval=0.001,
+            limit_storage=args.storage,
+            limit_notify=args.notify,
+        ),
+        workers=args.workers,
+        duration=args.duration,
+        scope_duration=args.scope_duration,
+        mode=args.mode,
+    )
+
+    print(f"Acquires:    {result['acquires']} ({result['acquires_per_second']:.1f}/s)")
+    print(f"Rejections:  {result['rejections']}")
+    print(f"Errors:      {result['errors']}")
+
+    for name in ("wait_p50", "wait_p99", "wait_max"):
+        value = result[name]
+        label = f"Wait {name[5:]}:"
+        print(f"{label:<12} {'-' if value is None else f'{value * 1000:.3f}ms'}")
+
+
+_COMMANDS = {"list": _list, "holders": _holders, "clean": _clean, "load": _load}
+
+
+def _decode(value: typing.Union[str, bytes]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    """
+    Runs the command line tool.
+
+    :param argv: Command line arguments, defaults to the arguments of the process
+    :return: Exit code
+    """
+    args = _parse_args(argv)
+    configuration = RedisConfiguration.from_url(args.url)
+
+    try:
+        _COMMANDS[args.command](configuration, args)
+    except redis.RedisError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import dataclasses
+import threading
+import time
+import weakref
+
+import redis
+import redis.asyncio
+
+from ._scripts import *
+from .configuration import *
+
+__all__ = [
+    "get_adaptive_configuration",
+    "refresh_adaptive_configuration",
+    "async_refresh_adaptive_configuration",
+    "adapt",
+    "async_adapt",
+]
+
+_adaptive_map = weakref.WeakKeyDictionary()
+_adaptive_lock = threading.Lock()
+
+
+def get_adaptive_configuration(
+    client: redis.Redis, limit_configuration: LimitConfiguration
+) -> LimitConfiguration:
+    """
+    Gets the limit configuration with the adjusted limit if `limit_adaptive` is set. The process keeps the adjusted
+    limit returned by the last adjustment or refresh per client and key, so acquiring an execution slot costs no extra
+    round trip. Until the first scope of the process finished or was rejected, the `limit` of the limit configuration
+    applies. Prefetching is not applied, as reserved execution slots would outlast a cut of the limit.
+
+    :param client: Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: Limit configuration with the adjusted limit
+    """
+    global _adaptive_map
+    global _adaptive_lock
+
+    if limit_configuration.limit_adaptive is None:
+        return limit_configuration
+
+    with _adaptive_lock:
+        limit = _adaptive_map.get(client, {}).get(
+            limit_configuration.key, limit_configuration.limit
+        )
+
+    return _replace(limit_configuration, limit)
+
+
+def refresh_adaptive_configuration(
+    client: redis.Redis, limit_configuration: LimitConfiguration
+) -> LimitConfiguration:
+    """
+    Reads the limit adjusted by all processes from Redis if `limit_adaptive` is set. Processes whose scopes are
+    rejected do not adjust the limit themselves, so they refresh it to pick up the cuts of the other processes.
+    Connection errors are ignored, and the limit kept by the process applies until the next refresh.
+
+    :param client: Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: Limit configuration with the adjusted limit
+    """
+    if limit_configuration.limit_adaptive is None:
+        return limit_configuration
+
+    count_commands()
+
+    try:
+        limit = client.hget(limit_configuration.get_adaptive_key(), "limit")
+    except redis.RedisError:
+        return limit_configuration
+
+    return _refresh(client, limit_configuration, limit)
+
+
+async def async_refresh_adaptive_configuration(
+    client: redis.asyncio.Redis, limit_configuration: LimitConfiguration
+) -> LimitConfiguration:
+    """
+    Reads the limit adjusted by all processes from Redis like `refresh_adaptive_configuration`, using an asyncio Redis
+    client.
+
+    :param client: asyncio Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: Limit configuration with the adjusted limit
+    """
+    if limit_configuration.limit_adaptive is None:
+        return limit_configuration
+
+    count_commands()
+
+    try:
+        limit = await client.hget(limit_configuration.get_adaptive_key(), "limit")
+    except redis.RedisError:
+        return limit_configuration
+
+    return _refresh(client, limit_configuration, limit)
+
+
+def adapt(
+    client: redis.Redis,
+    limit_configuration: LimitConfiguration,
+    duration: float,
+    failed: bool,
+):
+    """
+    Adjusts the adaptive limit by the outcome of a scope using a single atomic script. Connection errors are ignored,
+    as the limit is adjusted again by the next scopes.
+
+    :param client: Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param duration: Duration of the scope in seconds
+    :param failed: Whether the scope raised an exception
+    """
+    try:
+        limit = get_script(client, ADAPT_SCRIPT)(
+            keys=[limit_configuration.get_adaptive_key()],
+            args=_adapt_args(limit_configuration, duration, failed),
+        )
+    except redis.RedisError:
+        return
+
+    _store(client, limit_configuration, limit)
+
+
+async def async_adapt(
+    client: redis.asyncio.Redis,
+    limit_configuration: LimitConfiguration,
+    duration: float,
+    failed: bool,
+):
+    """
+    Adjusts the adaptive limit by the outcome of a scope like `adapt`, using an asyncio Redis client.
+
+    :param client: asyncio Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param duration: Duration of the scope in seconds
+    :param failed: Whether the scope raised an exception
+    """
+    try:
+        limit = await get_script(client, ADAPT_SCRIPT)(
+            keys=[limit_configuration.get_adaptive_key()],
+            args=_adapt_args(limit_configuration, duration, failed),
+        )
+    except redis.RedisError:
+        return
+
+    _store(client, limit_configuration, limit)
+
+
+def _adapt_args(
+    limit_configuration: LimitConfiguration, duration: float, failed: bool
+) -> list:
+    adaptive = limit_configuration.limit_adaptive
+
+    return [
+        limit_configuration.limit,
+        adaptive.min_limit,
+        (
+            limit_configuration.limit
+            if adaptive.max_limit is None
+            else adaptive.max_limit
+        ),
+        adaptive.increase,
+        adaptive.decrease,
+        adaptive.latency_tolerance or 0,
+        adaptive.smoothing,
+        adaptive.expire,
+        time.time(),
+        duration,
+        int(failed),
+    ]
+
+
+def _refresh(
+    client, limit_configuration: LimitConfiguration, limit
+) -> LimitConfiguration:
+    # The adaptive key expires once no scope finished for a while, and the limit kept by the process applies then.
+    if limit is None:
+        return limit_configuration
+
+    return _replace(limit_configuration, _store(client, limit_configuration, limit))
+
+
+def _replace(limit_configuration: LimitConfiguration, limit: int) -> LimitConfiguration:
+    # The limit is not cut below the `limit_weight`, as a scope consuming more execution slots would never run.
+    return dataclasses.replace(
+        limit_configuration,
+        limit=max(limit, limit_configuration.limit_weight),
+        limit_prefetch=0,
+    )
+
+
+def _store(client, limit_configuration: LimitConfiguration, limit) -> int:
+    global _adaptive_map
+    global _adaptive_lock
+
+    limit = max(int(float(limit)), limit_configuration.limit_adaptive.min_limit, 1)
+
+    with _adaptive_lock:
+        _adaptive_map.setdefault(client, {})[limit_configuration.key] = limit
+
+    return limit
@@ -0,0 +1,302 @@
+import threading
+import time
+import typing
+
+import redis
+
+from ._connections import *
+from ._slots import *
+from .configuration import *
+from .exceptions import *
+
+__all__ = ["Circuit", "CircuitSlots", "AsyncCircuitSlots", "get_circuit"]
+
+_circuit_map = {}
+_circuit_lock = threading.Lock()
+
+
+class Circuit:
+    """
+    Circuit breaker state of a Redis configuration in the process. The circuit counts consecutive failed or slow
+    calls, and opens once they reach the `failure_threshold`. While the circuit is open, a background thread probes
+    Redis using `PING` every `reset_timeout` seconds, and closes the circuit once Redis responds in time. Meanwhile,
+    the execution slots are counted by the process, up to the local limit of each key.
+    """
+
+    def __init__(self, configuration: RedisConfiguration):
+        self.configuration = configuration
+        self.circuit_breaker = configuration.circuit_breaker
+
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._failures = 0
+        self._open = False
+        self._thread = None
+        self._local_slots = {}
+
+    def is_open(self) -> bool:
+        """
+        Checks whether the circuit is open, i.e. Redis is not called.
+
+        :return: True if the circuit is open
+        """
+        return self._open
+
+    def record(self, duration: float, failed: bool = False):
+        """
+        Records the outcome of a call to Redis.
+
+        :param duration: Duration of the call in seconds
+        :param failed: Whether the call raised an error
+        """
+        failed = failed or self._is_slow(duration)
+
+        with self._lock:
+            if not failed:
+                self._failures = 0
+                return
+
+            self._failures += 1
+
+            if self._open or self._failures < self.circuit_breaker.failure_threshold:
+                return
+
+            self._open = True
+            self._event.clear()
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="concurrency-limit-circuit", daemon=True
+                )
+                self._thread.start()
+
+    def get_exception(self) -> ConcurrencyLimitUnavailableException:
+        """
+        Returns the exception raised by fast-failing scopes while the circuit is open.
+
+        :return: Exception
+        """
+        return ConcurrencyLimitUnavailableException(failures=self._failures)
+
+    def acquire_local(
+        self, limit_configurations: typing.Sequence[LimitConfiguration], lock_ids: list
+    ) -> list:
+        """
+        Tries to acquire execution slots of the process on all concurrency limit keys, either on all of them or on
+        none. Each key acquires as many of the slot ids as its `limit_weight`, up to its local limit.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        :param lock_ids: Slot ids to acquire
+        :return: List of the number of acquired slots of each key, or an empty list if any limit is exceeded
+        """
+        with self._lock:
+            for configuration in limit_configurations:
+                slots = self._local_slots.get(configuration.key, ())
+
+                if len(slots) + configuration.limit_weight > (
+                    self.circuit_breaker.get_local_limit(configuration.limit)
+                ):
+                    return []
+
+            counts = []
+
+            for configuration in limit_configurations:
+                slots = self._local_slots.setdefault(configuration.key, set())
+                slots.update(lock_ids[: configuration.limit_weight])
+                counts.append(len(slots))
+
+            return counts
+
+    def release_local(
+        self, limit_configurations: typing.Sequence[LimitConfiguration], lock_ids: tuple
+    ):
+        """
+        Releases execution slots of the process.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        :param lock_ids: Slot ids to release
+        """
+        with self._lock:
+            for configuration in limit_configurations:
+                slots = self._local_slots.get(configuration.key)
+
+                if slots is None:
+                    continue
+
+                slots.difference_update(lock_ids)
+
+                if not slots:
+                    del self._local_slots[configuration.key]
+
+    def _is_slow(self, duration: float) -> bool:
+        slow_call_duration = self.circuit_breaker.slow_call_duration
+
+        return slow_call_duration is not None and duration > slow_call_duration
+
+    def _run(self):
+        client = get_redis(self.configuration)
+
+        while not self._event.wait(self.circuit_breaker.reset_timeout):
+            start = time.monotonic()
+
+            try:
+                client.ping()
+            except redis.RedisError:
+                continue
+
+            if self._is_slow(time.monotonic() - start):
+                continue
+
+            with self._lock:
+                self._failures = 0
+                self._open = False
+                self._thread = None
+                return
+
+
+class CircuitSlots:
+    """
+    Execution slots guarded by a circuit breaker. While the circuit is closed, the calls are passed to the wrapped
+    execution slots on Redis and their outcome is recorded. While it is open, the execution slots are acquired on the
+    process, or a `ConcurrencyLimitUnavailableException` is raised if the circuit breaker fails fast.
+    """
+
+    def __init__(self, circuit: Circuit, slots):
+        self.circuit = circuit
+        self.slots = slots
+        self.limit_configurations = getattr(
+            slots, "limit_configurations", (slots.limit_configuration,)
+        )
+        self.local = False
+
+    @property
+    def limit_configuration(self) -> LimitConfiguration:
+        return self.slots.limit_configuration
+
+    def acquire(self, lock_ids: list) -> tuple:
+        if self.circuit.is_open():
+            return self._acquire_local(lock_ids)
+
+        start = time.monotonic()
+
+        try:
+            result = self.slots.acquire(lock_ids)
+        except redis.RedisError as exc:
+            self.circuit.record(time.monotonic() - start, failed=True)
+
+            if not self.circuit.is_open():
+                raise
+
+            return self._acquire_local(lock_ids, exc)
+
+        self.circuit.record(time.monotonic() - start)
+        self.local = False
+
+        return result
+
+    def release(self, *lock_ids: str):
+        if self.local:
+            self.circuit.release_local(self.limit_configurations, lock_ids)
+            return
+
+        # Execution slots that cannot be released on Redis are freed by their expiry. Execution slots reserved by a
+        # slot pool still go back to it, so the pool does not count them as in use anymore.
+        if self.circuit.is_open():
+            if isinstance(self.slots, (SlotPool, AsyncSlotPool)):
+                self.slots.put(*lock_ids)
+
+            return
+
+        start = time.monotonic()
+
+        try:
+            self.slots.release(*lock_ids)
+        except redis.RedisError:
+            self.circuit.record(time.monotonic() - start, failed=True)
+            return
+
+        self.circuit.record(time.monotonic() - start)
+
+    def items(self, lock_ids: list) -> list:
+        # Execution slots of the process are not renewed, as they do not expire.
+        return [] if self.local else self.slots.items(lock_ids)
+
+    def _acquire_local(self, lock_ids: list, exc: Exception = None) -> tuple:
+        if self.circuit.circuit_breaker.fallback == "fail":
+            raise self.circuit.get_exception() from exc
+
+        counts = self.circuit.acquire_local(self.limit_configurations, lock_ids)
+        self.local = bool(counts)
+
+        if not counts:
+            return 0, lock_ids
+
+        if len(self.limit_configurations) == 1:
+            return counts[0], lock_ids
+
+        return tuple(counts), lock_ids
+
+
+class AsyncCircuitSlots(CircuitSlots):
+    """
+    Execution slots guarded by a circuit breaker for the asyncio context managers, wrapping asyncio execution slots.
+    """
+
+    async def acquire(self, lock_ids: list) -> tuple:
+        if self.circuit.is_open():
+            return self._acquire_local(lock_ids)
+
+        start = time.monotonic()
+
+        try:
+            result = await self.slots.acquire(lock_ids)
+        except redis.RedisError as exc:
+            self.circuit.record(time.monotonic() - start, failed=True)
+
+            if not self.circuit.is_open():
+                raise
+
+            return self._acquire_local(lock_ids, exc)
+
+        self.circuit.record(time.monotonic() - start)
+        self.local = False
+
+        return result
+
+    async def release(self, *lock_ids: str):
+        if self.local:
+            self.circuit.release_local(self.limit_configurations, lock_ids)
+            return
+
+        if self.circuit.is_open():
+            if isinstance(self.slots, (SlotPool, AsyncSlotPool)):
+                self.slots.put(*lock_ids)
+
+            return
+
+        start = time.monotonic()
+
+        try:
+            await self.slots.release(*lock_ids)
+        except redis.RedisError:
+            self.circuit.record(time.monotonic() - start, failed=True)
+            return
+
+        self.circuit.record(time.monotonic() - start)
+
+
+def get_circuit(configuration: RedisConfiguration) -> Circuit:
+    """
+    Gets the circuit breaker state of a Redis configuration in the process.
+
+    :param configuration: Redis configuration with a `circuit_breaker`
+    :return: Circuit
+    """
+    global _circuit_map
+    global _circuit_lock
+
+    with _circuit_lock:
+        if configuration not in _circuit_map:
+            _circuit_map[configuration] = Circuit(configuration)
+
+        return _circuit_map[configuration]
@@ -2,19 +2,52 @@ import functools
 import threading
 
 import redis
+import redis.asyncio
+import redis.asyncio.cluster
+import redis.asyncio.sentinel
+import redis.cluster
+import redis.sentinel
 
 from .configuration import *
 
-__all__ = ["get_redis"]
+__all__ = ["MAX_CONNECTIONS_ERROR", "get_redis", "get_cached_redis", "get_async_redis"]
+
+MAX_CONNECTIONS_ERROR = getattr(redis.exceptions, "MaxConnectionsError", ())
+"""
+Error raised by clients without a blocking connection pool, i.e. Redis Cluster clients, once all of their connections
+are in use. Versions of redis-py without it raise a plain connection error, which is not translated.
+"""
 
 _connection_pool_map = {}
 _connection_pool_lock = threading.Lock()
 
+_async_connection_pool_map = {}
+_async_connection_pool_lock = threading.Lock()
+
+
+class _BlockingSentinelConnectionPool(
+    redis.sentinel.SentinelConnectionPool, redis.BlockingConnectionPool
+):
+    """
+    Connection pool of the master monitored by Redis Sentinel, which waits for a free connection once all connections
+    are in use instead of raising an error.
+    """
+
+
+class _AsyncBlockingSentinelConnectionPool(
+    redis.asyncio.sentinel.SentinelConnectionPool, redis.asyncio.BlockingConnectionPool
+):
+    """
+    Asyncio connection pool of the master monitored by Redis Sentinel, which waits for a free connection once all
+    connections are in use instead of raising an error.
+    """
+
 
 @functools.cache
 def get_redis(configuration: RedisConfiguration) -> redis.Redis:
     """
-    Gets the Redis client used to store the concurrency keys.
+    Gets the Redis client used to store the concurrency keys. Depending on the configuration, this is a client of a
+    single Redis server, a Redis Cluster client, or a client of the master monitored by Redis Sentinel.
 
     :param configuration: Redis connection configuration
     :return: Redis client
@@ -22,6 +55,12 @@ def get_redis(configuration: RedisConfiguration) -> redis.Redis:
     if configuration.connection_pool:
         return _get_redis_by_connection_pool(configuration)
 
+    elif configuration.cluster_nodes:
+        return _get_redis_cluster(configuration)
+
+    elif configuration.sentinels:
+        return _get_redis_by_sentinel(configuration)
+
     else:
         return _get_redis_by_credentials(configuration)
 
@@ -40,21 +79,128 @@ def _get_redis_by_credentials(configuration: RedisConfiguration) -> redis.Redis:
 
     with _connection_pool_lock:
         if configuration not in _connection_pool_map:
+            connection_class = configuration.get_connection_class()
+
+            # Unix domain socket connections take a path, and the other connections a host and port.
+            if issubclass(connection_class, redis.UnixDomainSocketConnection):
+                address = {"path": configuration.path}
+            else:
+                address = {"host": configuration.host, "port": configuration.port}
+
             _connection_pool_map[configuration] = redis.BlockingConnectionPool(
-                host=configuration.host,
-                port=configuration.port,
-                path=configuration.path,
+                **address,
                 db=configuration.db,
                 username=configuration.username,
                 password=configuration.password,
                 max_connections=configuration.max_connections,
                 timeout=configuration.timeout,
-                connection_class=configuration.get_connection_class(),
+                connection_class=connection_class,
+                **configuration.get_socket_timeouts(),
             )
 
         return redis.Redis(connection_pool=_connection_pool_map[configuration])
 
 
+@functools.cache
+def get_cached_redis(configuration: RedisConfiguration) -> redis.Redis:
+    """
+    Gets the Redis client used to read the concurrency keys with client-side caching. The client uses RESP3 and keeps
+    the replies of read commands in memory until the Redis server invalidates them, as the keys change. Client-side
+    caching is supported for connections by credentials with `redis-py` 5.3 or newer, in all other cases the client of
+    `get_redis` is returned.
+
+    :param configuration: Redis connection configuration
+    :return: Redis client
+    """
+    try:
+        from redis.cache import CacheConfig
+    except ImportError:  # pragma: no cover
+        return get_redis(configuration)
+
+    if (
+        configuration.connection_pool
+        or configuration.cluster_nodes
+        or configuration.sentinels
+    ):
+        return get_redis(configuration)
+
+    connection_class = configuration.get_connection_class()
+
+    if issubclass(connection_class, redis.UnixDomainSocketConnection):
+        address = {"path": configuration.path}
+    else:
+        address = {"host": configuration.host, "port": configuration.port}
+
+    # The pool is only used by this client, which is cached per configuration, so it needs no further caching.
+    return redis.Redis(
+        connection_pool=redis.BlockingConnectionPool(
+            **address,
+            db=configuration.db,
+            username=configuration.username,
+            password=configuration.password,
+            max_connections=configuration.max_connections,
+            timeout=configuration.timeout,
+            connection_class=connection_class,
+            protocol=3,
+            cache_config=CacheConfig(),
+            **configuration.get_socket_timeouts(),
+        )
+    )
+
+
+def _get_redis_cluster(configuration: RedisConfiguration) -> redis.cluster.RedisCluster:
+    """
+    Gets the Redis Cluster client used to store the concurrency keys using the seed nodes on the configuration object.
+    The client discovers the other nodes of the cluster, and routes each command and script to the node serving its
+    keys. Cluster clients have no blocking connection pool, so `timeout` limits connecting to a node instead, and
+    attempts made while all `max_connections` connections to a node are in use count as rejected.
+
+    :param configuration: Redis connection configuration
+    :return: Redis Cluster client
+    """
+    return redis.cluster.RedisCluster(
+        startup_nodes=[
+            redis.cluster.ClusterNode(host, port)
+            for host, port in configuration.cluster_nodes
+        ],
+        username=configuration.username,
+        password=configuration.password,
+        max_connections=configuration.max_connections,
+        ssl=configuration.secure,
+        **{
+            "socket_connect_timeout": configuration.timeout,
+            **configuration.get_socket_timeouts(),
+        },
+    )
+
+
+def _get_redis_by_sentinel(configuration: RedisConfiguration) -> redis.Redis:
+    """
+    Gets the Redis client used to store the concurrency keys using the master monitored by the Redis Sentinel nodes
+    on the configuration object. The client follows the master on failovers, and waits up to `timeout` for a free
+    connection once `max_connections` connections are in use.
+
+    :param configuration: Redis connection configuration
+    :return: Redis client
+    """
+    sentinel = redis.sentinel.Sentinel(
+        list(configuration.sentinels),
+        sentinel_kwargs=configuration.get_socket_timeouts(),
+    )
+
+    return sentinel.master_for(
+        configuration.sentinel_master,
+        db=configuration.db,
+        username=configuration.username,
+        password=configuration.password,
+        max_connections=configuration.max_connections,
+        timeout=configuration.timeout,
+        ssl=configuration.secure,
+        connection_pool_class=_BlockingSentinelConnectionPool,
+        **configuration.get_socket_timeouts(),
+    )
+
+
 def _get_redis_by_connection_pool(configuration: RedisConfiguration) -> redis.Redis:
     """
     Gets the Redis client used to store the concurrency keys using the connection pool on the configuration
@@ -64,3 +210,133 @@ def _get_redis_by_connection_pool(configuration: RedisConfiguration) -> redis.Re
     :return: Redis client
     """
     return redis.Redis(connection_pool=configuration.connection_pool)
+
+
+@functools.cache
+def get_async_redis(configuration: RedisConfiguration) -> redis.asyncio.Redis:
+    """
+    Gets the asyncio Redis client used to store the concurrency keys.
+
+    :param configuration: Redis connection configuration
+    :return: asyncio Redis client
+    """
+    if configuration.async_connection_pool:
+        return _get_async_redis_by_connection_pool(configuration)
+
+    elif configuration.cluster_nodes:
+        return _get_async_redis_cluster(configuration)
+
+    elif configuration.sentinels:
+        return _get_async_redis_by_sentinel(configuration)
+
+    else:
+        return _get_async_redis_by_credentials(configuration)
+
+
+def _get_async_redis_by_credentials(
+    configuration: RedisConfiguration,
+) -> redis.asyncio.Redis:
+    """
+    Gets the asyncio Redis client used to store the concurrency keys using the connection credentials on the
+    configuration object. This method creates an asyncio connection pool using the credentials, als will use this
+    connection pool for all subsequent calls of this method with the same configuration.
+
+    :param configuration: Redis connection configuration
+    :return: asyncio Redis client
+    """
+    global _async_connection_pool_map
+    global _async_connection_pool_lock
+
+    with _async_connection_pool_lock:
+        if configuration not in _async_connection_pool_map:
+            connection_class = configuration.get_async_connection_class()
+
+            if issubclass(connection_class, redis.asyncio.UnixDomainSocketConnection):
+                address = {"path": configuration.path}
+            else:
+                address = {"host": configuration.host, "port": configuration.port}
+
+            _async_connection_pool_map[configuration] = (
+                redis.asyncio.BlockingConnectionPool(
+                    **address,
+                    db=configuration.db,
+                    username=configuration.username,
+                    password=configuration.password,
+                    max_connections=configuration.max_connections,
+                    timeout=configuration.timeout,
+                    connection_class=connection_class,
+                    **configuration.get_socket_timeouts(),
+                )
+            )
+
+        return redis.asyncio.Redis(
+            connection_pool=_async_connection_pool_map[configuration]
+        )
+
+
+def _get_async_redis_cluster(
+    configuration: RedisConfiguration,
+) -> redis.asyncio.cluster.RedisCluster:
+    """
+    Gets the asyncio Redis Cluster client used to store the concurrency keys using the seed nodes on the
+    configuration object.
+
+    :param configuration: Redis connection configuration
+    :return: asyncio Redis Cluster client
+    """
+    # Like the synchronous client, attempts made while all connections to a node are in use count as rejected.
+    return redis.asyncio.cluster.RedisCluster(
+        startup_nodes=[
+            redis.asyncio.cluster.ClusterNode(host, port)
+            for host, port in configuration.cluster_nodes
+        ],
+        username=configuration.username,
+        password=configuration.password,
+        max_connections=configuration.max_connections,
+        ssl=configuration.secure,
+        **{
+            "socket_connect_timeout": configuration.timeout,
+            **configuration.get_socket_timeouts(),
+        },
+    )
+
+
+def _get_async_redis_by_sentinel(
+    configuration: RedisConfiguration,
+) -> redis.asyncio.Redis:
+    """
+    Gets the asyncio Redis client used to store the concurrency keys using the master monitored by the Redis Sentinel
+    nodes on the configuration object, using a blocking connection pool like the synchronous client.
+
+    :param configuration: Redis connection configuration
+    :return: asyncio Redis client
+    """
+    sentinel = redis.asyncio.sentinel.Sentinel(
+        list(configuration.sentinels),
+        sentinel_kwargs=configuration.get_socket_timeouts(),
+    )
+
+    return sentinel.master_for(
+        configuration.sentinel_master,
+        db=configuration.db,
+        username=configuration.username,
+        password=configuration.password,
+        max_connections=configuration.max_connections,
+        timeout=configuration.timeout,
+        ssl=configuration.secure,
+        connection_pool_class=_AsyncBlockingSentinelConnectionPool,
+        **configuration.get_socket_timeouts(),
+    )
+
+
+def _get_async_redis_by_connection_pool(
+    configuration: RedisConfiguration,
+) -> redis.asyncio.Redis:
+    """
+    Gets the asyncio Redis client used to store the concurrency keys using the asyncio connection pool on the
+    configuration object.
+
+    :param configuration: Redis connection configuration
+    :return: asyncio Redis client
+    """
+    return redis.asyncio.Redis(connection_pool=configuration.async_connection_pool)
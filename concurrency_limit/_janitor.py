@@ -0,0 +1,152 @@
+import collections
+import threading
+import time
+import typing
+
+import redis
+
+from .backends import *
+from .configuration import *
+
+__all__ = ["Janitor", "get_janitor"]
+
+_JANITOR_BUDGET = 100
+"Maximum number of keys cleaned per run of the janitor."
+
+_JANITOR_MIN_INTERVAL = 1.0
+"Shortest wait time between runs of the janitor, used while it keeps finding stale execution slots."
+
+_JANITOR_MAX_INTERVAL = 30.0
+"Longest wait time between runs of the janitor, used while it finds no stale execution slots."
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+class Janitor:
+    """
+    Background thread that cleans the stale execution slots of all keys used by the process with `limit_janitor` set,
+    so execution slots of crashed processes are reclaimed without scheduling `limit_clean`. Each run cleans up to
+    100 keys in a round robin, using a single pipeline per Redis server. The wait time between the runs is halved
+    whenever stale execution slots were found, and doubled otherwise, between one and thirty seconds. Keys are
+    forgotten once they were cleaned after the expire time of their last use, as all of their execution slots acquired
+    by the process have expired by then. The thread is started on demand and stops if there are no keys to clean.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._entries = collections.OrderedDict()
+        self._interval = _JANITOR_MIN_INTERVAL
+        self._thread = None
+
+    def track(
+        self,
+        configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+        limit_configuration: LimitConfiguration,
+    ):
+        """
+        Tracks a used key for cleaning. Tracking a key again postpones when it is forgotten.
+
+        :param configuration: RedisConfiguration, LocalConfiguration or Backend object the key is stored with.
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        """
+        with self._lock:
+            self._entries[(configuration, limit_configuration)] = (
+                time.monotonic() + limit_configuration.limit_expire
+            )
+
+            if self._thread is None:
+                self._interval = _JANITOR_MIN_INTERVAL
+                self._thread = threading.Thread(
+                    target=self._run, name="concurrency-limit-janitor", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._entries:
+                    self._thread = None
+                    return
+
+                self._condition.wait(timeout=self._interval)
+                due = self._pop_due()
+
+            stale = 0
+            for (configuration, limit_storage), entries in due.items():
+                stale += self._clean(configuration, limit_storage, entries)
+
+            with self._lock:
+                self._interval = _next_interval(self._interval, stale)
+
+    def _pop_due(self) -> dict:
+        """
+        Takes the next keys to clean in a round robin, and moves them to the end of the queue.
+
+        :return: Tracked keys to clean and the time after which they are forgotten, grouped by their backend
+            configuration and storage type
+        """
+        due = {}
+
+        for _ in range(min(_JANITOR_BUDGET, len(self._entries))):
+            entry, forget_at = self._entries.popitem(last=False)
+            self._entries[entry] = forget_at
+
+            configuration, limit_configuration = entry
+            due.setdefault(
+                (configuration, limit_configuration.limit_storage), []
+            ).append((limit_configuration, forget_at))
+
+        return due
+
+    def _clean(
+        self,
+        configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+        limit_storage: str,
+        entries: list,
+    ) -> int:
+        current = time.monotonic()
+
+        # Connection errors are ignored, as the keys are cleaned again by the next runs. Keys of backends that do not
+        # support cleaning are forgotten like any other key.
+        try:
+            counts = get_backend(configuration).clean_many(
+                [limit_configuration.key for limit_configuration, _ in entries],
+                limit_storage,
+            )
+        except (redis.RedisError, OSError, NotImplementedError):
+            counts = {}
+
+        with self._lock:
+            for limit_configuration, forget_at in entries:
+                entry = (configuration, limit_configuration)
+
+                # Keys used again meanwhile have a later time to forget them.
+                if forget_at <= current and self._entries.get(entry) == forget_at:
+                    del self._entries[entry]
+
+        return sum(counts.values())
+
+
+def _next_interval(interval: float, stale: int) -> float:
+    if stale:
+        return max(interval / 2, _JANITOR_MIN_INTERVAL)
+
+    return min(interval * 2, _JANITOR_MAX_INTERVAL)
+
+
+def get_janitor() -> Janitor:
+    """
+    Gets the janitor thread of the process.
+
+    :return: Janitor
+    """
+    global _janitor
+    global _janitor_lock
+
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = Janitor()
+
+        return _janitor
@@ -0,0 +1,154 @@
+import asyncio
+import math
+import multiprocessing
+import threading
+import time
+import typing
+
+from .backends import *
+from .configuration import *
+from .context_managers import *
+from .exceptions import *
+
+__all__ = ["run_load", "LOAD_MODES"]
+
+LOAD_MODES = ("threads", "processes", "asyncio")
+"Ways of running the workers of a load run."
+
+
+def run_load(
+    configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, Backend, AsyncBackend
+    ],
+    limit_configuration: LimitConfiguration,
+    workers: int,
+    duration: float,
+    scope_duration: float = 0.0,
+    mode: str = "threads",
+) -> dict:
+    """
+    Runs workers acquiring and releasing execution slots of a concurrency limit in a loop for the given duration, and
+    measures the throughput and the time waited for the execution slots. The workers are threads, processes or tasks
+    of an asyncio event loop, which requires an `AsyncBackend` if a backend is given. Processes require a picklable
+    configuration, i.e. a `RedisConfiguration` without connection pools or a `LocalConfiguration`.
+
+    :param configuration: Configuration or backend the workers acquire the execution slots with
+    :param limit_configuration: LimitConfiguration object of the concurrency limit under load
+    :param workers: Number of concurrent workers
+    :param duration: Duration of the run in seconds
+    :param scope_duration: Time each worker holds an execution slot in seconds
+    :param mode: `threads`, `processes` or `asyncio`
+    :return: Dictionary of the number of acquires, rejections and errors, the acquires per second, and the wait time
+        percentiles in seconds
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {LOAD_MODES}")
+
+    args = (configuration, limit_configuration, duration, scope_duration)
+    start = time.monotonic()
+
+    if mode == "threads":
+        results = [None] * workers
+        threads = [
+            threading.Thread(
+                target=lambda index: results.__setitem__(index, _work(*args)),
+                args=(index,),
+            )
+            for index in range(workers)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    elif mode == "processes":
+        with multiprocessing.get_context().Pool(workers) as pool:
+            results = pool.starmap(_work, [args] * workers)
+
+    else:
+
+        async def _main():
+            return await asyncio.gather(*(_awork(*args) for _ in range(workers)))
+
+        results = asyncio.run(_main())
+
+    elapsed = time.monotonic() - start
+    waits = sorted(wait for result in results for wait in result[0])
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "limit": limit_configuration.limit,
+        "scope_duration": scope_duration,
+        "elapsed": elapsed,
+        "acquires": len(waits),
+        "rejections": sum(result[1] for result in results),
+        "errors": sum(result[2] for result in results),
+        "acquires_per_second": len(waits) / elapsed,
+        "wait_p50": _percentile(waits, 0.5),
+        "wait_p99": _percentile(waits, 0.99),
+        "wait_max": waits[-1] if waits else None,
+    }
+
+
+def _work(
+    configuration, limit_configuration: LimitConfiguration, duration, scope_duration
+) -> tuple:
+    waits = []
+    rejections = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    while (start := time.monotonic()) < deadline:
+        try:
+            with limit(configuration, limit_configuration):
+                waits.append(time.monotonic() - start)
+
+                if scope_duration:
+                    time.sleep(scope_duration)
+
+        except ConcurrencyLimitExceededException:
+            rejections += 1
+        except Exception:
+            errors += 1
+
+    return waits, rejections, errors
+
+
+async def _awork(
+    configuration, limit_configuration: LimitConfiguration, duration, scope_duration
+) -> tuple:
+    waits = []
+    rejections = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    while (start := time.monotonic()) < deadline:
+        try:
+            async with alimit(configuration, limit_configuration):
+                waits.append(time.monotonic() - start)
+
+                # Yield to the event loop in any case, so a scope without duration does not starve the other tasks.
+                await asyncio.sleep(scope_duration)
+
+        except ConcurrencyLimitExceededException:
+            rejections += 1
+        except Exception:
+            errors += 1
+
+    return waits, rejections, errors
+
+
+def _percentile(values: list, quantile: float) -> typing.Optional[float]:
+    """
+    Returns the nearest-rank percentile of sorted values.
+
+    :param values: Sorted values
+    :param quantile: Quantile between 0 and 1
+    :return: Percentile, or None if there are no values
+    """
+    if not values:
+        return None
+
+    return values[max(math.ceil(quantile * len(values)) - 1, 0)]
@@ -0,0 +1,316 @@
+import contextlib
+import fcntl
+import fnmatch
+import os
+import struct
+import threading
+import urllib.parse
+
+from .configuration import *
+
+__all__ = [
+    "LocalSlots",
+    "AsyncLocalSlots",
+    "local_count",
+    "local_clean",
+    "local_stats",
+    "local_iter",
+]
+
+_HEADER = struct.Struct("<4sI")
+"Header of a concurrency limit file, containing the file format and the number of valid records following it."
+
+_MAGIC = b"CLS2"
+"File format of the concurrency limit files, files of other formats are read as empty."
+
+_RECORD = struct.Struct("<qQ36s")
+"Execution slot record of a concurrency limit file, containing the PID and start time of the holder and the slot id."
+
+_SUFFIX = ".slots"
+"File name suffix of the concurrency limit files, which also prevents keys from naming special directory entries."
+
+_file_map = {}
+_file_lock = threading.Lock()
+
+
+class _LocalFile:
+    """
+    Open concurrency limit file of the process. The file is locked using `flock` against other processes, and using a
+    thread lock against other threads of the process, as `flock` locks are shared by all threads of a process.
+    """
+
+    def __init__(self, path: str):
+        self.pid = os.getpid()
+        self.start_time = _get_start_time(self.pid)
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def read(self) -> list:
+        return _unpack(os.pread(self.fd, os.fstat(self.fd).st_size, 0))
+
+    def write(self, records: list):
+        data = _pack(records)
+
+        # The header is written together with the records, so the file stays valid if the process crashes before it
+        # is truncated. Records left behind the ones counted by the header are ignored.
+        os.pwrite(self.fd, data, 0)
+        os.ftruncate(self.fd, len(data))
+
+
+def _pack(records: list) -> bytes:
+    return _HEADER.pack(_MAGIC, len(records)) + b"".join(
+        _RECORD.pack(pid, start_time, lock_id.encode())
+        for pid, start_time, lock_id in records
+    )
+
+
+def _unpack(data: bytes) -> list:
+    if len(data) < _HEADER.size:
+        return []
+
+    magic, count = _HEADER.unpack_from(data)
+
+    if magic != _MAGIC:
+        return []
+
+    data = data[_HEADER.size :]
+    count = min(count, len(data) // _RECORD.size)
+
+    return [
+        (pid, start_time, lock_id.rstrip(b"\0").decode())
+        for pid, start_time, lock_id in _RECORD.iter_unpack(
+            data[: count * _RECORD.size]
+        )
+    ]
+
+
+def _get_start_time(pid: int) -> int:
+    """
+    Returns the start time of a process in clock ticks since the boot of the host, which tells a process apart from a
+    later one reusing its PID. Returns 0 if the start time is unknown, e.g. on hosts without `/proc`.
+
+    :param pid: PID of the process
+    :return: Start time, or 0 if unknown
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as stat:
+            data = stat.read()
+    except OSError:
+        return 0
+
+    # The command name may contain spaces and parentheses, so the fields are counted from its closing parenthesis.
+    try:
+        return int(data[data.rindex(b")") + 2 :].split()[19])
+    except (ValueError, IndexError):
+        return 0
+
+
+@contextlib.contextmanager
+def _locked(configuration: LocalConfiguration, key: str):
+    global _file_map
+    global _file_lock
+
+    path = os.path.join(configuration.get_path(), _get_file_name(key))
+
+    with _file_lock:
+        local_file = _file_map.get(path)
+
+        # Forked processes share the open file with their parent, including its `flock` lock, so they open their own.
+        if local_file is None or local_file.pid != os.getpid():
+            os.makedirs(configuration.get_path(), exist_ok=True)
+            local_file = _file_map[path] = _LocalFile(path)
+
+    with local_file.lock:
+        fcntl.flock(local_file.fd, fcntl.LOCK_EX)
+
+        try:
+            yield local_file
+        finally:
+            fcntl.flock(local_file.fd, fcntl.LOCK_UN)
+
+
+def _get_file_name(key: str) -> str:
+    return urllib.parse.quote(key, safe="") + _SUFFIX
+
+
+def _is_alive(pid: int, start_time: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+
+    # Processes of other users cannot be signalled, but exist.
+    except PermissionError:
+        pass
+
+    # A process started after the holder reuses the PID of a terminated holder.
+    return not start_time or _get_start_time(pid) in (start_time, 0)
+
+
+def _prune(records: list, local_file: _LocalFile) -> list:
+    """
+    Removes the execution slots held by processes that do not exist anymore, including holders whose PID was reused
+    by another process since. Each holder is checked once, and the holders of the current process not at all.
+
+    :param records: Execution slot records
+    :param local_file: Open concurrency limit file of the current process
+    :return: Execution slot records of running processes
+    """
+    alive = {(local_file.pid, local_file.start_time): True}
+
+    for pid, start_time, _ in records:
+        if (pid, start_time) not in alive:
+            alive[pid, start_time] = _is_alive(pid, start_time)
+
+    return [record for record in records if alive[record[0], record[1]]]
+
+
+class LocalSlots:
+    """
+    Execution slots of a concurrency limit key stored in a file on the local host, shared by all processes of the
+    host. Execution slots are held until they are released, or until their process terminates.
+    """
+
+    def __init__(
+        self,
+        configuration: LocalConfiguration,
+        limit_configuration: LimitConfiguration,
+    ):
+        self.configuration = configuration
+        self.limit_configuration = limit_configuration
+
+    def acquire(self, lock_ids: list) -> tuple:
+        """
+        Tries to acquire an execution slot for each of the given slot ids, either all of them or none. Execution slots
+        of processes that do not exist anymore are only pruned if the limit would be exceeded otherwise, as checking
+        the holders reads `/proc` for each of them. Until then, the returned count includes them.
+
+        :param lock_ids: Slot ids to acquire
+        :return: Tuple of the number of acquired slots, or 0 if the limit is exceeded, and the acquired slot ids
+        """
+        with _locked(self.configuration, self.limit_configuration.key) as local_file:
+            records = local_file.read()
+
+            if len(records) + len(lock_ids) > self.limit_configuration.limit:
+                count = len(records)
+                records = _prune(records, local_file)
+
+                if len(records) + len(lock_ids) > self.limit_configuration.limit:
+                    if count != len(records):
+                        local_file.write(records)
+
+                    return 0, lock_ids
+
+            records += [
+                (local_file.pid, local_file.start_time, lock_id) for lock_id in lock_ids
+            ]
+            local_file.write(records)
+
+            return len(records), lock_ids
+
+    def release(self, *lock_ids: str):
+        """
+        Releases the given execution slots.
+
+        :param lock_ids: Slot ids to release
+        """
+        with _locked(self.configuration, self.limit_configuration.key) as local_file:
+            records = local_file.read()
+            remaining = [record for record in records if record[2] not in lock_ids]
+
+            if len(remaining) != len(records):
+                local_file.write(remaining)
+
+    def items(self, lock_ids: list) -> list:
+        """
+        Maps the given slot ids to the limit configurations they were acquired on.
+
+        :param lock_ids: Acquired slot ids
+        :return: List of tuples of the limit configuration and its slot ids
+        """
+        return [(self.limit_configuration, lock_ids)]
+
+
+class AsyncLocalSlots(LocalSlots):
+    """
+    Execution slots of a concurrency limit key stored on the local host, for the asyncio context managers. The file
+    lock is only held for the duration of a single read and write, so the methods do not yield to the event loop.
+    """
+
+    async def acquire(self, lock_ids: list) -> tuple:
+        return super().acquire(lock_ids)
+
+    async def release(self, *lock_ids: str):
+        super().release(*lock_ids)
+
+
+def local_count(
+    configuration: LocalConfiguration, limit_configuration: LimitConfiguration
+) -> int:
+    """
+    Counts the execution slots in use of running processes for the given limit configuration.
+
+    :param configuration: LocalConfiguration object containing the location of the concurrency limit files.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: Number of execution slots in use
+    """
+    with _locked(configuration, limit_configuration.key) as local_file:
+        return len(_prune(local_file.read(), local_file))
+
+
+def local_clean(
+    configuration: LocalConfiguration, limit_configuration: LimitConfiguration
+) -> int:
+    """
+    Cleans the execution slots of processes that do not exist anymore for the given limit configuration.
+
+    :param configuration: LocalConfiguration object containing the location of the concurrency limit files.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: Number of cleaned items
+    """
+    with _locked(configuration, limit_configuration.key) as local_file:
+        records = local_file.read()
+        remaining = _prune(records, local_file)
+
+        if len(remaining) != len(records):
+            local_file.write(remaining)
+
+        return len(records) - len(remaining)
+
+
+def local_stats(configuration: LocalConfiguration, key: str) -> tuple:
+    """
+    Counts the execution slots in use of running processes and the stale ones of terminated processes of a key.
+
+    :param configuration: LocalConfiguration object containing the location of the concurrency limit files.
+    :param key: Concurrency limit key
+    :return: Tuple of the number of execution slots in use and the number of stale execution slots
+    """
+    with _locked(configuration, key) as local_file:
+        records = local_file.read()
+        count = len(_prune(records, local_file))
+
+        return count, len(records) - count
+
+
+def local_iter(configuration: LocalConfiguration, key_pattern: str):
+    """
+    Returns an iterator over the concurrency limit keys stored on the local host matching `key_pattern`.
+
+    :param configuration: LocalConfiguration object containing the location of the concurrency limit files.
+    :param key_pattern: The glob-style pattern of the keys to iterate over.
+    :return: Key iterator
+    """
+    try:
+        names = sorted(os.listdir(configuration.get_path()))
+    except FileNotFoundError:
+        return
+
+    for name in names:
+        if not name.endswith(_SUFFIX):
+            continue
+
+        key = urllib.parse.unquote(name[: -len(_SUFFIX)])
+
+        if fnmatch.fnmatchcase(key, key_pattern):
+            yield key
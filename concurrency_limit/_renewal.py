@@ -0,0 +1,311 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import redis
+import redis.asyncio
+
+from ._scripts import *
+
+__all__ = ["SlotRenewer", "AsyncSlotRenewer", "get_renewer", "get_async_renewer"]
+
+_RENEW_RATIO = 3
+"Number of renewals within the expire time of an execution slot."
+
+_renewer = None
+_renewer_lock = threading.Lock()
+
+_async_renewer_map = weakref.WeakKeyDictionary()
+
+
+class _SlotRegistry:
+    """
+    Registry of the acquired execution slots to renew, shared by the thread and asyncio renewers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def _add(self, client, lock_key, lock_ids, lock_expire, lock_storage):
+        renew_at = time.monotonic() + lock_expire / _RENEW_RATIO
+        for lock_id in lock_ids:
+            self._slots[(client, lock_key, lock_id)] = [
+                lock_expire,
+                lock_storage,
+                renew_at,
+            ]
+
+    def _remove(self, client, lock_key, lock_ids):
+        for lock_id in lock_ids:
+            self._slots.pop((client, lock_key, lock_id), None)
+
+    def _pop_due(self, current: float):
+        """
+        Collects all execution slots that are due for renewal, grouped by their Redis client, and schedules their next
+        renewal. Execution slots that are due within half of their renewal interval are renewed early, so execution
+        slots acquired at about the same time are renewed in the same pipeline.
+
+        :param current: Current monotonic time
+        :return: Tuple of the due execution slots per client and the monotonic time of the next renewal
+        """
+        due = {}
+        next_renew_at = None
+
+        for (client, lock_key, lock_id), slot in self._slots.items():
+            lock_expire, lock_storage, renew_at = slot
+
+            if renew_at <= current + lock_expire / _RENEW_RATIO / 2:
+                due.setdefault(client, []).append(
+                    (lock_key, lock_id, lock_expire, lock_storage)
+                )
+                renew_at = slot[2] = current + lock_expire / _RENEW_RATIO
+
+            if next_renew_at is None or renew_at < next_renew_at:
+                next_renew_at = renew_at
+
+        return due, next_renew_at
+
+    def _lost(self, client, slots, results):
+        """
+        Removes the execution slots that could not be renewed because they do not exist anymore.
+
+        :param client: Redis client of the execution slots
+        :param slots: Renewed execution slots
+        :param results: Results of the renew script for each execution slot
+        """
+        with self._lock:
+            for (lock_key, lock_id, _, _), renewed in zip(slots, results):
+                if renewed == 0 or (
+                    isinstance(renewed, redis.ResponseError)
+                    and not isinstance(renewed, redis.exceptions.NoScriptError)
+                ):
+                    self._remove(client, lock_key, [lock_id])
+
+
+class SlotRenewer(_SlotRegistry):
+    """
+    Background thread that renews the expiry of all acquired execution slots of the process. Each execution slot is
+    renewed three times within its expire time, and all execution slots due for renewal are renewed in a single
+    pipeline per Redis client. The thread is started on demand and stops if there are no execution slots to renew.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition(self._lock)
+        self._thread = None
+
+    def register(
+        self,
+        client: redis.Redis,
+        lock_key: str,
+        lock_ids: list,
+        lock_expire: int,
+        lock_storage: str,
+    ):
+        """
+        Registers acquired execution slots for renewal.
+
+        :param client: Redis client the execution slot was acquired with
+        :param lock_key: Concurrency limit key
+        :param lock_ids: Slot ids
+        :param lock_expire: Expire time of the execution slots in seconds
+        :param lock_storage: Storage type of the concurrency limit key
+        """
+        with self._lock:
+            self._add(client, lock_key, lock_ids, lock_expire, lock_storage)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="concurrency-limit-renewer", daemon=True
+                )
+                self._thread.start()
+
+            self._condition.notify()
+
+    def unregister(self, client: redis.Redis, lock_key: str, lock_ids: list):
+        """
+        Unregisters released execution slots.
+
+        :param client: Redis client the execution slot was acquired with
+        :param lock_key: Concurrency limit key
+        :param lock_ids: Slot ids
+        """
+        with self._lock:
+            self._remove(client, lock_key, lock_ids)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._slots:
+                    self._thread = None
+                    return
+
+                current = time.monotonic()
+                due, next_renew_at = self._pop_due(current)
+
+                if not due:
+                    self._condition.wait(timeout=next_renew_at - current)
+                    continue
+
+            for client, slots in due.items():
+                self._renew(client, slots)
+
+    def _renew(self, client: redis.Redis, slots: list):
+        renew_script = get_script(client, RENEW_SCRIPT)
+        pipeline = get_pipeline(client)
+        current = int(time.time())
+
+        for lock_key, lock_id, lock_expire, lock_storage in slots:
+            renew_script(
+                keys=[lock_key],
+                args=[lock_id, lock_expire, current, lock_storage],
+                client=pipeline,
+            )
+
+        # Connection errors are ignored, as there are further renewals before the execution slots expire.
+        try:
+            results = pipeline.execute(raise_on_error=False)
+
+            # Pipelines of Redis Cluster clients do not load scripts, so a missing script is loaded for the next renewal.
+            if _missing_script(results):
+                client.script_load(RENEW_SCRIPT)
+
+        except redis.RedisError:
+            return
+
+        self._lost(client, slots, results)
+
+
+class AsyncSlotRenewer(_SlotRegistry):
+    """
+    Asyncio task that renews the expiry of all acquired execution slots of an event loop. It behaves the same as the
+    `SlotRenewer` thread, but uses asyncio Redis clients.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._event = asyncio.Event()
+        self._task = None
+
+    def register(
+        self,
+        client: redis.asyncio.Redis,
+        lock_key: str,
+        lock_ids: list,
+        lock_expire: int,
+        lock_storage: str,
+    ):
+        """
+        Registers acquired execution slots for renewal.
+
+        :param client: asyncio Redis client the execution slot was acquired with
+        :param lock_key: Concurrency limit key
+        :param lock_ids: Slot ids
+        :param lock_expire: Expire time of the execution slots in seconds
+        :param lock_storage: Storage type of the concurrency limit key
+        """
+        with self._lock:
+            self._add(client, lock_key, lock_ids, lock_expire, lock_storage)
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        self._event.set()
+
+    def unregister(self, client: redis.asyncio.Redis, lock_key: str, lock_ids: list):
+        """
+        Unregisters released execution slots.
+
+        :param client: asyncio Redis client the execution slot was acquired with
+        :param lock_key: Concurrency limit key
+        :param lock_ids: Slot ids
+        """
+        with self._lock:
+            self._remove(client, lock_key, lock_ids)
+
+    async def _run(self):
+        while True:
+            with self._lock:
+                if not self._slots:
+                    self._task = None
+                    return
+
+                current = time.monotonic()
+                due, next_renew_at = self._pop_due(current)
+
+            if not due:
+                self._event.clear()
+
+                try:
+                    await asyncio.wait_for(
+                        self._event.wait(), timeout=next_renew_at - current
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+                continue
+
+            for client, slots in due.items():
+                await self._renew(client, slots)
+
+    async def _renew(self, client: redis.asyncio.Redis, slots: list):
+        renew_script = get_script(client, RENEW_SCRIPT)
+        pipeline = get_pipeline(client)
+        current = int(time.time())
+
+        for lock_key, lock_id, lock_expire, lock_storage in slots:
+            await renew_script(
+                keys=[lock_key],
+                args=[lock_id, lock_expire, current, lock_storage],
+                client=pipeline,
+            )
+
+        # Connection errors are ignored, as there are further renewals before the execution slots expire.
+        try:
+            results = await pipeline.execute(raise_on_error=False)
+
+            if _missing_script(results):
+                await client.script_load(RENEW_SCRIPT)
+
+        except redis.RedisError:
+            return
+
+        self._lost(client, slots, results)
+
+
+def _missing_script(results: list) -> bool:
+    return any(isinstance(result, redis.exceptions.NoScriptError) for result in results)
+
+
+def get_renewer() -> SlotRenewer:
+    """
+    Gets the execution slot renewer thread of the process.
+
+    :return: Execution slot renewer
+    """
+    global _renewer
+    global _renewer_lock
+
+    with _renewer_lock:
+        if _renewer is None:
+            _renewer = SlotRenewer()
+
+        return _renewer
+
+
+def get_async_renewer() -> AsyncSlotRenewer:
+    """
+    Gets the execution slot renewer task of the running event loop.
+
+    :return: asyncio execution slot renewer
+    """
+    global _async_renewer_map
+
+    loop = asyncio.get_running_loop()
+
+    if loop not in _async_renewer_map:
+        _async_renewer_map[loop] = AsyncSlotRenewer()
+
+    return _async_renewer_map[loop]
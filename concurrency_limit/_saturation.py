@@ -0,0 +1,75 @@
+import threading
+import time
+
+__all__ = ["SaturationCache", "get_saturation_cache"]
+
+_saturation_cache = None
+_saturation_lock = threading.Lock()
+
+
+class SaturationCache:
+    """
+    Process-local cache of the concurrency limit keys that rejected a scope moments ago. Fast-failing scopes of a
+    saturated key are rejected locally instead of probing Redis again, until the entry expires or the process
+    releases an execution slot of the key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._saturated = {}
+
+    def is_saturated(self, cache_key) -> bool:
+        """
+        Checks whether the key rejected a scope within its cache window.
+
+        :param cache_key: Tuple of the configuration and the concurrency limit key
+        :return: True if the key is considered saturated
+        """
+        saturated_until = self._saturated.get(cache_key)
+
+        return saturated_until is not None and time.monotonic() < saturated_until
+
+    def mark(self, cache_key, window: float):
+        """
+        Marks the key as saturated for the given window.
+
+        :param cache_key: Tuple of the configuration and the concurrency limit key
+        :param window: Time in seconds the key is considered saturated
+        """
+        current = time.monotonic()
+
+        with self._lock:
+            # Expired entries are dropped on the way, so the cache does not grow with the number of keys ever used.
+            if len(self._saturated) > 1000:
+                self._saturated = {
+                    key: until
+                    for key, until in self._saturated.items()
+                    if until > current
+                }
+
+            self._saturated[cache_key] = current + window
+
+    def invalidate(self, cache_key):
+        """
+        Forgets the saturation of the key, e.g. as the process released an execution slot of it.
+
+        :param cache_key: Tuple of the configuration and the concurrency limit key
+        """
+        with self._lock:
+            self._saturated.pop(cache_key, None)
+
+
+def get_saturation_cache() -> SaturationCache:
+    """
+    Gets the saturation cache of the process.
+
+    :return: Saturation cache
+    """
+    global _saturation_cache
+    global _saturation_lock
+
+    with _saturation_lock:
+        if _saturation_cache is None:
+            _saturation_cache = SaturationCache()
+
+        return _saturation_cache
@@ -0,0 +1,575 @@
+import contextvars
+import threading
+import weakref
+
+import redis
+import redis.asyncio.cluster
+import redis.cluster
+import redis.commands.core
+
+__all__ = [
+    "ACQUIRE_SCRIPT",
+    "ACQUIRE_ALL_SCRIPT",
+    "ACQUIRE_FAIR_SCRIPT",
+    "RELEASE_NOTIFY_SCRIPT",
+    "RENEW_SCRIPT",
+    "CLEAN_SCRIPT",
+    "ADAPT_SCRIPT",
+    "STATS_SCRIPT",
+    "get_script",
+    "get_pipeline",
+    "count_commands",
+    "get_command_count",
+]
+
+_script_map = weakref.WeakKeyDictionary()
+_script_lock = threading.Lock()
+
+_command_count = contextvars.ContextVar("concurrency_limit_commands", default=0)
+"Number of Redis commands sent to acquire execution slots by the current thread or asyncio task."
+
+_SLOT_FUNCTIONS = """
+-- Counts the acquired slots of a concurrency limit key. If the key does not contain the expected type, it is deleted.
+-- Expired slots are pruned if acquiring the required number of slots would exceed the limit.
+local function count_slots(lock_key, lock_storage, lock_limit, lock_required, current)
+    local key_type = redis.call("TYPE", lock_key)["ok"]
+    if key_type ~= lock_storage and key_type ~= "none" then
+        redis.call("DEL", lock_key)
+    end
+
+    if lock_storage == "zset" then
+        -- The sorted set is scored by the expiry of each slot, so expired slots are pruned by a single range removal.
+        redis.call("ZREMRANGEBYSCORE", lock_key, "-inf", current)
+        return redis.call("ZCARD", lock_key)
+    end
+
+    local count = redis.call("HLEN", lock_key)
+
+    -- Expired slots only matter if the limit is reached, so we only prune them in this case.
+    if count + lock_required > lock_limit then
+        local entries = redis.call("HGETALL", lock_key)
+        for i = 1, #entries, 2 do
+            local entry_expire = tonumber(entries[i + 1])
+            if entry_expire == nil or current >= entry_expire then
+                count = count - redis.call("HDEL", lock_key, entries[i])
+            end
+        end
+    end
+
+    return count
+end
+
+-- Sets the given number of slot ids on a concurrency limit key, and refreshes the expiry of the key.
+local function add_slots(lock_key, lock_storage, lock_expire, lock_ids, count, current)
+    for i = 1, count do
+        if lock_storage == "zset" then
+            redis.call("ZADD", lock_key, current + lock_expire, lock_ids[i])
+        else
+            redis.call("HSET", lock_key, lock_ids[i], current + lock_expire)
+        end
+    end
+
+    redis.call("EXPIRE", lock_key, lock_expire)
+end
+"""
+
+ACQUIRE_SCRIPT = _SLOT_FUNCTIONS + """
+-- Acquires execution slots on the concurrency limit hash or sorted set.
+--
+-- KEYS[1]: Concurrency limit key
+-- ARGV[1]: Concurrency limit
+-- ARGV[2]: Expire time in seconds
+-- ARGV[3]: Current UNIX timestamp in seconds
+-- ARGV[4]: Storage type, either "hash" or "zset"
+-- ARGV[5]: Minimum number of slots to acquire
+-- ARGV[6...]: Slot ids, as many as there are free slots are acquired
+--
+-- Returns the number of acquired slots including the new ones, and the number of new slots. If less than the minimum
+-- number of slots are free, no slots are acquired.
+
+local lock_key = KEYS[1]
+local lock_limit = tonumber(ARGV[1])
+local lock_expire = tonumber(ARGV[2])
+local current = tonumber(ARGV[3])
+local lock_storage = ARGV[4]
+local lock_minimum = tonumber(ARGV[5])
+local lock_ids = {unpack(ARGV, 6)}
+
+local count = count_slots(lock_key, lock_storage, lock_limit, #lock_ids, current)
+
+if count + lock_minimum > lock_limit then
+    return {count, 0}
+end
+
+local acquired = math.min(#lock_ids, lock_limit - count)
+add_slots(lock_key, lock_storage, lock_expire, lock_ids, acquired, current)
+
+return {count + acquired, acquired}
+"""
+
+ACQUIRE_ALL_SCRIPT = _SLOT_FUNCTIONS + """
+-- Acquires execution slots on multiple concurrency limit keys, either on all of them or on none.
+--
+-- KEYS[1...n]: Concurrency limit keys
+-- ARGV[1]: Current UNIX timestamp in seconds
+-- ARGV[2...1+4n]: Concurrency limit, expire time in seconds, storage type and weight of each key
+-- ARGV[2+4n...]: Slot ids, each key acquires as many of them as its weight
+--
+-- Returns 1 and the number of acquired slots of each key including the new ones, or 0 and the index of the first key
+-- whose limit is exceeded.
+
+local current = tonumber(ARGV[1])
+local lock_ids = {unpack(ARGV, 2 + 4 * #KEYS)}
+local counts = {}
+
+for i, lock_key in ipairs(KEYS) do
+    local lock_limit = tonumber(ARGV[4 * i - 2])
+    local lock_storage = ARGV[4 * i]
+    local lock_weight = tonumber(ARGV[4 * i + 1])
+
+    counts[i] = count_slots(lock_key, lock_storage, lock_limit, lock_weight, current)
+
+    if counts[i] + lock_weight > lock_limit then
+        return {0, i}
+    end
+end
+
+for i, lock_key in ipairs(KEYS) do
+    local lock_expire = tonumber(ARGV[4 * i - 1])
+    local lock_storage = ARGV[4 * i]
+    local lock_weight = tonumber(ARGV[4 * i + 1])
+
+    add_slots(lock_key, lock_storage, lock_expire, lock_ids, lock_weight, current)
+    counts[i] = counts[i] + lock_weight
+end
+
+return {1, unpack(counts)}
+"""
+
+ACQUIRE_FAIR_SCRIPT = _SLOT_FUNCTIONS + """
+-- Acquires execution slots on the concurrency limit hash or sorted set in the order of rank of the waiting scopes.
+--
+-- KEYS[1]: Concurrency limit key
+-- KEYS[2]: Queue key, a sorted set of the tickets of waiting scopes scored by their rank
+-- KEYS[3]: Ticket key, a hash of the tickets of waiting scopes and their expiry
+-- ARGV[1]: Concurrency limit
+-- ARGV[2]: Expire time in seconds
+-- ARGV[3]: Current UNIX timestamp in seconds
+-- ARGV[4]: Storage type, either "hash" or "zset"
+-- ARGV[5]: Current UNIX timestamp with fractions of seconds
+-- ARGV[6]: UNIX timestamp until the tickets of the waiting scope stay valid without another attempt
+-- ARGV[7]: Rank of the tickets of the waiting scope, its arrival lowered by its priority
+-- ARGV[8...]: Slot ids, which are used as the tickets of the waiting scope
+--
+-- Returns the number of acquired slots including the new ones, and the number of new slots. If the free slots are
+-- taken by scopes of a lower rank, no slots are acquired.
+
+local lock_key = KEYS[1]
+local queue_key = KEYS[2]
+local ticket_key = KEYS[3]
+local lock_limit = tonumber(ARGV[1])
+local lock_expire = tonumber(ARGV[2])
+local current = tonumber(ARGV[3])
+local lock_storage = ARGV[4]
+local now = tonumber(ARGV[5])
+local lock_ids = {unpack(ARGV, 8)}
+
+-- The first attempt of a scope takes the tickets, scored by its rank. Later attempts keep their place in the queue,
+-- but extend the expiry of the tickets, so only tickets of scopes that stopped waiting expire.
+for i = 1, #lock_ids do
+    redis.call("ZADD", queue_key, "NX", ARGV[7], lock_ids[i])
+    redis.call("HSET", ticket_key, lock_ids[i], ARGV[6])
+end
+
+redis.call("EXPIRE", queue_key, lock_expire)
+redis.call("EXPIRE", ticket_key, lock_expire)
+
+local rank = redis.call("ZSCORE", queue_key, lock_ids[1])
+local count = count_slots(lock_key, lock_storage, lock_limit, #lock_ids, current)
+local free = lock_limit - count
+
+-- The free slots are granted to the valid tickets of a lower rank first. Expired tickets in front of ours are pruned,
+-- and the scan stops as soon as the valid tickets in front of ours take all free slots.
+local ahead = 0
+while ahead + #lock_ids <= free do
+    local tickets = redis.call(
+        "ZRANGEBYSCORE", queue_key, "-inf", "(" .. rank, "LIMIT", ahead, free - ahead - #lock_ids + 1
+    )
+    if #tickets == 0 then
+        break
+    end
+
+    for _, ticket in ipairs(tickets) do
+        local ticket_expire = tonumber(redis.call("HGET", ticket_key, ticket))
+        if ticket_expire == nil or now >= ticket_expire then
+            redis.call("ZREM", queue_key, ticket)
+            redis.call("HDEL", ticket_key, ticket)
+        else
+            ahead = ahead + 1
+        end
+    end
+end
+
+if ahead + #lock_ids > free then
+    return {count, 0}
+end
+
+add_slots(lock_key, lock_storage, lock_expire, lock_ids, #lock_ids, current)
+
+redis.call("ZREM", queue_key, unpack(lock_ids))
+redis.call("HDEL", ticket_key, unpack(lock_ids))
+
+return {count + #lock_ids, #lock_ids}
+"""
+
+RELEASE_NOTIFY_SCRIPT = """
+-- Releases execution slots on the concurrency limit hash or sorted set and notifies waiting scopes.
+--
+-- KEYS[1]: Concurrency limit key
+-- KEYS[2]: Notification list key
+-- ARGV[1]: Concurrency limit
+-- ARGV[2]: Expire time in seconds
+-- ARGV[3]: Storage type, either "hash" or "zset"
+-- ARGV[4...]: Slot ids
+--
+-- Returns the number of released slots.
+
+local lock_key = KEYS[1]
+local notify_key = KEYS[2]
+local lock_limit = tonumber(ARGV[1])
+local lock_expire = tonumber(ARGV[2])
+local lock_storage = ARGV[3]
+local lock_ids = {unpack(ARGV, 4)}
+
+local removed
+if lock_storage == "zset" then
+    removed = redis.call("ZREM", lock_key, unpack(lock_ids))
+else
+    removed = redis.call("HDEL", lock_key, unpack(lock_ids))
+end
+
+if removed == 0 then
+    return 0
+end
+
+-- Each released slot pushes one token, which wakes up one waiting scope. Tokens of releases nobody waited for are
+-- capped by the limit, so they only cause a bounded number of spurious wake-ups.
+for i = 1, removed do
+    redis.call("LPUSH", notify_key, 1)
+end
+
+redis.call("LTRIM", notify_key, 0, lock_limit - 1)
+redis.call("EXPIRE", notify_key, lock_expire)
+
+return removed
+"""
+
+RENEW_SCRIPT = """
+-- Renews the expiry of an acquired execution slot on the concurrency limit hash or sorted set.
+--
+-- KEYS[1]: Concurrency limit key
+-- ARGV[1]: Slot id
+-- ARGV[2]: Expire time in seconds
+-- ARGV[3]: Current UNIX timestamp in seconds
+-- ARGV[4]: Storage type, either "hash" or "zset"
+--
+-- Returns 1 if the slot was renewed, or 0 if it did not exist anymore.
+
+local lock_key = KEYS[1]
+local lock_id = ARGV[1]
+local lock_expire = tonumber(ARGV[2])
+local current = tonumber(ARGV[3])
+local lock_storage = ARGV[4]
+
+-- Slots that were already pruned must not be re-created, as their execution slot may be acquired by another scope.
+if lock_storage == "zset" then
+    if not redis.call("ZSCORE", lock_key, lock_id) then
+        return 0
+    end
+
+    redis.call("ZADD", lock_key, current + lock_expire, lock_id)
+
+else
+    if redis.call("HEXISTS", lock_key, lock_id) == 0 then
+        return 0
+    end
+
+    redis.call("HSET", lock_key, lock_id, current + lock_expire)
+end
+
+redis.call("EXPIRE", lock_key, lock_expire)
+
+return 1
+"""
+
+CLEAN_SCRIPT = """
+-- Cleans the expired execution slots of a concurrency limit hash or sorted set.
+--
+-- KEYS[1]: Concurrency limit key
+-- ARGV[1]: Current UNIX timestamp in seconds
+-- ARGV[2]: Storage type, either "hash" or "zset"
+--
+-- Returns the number of removed slots. Keys not containing the storage type are left untouched, so other keys
+-- matching the same pattern, e.g. notification lists, are never deleted.
+
+local lock_key = KEYS[1]
+local current = tonumber(ARGV[1])
+local lock_storage = ARGV[2]
+
+if redis.call("TYPE", lock_key)["ok"] ~= lock_storage then
+    return 0
+end
+
+if lock_storage == "zset" then
+    return redis.call("ZREMRANGEBYSCORE", lock_key, "-inf", current)
+end
+
+local entries = redis.call("HGETALL", lock_key)
+local stale = {}
+for i = 1, #entries, 2 do
+    local entry_expire = tonumber(entries[i + 1])
+    if entry_expire == nil or current >= entry_expire then
+        stale[#stale + 1] = entries[i]
+    end
+end
+
+-- The stale slots are removed in chunks, as the number of arguments to unpack is limited by the Lua stack.
+local removed = 0
+for i = 1, #stale, 1000 do
+    removed = removed + redis.call("HDEL", lock_key, unpack(stale, i, math.min(i + 999, #stale)))
+end
+
+return removed
+"""
+
+ADAPT_SCRIPT = """
+-- Adjusts the adaptive concurrency limit by the outcome of a scope, using additive increase and multiplicative
+-- decrease.
+--
+-- KEYS[1]: Adaptive limit key, a hash of the adjusted limit, the smoothed scope duration and the time of the last cut
+-- ARGV[1]: Initial concurrency limit
+-- ARGV[2]: Lower bound of the limit
+-- ARGV[3]: Upper bound of the limit
+-- ARGV[4]: Additive increase once as many scopes as the limit succeeded
+-- ARGV[5]: Multiplicative decrease factor
+-- ARGV[6]: Factor of the smoothed duration above which a scope indicates overload, or 0 if disabled
+-- ARGV[7]: Weight of the scope duration in the smoothed duration
+-- ARGV[8]: Expire time in seconds
+-- ARGV[9]: Current UNIX timestamp with fractions of seconds
+-- ARGV[10]: Duration of the scope in seconds
+-- ARGV[11]: 1 if the scope raised an exception, 0 otherwise
+--
+-- Returns the adjusted limit as a string, as Lua numbers are truncated to integers when returned.
+
+local adaptive_key = KEYS[1]
+local min_limit = tonumber(ARGV[2])
+local max_limit = tonumber(ARGV[3])
+local increase = tonumber(ARGV[4])
+local decrease = tonumber(ARGV[5])
+local tolerance = tonumber(ARGV[6])
+local smoothing = tonumber(ARGV[7])
+local expire = tonumber(ARGV[8])
+local now = tonumber(ARGV[9])
+local duration = tonumber(ARGV[10])
+local failed = ARGV[11] == "1"
+
+local state = redis.call("HMGET", adaptive_key, "limit", "latency", "decreased_at")
+local limit = tonumber(state[1]) or tonumber(ARGV[1])
+local latency = tonumber(state[2])
+local decreased_at = tonumber(state[3]) or 0
+
+local overloaded = failed or (tolerance > 0 and latency ~= nil and duration > latency * tolerance)
+
+if overloaded then
+    -- Scopes running at the same time see the same overload, so the limit is only cut once per smoothed duration.
+    if now - decreased_at >= (latency or 0) then
+        limit = math.max(min_limit, limit * decrease)
+        redis.call("HSET", adaptive_key, "decreased_at", tostring(now))
+    end
+else
+    limit = math.min(max_limit, limit + increase / limit)
+end
+
+-- Slow scopes count towards the smoothed duration too, so it follows a lasting change of the protected service.
+if not failed then
+    if latency == nil then
+        latency = duration
+    else
+        latency = latency + smoothing * (duration - latency)
+    end
+    redis.call("HSET", adaptive_key, "latency", tostring(latency))
+end
+
+redis.call("HSET", adaptive_key, "limit", tostring(limit))
+redis.call("EXPIRE", adaptive_key, expire)
+
+return tostring(limit)
+"""
+
+STATS_SCRIPT = """
+-- Summarizes the execution slots of a concurrency limit hash or sorted set.
+--
+-- KEYS[1]: Concurrency limit key
+-- ARGV[1]: Current UNIX timestamp in seconds
+--
+-- Returns the storage type, the number of valid and stale slots, and the earliest and latest expiry of the valid slots,
+-- or 0 if there are none. Keys of other types return nil.
+
+local lock_key = KEYS[1]
+local current = tonumber(ARGV[1])
+local lock_storage = redis.call("TYPE", lock_key)["ok"]
+
+if lock_storage == "zset" then
+    local stale = redis.call("ZCOUNT", lock_key, "-inf", current)
+    local count = redis.call("ZCARD", lock_key) - stale
+    local oldest = redis.call("ZRANGEBYSCORE", lock_key, "(" .. current, "+inf", "WITHSCORES", "LIMIT", 0, 1)
+    local newest = redis.call("ZREVRANGEBYSCORE", lock_key, "+inf", "(" .. current, "WITHSCORES", "LIMIT", 0, 1)
+
+    return {lock_storage, count, stale, tonumber(oldest[2] or 0), tonumber(newest[2] or 0)}
+end
+
+if lock_storage ~= "hash" then
+    return nil
+end
+
+local count, stale, oldest, newest = 0, 0, 0, 0
+for _, entry in ipairs(redis.call("HVALS", lock_key)) do
+    local entry_expire = tonumber(entry)
+    if entry_expire == nil or current >= entry_expire then
+        stale = stale + 1
+    else
+        count = count + 1
+        if oldest == 0 or entry_expire < oldest then
+            oldest = entry_expire
+        end
+        if entry_expire > newest then
+            newest = entry_expire
+        end
+    end
+end
+
+return {lock_storage, count, stale, oldest, newest}
+"""
+
+
+def get_script(client: redis.Redis, script: str) -> redis.commands.core.Script:
+    """
+    Gets the registered Lua script for the given Redis client. Each script is only registered once per client, all
+    subsequent calls of this method with the same client and script return the cached script object, which
+    executes the script using `EVALSHA`.
+
+    :param client: Redis client
+    :param script: Lua script source
+    :return: Registered script object
+    """
+    global _script_map
+    global _script_lock
+
+    with _script_lock:
+        client_scripts = _script_map.setdefault(client, {})
+
+        if script not in client_scripts:
+            client_scripts[script] = client.register_script(script)
+
+        return client_scripts[script]
+
+
+def count_commands(count: int = 1):
+    """
+    Counts Redis commands sent to acquire execution slots, i.e. the acquire scripts, the notification waits and the
+    reads of adaptive limits. The count is kept per thread and asyncio task, so the scopes report the commands sent
+    while they acquired their execution slots.
+
+    :param count: Number of sent commands
+    """
+    _command_count.set(_command_count.get() + count)
+
+
+def get_command_count() -> int:
+    """
+    Gets the number of Redis commands counted by `count_commands` in the current thread or asyncio task.
+
+    :return: Number of sent commands
+    """
+    return _command_count.get()
+
+
+class _ClusterPipeline:
+    """
+    Pipeline of a Redis Cluster client. The pipelines of `redis-py` refuse `EVALSHA` on Redis Cluster clients, so the
+    queued commands are sent one after another instead, each to the node serving its key.
+    """
+
+    def __init__(self, client: redis.cluster.RedisCluster):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        def _queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return _queue
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        results = []
+
+        for name, args, kwargs in self.commands:
+            try:
+                results.append(getattr(self.client, name)(*args, **kwargs))
+            except redis.RedisError as exc:
+                if raise_on_error:
+                    raise
+
+                results.append(exc)
+
+        self.commands = []
+        return results
+
+
+class _AsyncClusterPipeline(_ClusterPipeline):
+    """
+    Pipeline of an asyncio Redis Cluster client, sending the queued commands one after another like the
+    `_ClusterPipeline`.
+    """
+
+    def __getattr__(self, name: str):
+        async def _queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return _queue
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        results = []
+
+        for name, args, kwargs in self.commands:
+            try:
+                results.append(await getattr(self.client, name)(*args, **kwargs))
+            except redis.RedisError as exc:
+                if raise_on_error:
+                    raise
+
+                results.append(exc)
+
+        self.commands = []
+        return results
+
+
+def get_pipeline(client: redis.Redis, transaction: bool = False):
+    """
+    Gets a pipeline of the given Redis client, which supports the scripts of `get_script`. For Redis Cluster clients,
+    the commands are sent one after another without a transaction, as cluster pipelines refuse scripts. All pipelined
+    commands of this package may be repeated, so the ones that succeeded before a failure are not a concern.
+
+    :param client: Redis client
+    :param transaction: Execute the commands in a transaction, except for Redis Cluster clients
+    :return: Pipeline
+    """
+    if isinstance(client, redis.asyncio.cluster.RedisCluster):
+        return _AsyncClusterPipeline(client)
+
+    if isinstance(client, redis.cluster.RedisCluster):
+        return _ClusterPipeline(client)
+
+    return client.pipeline(transaction=transaction)
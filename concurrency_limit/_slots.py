@@ -0,0 +1,818 @@
+import asyncio
+import collections
+import threading
+import time
+import typing
+import uuid
+import weakref
+
+import redis
+import redis.asyncio
+
+from ._adaptive import *
+from ._connections import *
+from ._scripts import *
+from .configuration import *
+
+__all__ = [
+    "RedisSlots",
+    "AsyncRedisSlots",
+    "RedisSlotGroup",
+    "AsyncRedisSlotGroup",
+    "SlotPool",
+    "AsyncSlotPool",
+    "get_slots",
+    "get_async_slots",
+]
+
+_TICKET_EXPIRE = 2.0
+"Time a ticket of a waiting scope stays valid after the next expected attempt, so tickets of dead scopes are pruned."
+
+_PRIORITY_STRICT = 10**10
+"Wait time a priority is worth if `limit_priority_aging` is not set, which is longer than any waiting scope waits."
+
+_slot_pool_map = weakref.WeakKeyDictionary()
+_slot_pool_lock = threading.Lock()
+
+
+class RedisSlots:
+    """
+    Execution slots of a concurrency limit key stored in Redis.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        limit_configuration: LimitConfiguration,
+        priority: int = 0,
+    ):
+        self.client = client
+        self.limit_configuration = limit_configuration
+        self.priority = priority
+
+    def acquire(self, lock_ids: list) -> tuple:
+        """
+        Tries to acquire an execution slot for each of the given slot ids, either all of them or none.
+
+        :param lock_ids: Slot ids to acquire
+        :return: Tuple of the number of acquired slots, or 0 if the limit is exceeded, and the acquired slot ids
+        """
+        # Clients without a blocking connection pool, i.e. Redis Cluster clients, raise once all of their connections
+        # are in use. The attempt counts as rejected, so the scope waits and tries again like with a blocking pool.
+        try:
+            if self.limit_configuration.limit_fair:
+                count_commands()
+                count, acquired = get_script(self.client, ACQUIRE_FAIR_SCRIPT)(
+                    keys=self._acquire_fair_keys(),
+                    args=self._acquire_fair_args(lock_ids),
+                )
+            else:
+                count, acquired = self.acquire_many(lock_ids)
+        except MAX_CONNECTIONS_ERROR:
+            return 0, lock_ids
+
+        # Rejected scopes do not adjust an adaptive limit, so the limit adjusted by the other processes is read instead.
+        if not acquired and self.limit_configuration.limit_adaptive is not None:
+            self.limit_configuration = refresh_adaptive_configuration(
+                self.client, self.limit_configuration
+            )
+
+        return count if acquired else 0, lock_ids
+
+    def acquire_many(self, lock_ids: list, minimum: int = None) -> tuple:
+        """
+        Tries to acquire execution slots using a single atomic script. The script prunes expired slots, checks the
+        number of acquired slots, and sets as many of the given slot ids on the lock-key as the limit allows. If the
+        key does not contain the configured storage type, the script deletes it.
+
+        :param lock_ids: Slot ids to acquire
+        :param minimum: Minimum number of slots to acquire, defaults to all slot ids
+        :return: Tuple of the number of acquired slots and the number of newly acquired slots
+        """
+        count_commands()
+        return tuple(
+            get_script(self.client, ACQUIRE_SCRIPT)(
+                keys=[self.limit_configuration.key],
+                args=self._acquire_args(lock_ids, minimum),
+            )
+        )
+
+    def release(self, *lock_ids: str, client: redis.Redis = None):
+        """
+        Releases the given execution slots, and notifies waiting scopes if `limit_notify` is set. If `limit_fair` is
+        set, the tickets of the slot ids are removed as well, in case the scope stopped waiting.
+
+        :param lock_ids: Slot ids to release
+        :param client: Redis client or pipeline to release the execution slots with, defaults to the slots' client
+        """
+        if client is None and self.limit_configuration.limit_fair:
+            try:
+                self._release_pipeline(lock_ids)
+
+            # Pipelines of Redis Cluster clients do not load scripts, so a missing script is loaded before trying
+            # again. Releasing execution slots twice has no effect.
+            except redis.exceptions.NoScriptError:
+                self.client.script_load(RELEASE_NOTIFY_SCRIPT)
+                self._release_pipeline(lock_ids)
+
+            return
+
+        client = self.client if client is None else client
+
+        if self.limit_configuration.limit_fair:
+            client.zrem(self.limit_configuration.get_queue_key(), *lock_ids)
+            client.hdel(self.limit_configuration.get_ticket_key(), *lock_ids)
+
+        if self.limit_configuration.limit_notify:
+            get_script(self.client, RELEASE_NOTIFY_SCRIPT)(
+                keys=self._release_keys(),
+                args=self._release_args(lock_ids),
+                client=client,
+            )
+        elif self.limit_configuration.limit_storage == "zset":
+            client.zrem(self.limit_configuration.key, *lock_ids)
+        else:
+            client.hdel(self.limit_configuration.key, *lock_ids)
+
+    def items(self, lock_ids: list) -> list:
+        """
+        Maps the given slot ids to the limit configurations they were acquired on.
+
+        :param lock_ids: Acquired slot ids
+        :return: List of tuples of the limit configuration and its slot ids
+        """
+        return [(self.limit_configuration, lock_ids)]
+
+    def _acquire_args(self, lock_ids: list, minimum: int = None) -> list:
+        return [
+            self.limit_configuration.limit,
+            self.limit_configuration.limit_expire,
+            int(time.time()),
+            self.limit_configuration.limit_storage,
+            len(lock_ids) if minimum is None else minimum,
+            *lock_ids,
+        ]
+
+    def _acquire_fair_keys(self) -> list:
+        return [
+            self.limit_configuration.key,
+            self.limit_configuration.get_queue_key(),
+            self.limit_configuration.get_ticket_key(),
+        ]
+
+    def _acquire_fair_args(self, lock_ids: list) -> list:
+        current = time.time()
+        aging = self.limit_configuration.limit_priority_aging
+
+        return [
+            self.limit_configuration.limit,
+            self.limit_configuration.limit_expire,
+            int(current),
+            self.limit_configuration.limit_storage,
+            repr(current),
+            repr(
+                current + self.limit_configuration.get_max_interval() + _TICKET_EXPIRE
+            ),
+            repr(
+                current - self.priority * (_PRIORITY_STRICT if aging is None else aging)
+            ),
+            *lock_ids,
+        ]
+
+    def _release_keys(self) -> list:
+        return [self.limit_configuration.key, self.limit_configuration.get_notify_key()]
+
+    def _release_args(self, lock_ids: tuple) -> list:
+        return [
+            self.limit_configuration.limit,
+            self.limit_configuration.limit_expire,
+            self.limit_configuration.limit_storage,
+            *lock_ids,
+        ]
+
+    def _release_pipeline(self, lock_ids: tuple):
+        pipeline = get_pipeline(self.client)
+        self.release(*lock_ids, client=pipeline)
+        pipeline.execute()
+
+
+class AsyncRedisSlots(RedisSlots):
+    """
+    Execution slots of a concurrency limit key stored in Redis, using an asyncio Redis client.
+    """
+
+    client: redis.asyncio.Redis
+
+    async def acquire(self, lock_ids: list) -> tuple:
+        try:
+            if self.limit_configuration.limit_fair:
+                count_commands()
+                count, acquired = await get_script(self.client, ACQUIRE_FAIR_SCRIPT)(
+                    keys=self._acquire_fair_keys(),
+                    args=self._acquire_fair_args(lock_ids),
+                )
+            else:
+                count, acquired = await self.acquire_many(lock_ids)
+        except MAX_CONNECTIONS_ERROR:
+            return 0, lock_ids
+
+        if not acquired and self.limit_configuration.limit_adaptive is not None:
+            self.limit_configuration = await async_refresh_adaptive_configuration(
+                self.client, self.limit_configuration
+            )
+
+        return count if acquired else 0, lock_ids
+
+    async def acquire_many(self, lock_ids: list, minimum: int = None) -> tuple:
+        count_commands()
+        return tuple(
+            await get_script(self.client, ACQUIRE_SCRIPT)(
+                keys=[self.limit_configuration.key],
+                args=self._acquire_args(lock_ids, minimum),
+            )
+        )
+
+    async def release(self, *lock_ids: str, client: redis.asyncio.Redis = None):
+        if client is None and self.limit_configuration.limit_fair:
+            try:
+                await self._release_pipeline(lock_ids)
+            except redis.exceptions.NoScriptError:
+                await self.client.script_load(RELEASE_NOTIFY_SCRIPT)
+                await self._release_pipeline(lock_ids)
+
+            return
+
+        client = self.client if client is None else client
+
+        if self.limit_configuration.limit_fair:
+            await client.zrem(self.limit_configuration.get_queue_key(), *lock_ids)
+            await client.hdel(self.limit_configuration.get_ticket_key(), *lock_ids)
+
+        if self.limit_configuration.limit_notify:
+            await get_script(self.client, RELEASE_NOTIFY_SCRIPT)(
+                keys=self._release_keys(),
+                args=self._release_args(lock_ids),
+                client=client,
+            )
+        elif self.limit_configuration.limit_storage == "zset":
+            await client.zrem(self.limit_configuration.key, *lock_ids)
+        else:
+            await client.hdel(self.limit_configuration.key, *lock_ids)
+
+    async def _release_pipeline(self, lock_ids: tuple):
+        pipeline = get_pipeline(self.client)
+        await self.release(*lock_ids, client=pipeline)
+        await pipeline.execute()
+
+
+class RedisSlotGroup:
+    """
+    Execution slots of multiple concurrency limit keys stored in Redis, which are acquired on all keys or on none
+    using a single atomic script, and released together in a single transaction. Each key acquires as many of the
+    slot ids as its `limit_weight`. In a Redis Cluster, all keys must share the same hash tag, and the releases are
+    sent one after another, as cluster pipelines refuse scripts.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+    ):
+        self.client = client
+        self.limit_configurations = tuple(limit_configurations)
+        # The limit configuration that was exceeded by the last rejected acquisition.
+        self.limit_configuration = self.limit_configurations[0]
+
+        self.slots = [
+            RedisSlots(client, configuration)
+            for configuration in self.limit_configurations
+        ]
+
+    def acquire(self, lock_ids: list) -> tuple:
+        """
+        Tries to acquire execution slots on all concurrency limit keys, either on all of them or on none.
+
+        :param lock_ids: Slot ids to acquire
+        :return: Tuple of the number of acquired slots of each key, or 0 if any limit is exceeded, and the acquired
+            slot ids
+        """
+        # Like with single keys, an attempt made while all connections are in use counts as rejected.
+        count_commands()
+
+        try:
+            result = get_script(self.client, ACQUIRE_ALL_SCRIPT)(
+                keys=self._acquire_keys(), args=self._acquire_args(lock_ids)
+            )
+        except MAX_CONNECTIONS_ERROR:
+            return 0, lock_ids
+        counts = self._acquire_result(result)
+
+        # Rejected scopes do not adjust an adaptive limit, so the limit adjusted by the other processes is read instead.
+        if not counts and self.limit_configuration.limit_adaptive is not None:
+            self._replace(
+                refresh_adaptive_configuration(self.client, self.limit_configuration)
+            )
+
+        return counts, lock_ids
+
+    def release(self, *lock_ids: str):
+        """
+        Releases the given execution slots on all concurrency limit keys in a single transaction.
+
+        :param lock_ids: Slot ids to release
+        """
+        try:
+            self._release(lock_ids)
+
+        # Pipelines of Redis Cluster clients do not load scripts, so a missing script is loaded before trying again.
+        # Releasing execution slots twice has no effect, so the releases that succeeded before are not a concern.
+        except redis.exceptions.NoScriptError:
+            self.client.script_load(RELEASE_NOTIFY_SCRIPT)
+            self._release(lock_ids)
+
+    def _release(self, lock_ids: tuple):
+        pipeline = get_pipeline(self.client, transaction=True)
+
+        for slots in self.slots:
+            slots.release(
+                *lock_ids[: slots.limit_configuration.limit_weight], client=pipeline
+            )
+
+        pipeline.execute()
+
+    def items(self, lock_ids: list) -> list:
+        """
+        Maps the given slot ids to the limit configurations they were acquired on.
+
+        :param lock_ids: Acquired slot ids
+        :return: List of tuples of the limit configuration and its slot ids
+        """
+        return [
+            (configuration, lock_ids[: configuration.limit_weight])
+            for configuration in self.limit_configurations
+        ]
+
+    def _acquire_keys(self) -> list:
+        return [configuration.key for configuration in self.limit_configurations]
+
+    def _acquire_args(self, lock_ids: list) -> list:
+        args = [int(time.time())]
+
+        for configuration in self.limit_configurations:
+            args += [
+                configuration.limit,
+                configuration.limit_expire,
+                configuration.limit_storage,
+                configuration.limit_weight,
+            ]
+
+        return [*args, *lock_ids]
+
+    def _acquire_result(self, result: list):
+        acquired, *counts = result
+
+        if not acquired:
+            self.limit_configuration = self.limit_configurations[counts[0] - 1]
+            return 0
+
+        return tuple(counts)
+
+    def _replace(self, limit_configuration: LimitConfiguration):
+        index = self.limit_configurations.index(self.limit_configuration)
+        limit_configurations = list(self.limit_configurations)
+        limit_configurations[index] = limit_configuration
+
+        self.limit_configurations = tuple(limit_configurations)
+        self.limit_configuration = limit_configuration
+        self.slots[index].limit_configuration = limit_configuration
+
+
+class AsyncRedisSlotGroup(RedisSlotGroup):
+    """
+    Execution slots of multiple concurrency limit keys stored in Redis, using an asyncio Redis client.
+    """
+
+    client: redis.asyncio.Redis
+
+    def __init__(
+        self,
+        client: redis.asyncio.Redis,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+    ):
+        super().__init__(client, limit_configurations)
+        self.slots = [
+            AsyncRedisSlots(client, configuration)
+            for configuration in self.limit_configurations
+        ]
+
+    async def acquire(self, lock_ids: list) -> tuple:
+        count_commands()
+
+        try:
+            result = await get_script(self.client, ACQUIRE_ALL_SCRIPT)(
+                keys=self._acquire_keys(), args=self._acquire_args(lock_ids)
+            )
+        except MAX_CONNECTIONS_ERROR:
+            return 0, lock_ids
+        counts = self._acquire_result(result)
+
+        if not counts and self.limit_configuration.limit_adaptive is not None:
+            self._replace(
+                await async_refresh_adaptive_configuration(
+                    self.client, self.limit_configuration
+                )
+            )
+
+        return counts, lock_ids
+
+    async def release(self, *lock_ids: str):
+        try:
+            await self._release(lock_ids)
+        except redis.exceptions.NoScriptError:
+            await self.client.script_load(RELEASE_NOTIFY_SCRIPT)
+            await self._release(lock_ids)
+
+    async def _release(self, lock_ids: tuple):
+        pipeline = get_pipeline(self.client, transaction=True)
+
+        for slots in self.slots:
+            await slots.release(
+                *lock_ids[: slots.limit_configuration.limit_weight], client=pipeline
+            )
+
+        await pipeline.execute()
+
+
+class _SlotPoolState:
+    """
+    Process-local state of the execution slots reserved by a `SlotPool`, shared by the thread and asyncio pools.
+    """
+
+    def __init__(self, slots: RedisSlots):
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._free = collections.deque()
+        self._reserved_at = {}
+        self._in_use = 0
+
+    @property
+    def limit_configuration(self) -> LimitConfiguration:
+        return self.slots.limit_configuration
+
+    def items(self, lock_ids: list) -> list:
+        return self.slots.items(lock_ids)
+
+    def put(self, *lock_ids: str):
+        """
+        Puts execution slots back to the reserved execution slots without calling Redis, e.g. while the circuit
+        breaker is open. Execution slots that were not reserved by this pool are freed by their expiry.
+
+        :param lock_ids: Slot ids to put back
+        """
+        self._put(lock_ids, time.monotonic())
+        self._schedule()
+
+    def _take(self, count: int, current: float) -> tuple:
+        """
+        Takes reserved execution slots that are not in use, either all of the requested ones or none. Reserved
+        execution slots that were reserved more than a third of `limit_expire` ago are not handed out anymore, but
+        returned to Redis, so the scopes using them do not run into their expiry.
+
+        :param count: Number of execution slots to take
+        :param current: Current monotonic time
+        :return: Tuple of the taken slot ids, or `None` if there are not enough, the number of execution slots in use,
+            and the slot ids to return
+        """
+        configuration = self.slots.limit_configuration
+        taken = []
+        stale = []
+
+        with self._lock:
+            while self._free and len(taken) < count:
+                lock_id, released_at = self._free.pop()
+
+                if (
+                    self._reserved_at[lock_id] + configuration.limit_expire / 3
+                    > current
+                ):
+                    taken.append((lock_id, released_at))
+                else:
+                    del self._reserved_at[lock_id]
+                    stale.append(lock_id)
+
+            if len(taken) < count:
+                self._free.extend(reversed(taken))
+                return None, self._in_use, stale
+
+            self._in_use += count
+            return [lock_id for lock_id, _ in taken], self._in_use, stale
+
+    def _reserved(self, lock_ids: list, count: int, current: float) -> int:
+        """
+        Adds newly reserved execution slots, the first ones of them are in use.
+
+        :param lock_ids: Reserved slot ids
+        :param count: Number of reserved execution slots in use
+        :param current: Current monotonic time
+        :return: Number of execution slots in use
+        """
+        with self._lock:
+            for lock_id in lock_ids:
+                self._reserved_at[lock_id] = current
+
+            self._free.extend((lock_id, current) for lock_id in lock_ids[count:])
+            self._in_use += count
+
+            return self._in_use
+
+    def _put(self, lock_ids: tuple, current: float) -> list:
+        """
+        Puts execution slots that are not in use anymore back to the reserved execution slots.
+
+        :param lock_ids: Released slot ids
+        :param current: Current monotonic time
+        :return: Released slot ids that were not reserved by this pool
+        """
+        foreign = []
+
+        with self._lock:
+            for lock_id in lock_ids:
+                if lock_id not in self._reserved_at:
+                    foreign.append(lock_id)
+                    continue
+
+                self._free.append((lock_id, current))
+                self._in_use -= 1
+
+        return foreign
+
+    def _pop_idle(self, current: float) -> list:
+        """
+        Removes the reserved execution slots that were not used within `limit_prefetch_idle`. As reserved execution
+        slots are handed out last in first out, the idle execution slots are the first ones.
+
+        :param current: Current monotonic time
+        :return: Slot ids to return
+        """
+        configuration = self.slots.limit_configuration
+        idle = []
+
+        with self._lock:
+            while (
+                self._free
+                and self._free[0][1] + configuration.limit_prefetch_idle <= current
+            ):
+                lock_id, _ = self._free.popleft()
+                del self._reserved_at[lock_id]
+                idle.append(lock_id)
+
+        return idle
+
+    def _idle_delay(self, current: float) -> float:
+        """
+        Returns the time until the least recently used reserved execution slot becomes idle, so idle execution slots
+        are returned to Redis on time instead of up to twice `limit_prefetch_idle` after their last use.
+
+        :param current: Current monotonic time
+        :return: Delay in seconds
+        """
+        configuration = self.slots.limit_configuration
+
+        return max(self._free[0][1] + configuration.limit_prefetch_idle - current, 0)
+
+
+class SlotPool(_SlotPoolState):
+    """
+    Process-local pool of execution slots reserved in Redis. If the pool has no reserved execution slot left, it
+    reserves up to `limit_prefetch` execution slots in a single call. Reserved execution slots are then handed out
+    to the scopes of the process without any network I/O, and are returned to Redis if they were not used within
+    `limit_prefetch_idle`.
+    """
+
+    def __init__(self, slots: RedisSlots):
+        super().__init__(slots)
+        self._timer = None
+
+    def acquire(self, lock_ids: list) -> tuple:
+        """
+        Tries to acquire execution slots, either from the reserved execution slots, or by reserving new ones in
+        Redis using the given slot ids as the first of them.
+
+        :param lock_ids: Slot ids to acquire if new execution slots are reserved
+        :return: Tuple of the number of execution slots in use by the process, or 0 if the limit is exceeded, and the
+            acquired slot ids
+        """
+        current = time.monotonic()
+        pool_lock_ids, count, stale = self._take(len(lock_ids), current)
+
+        if stale:
+            self.slots.release(*stale)
+
+        if pool_lock_ids is not None:
+            return count, pool_lock_ids
+
+        configuration = self.slots.limit_configuration
+        reserve_lock_ids = [
+            *lock_ids,
+            *(
+                str(uuid.uuid4())
+                for _ in range(configuration.limit_prefetch - len(lock_ids))
+            ),
+        ]
+
+        # Like with single keys, an attempt made while all connections are in use counts as rejected.
+        try:
+            _, acquired = self.slots.acquire_many(
+                reserve_lock_ids, minimum=len(lock_ids)
+            )
+        except MAX_CONNECTIONS_ERROR:
+            return 0, lock_ids
+
+        if not acquired:
+            return 0, lock_ids
+
+        count = self._reserved(reserve_lock_ids[:acquired], len(lock_ids), current)
+        self._schedule()
+
+        return count, lock_ids
+
+    def release(self, *lock_ids: str):
+        """
+        Puts the execution slots back to the reserved execution slots, or releases them in Redis if they were not
+        reserved by this pool.
+
+        :param lock_ids: Slot ids to release
+        """
+        foreign = self._put(lock_ids, time.monotonic())
+
+        if foreign:
+            self.slots.release(*foreign)
+
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is None and self._free:
+                self._timer = threading.Timer(
+                    self._idle_delay(time.monotonic()), self._trim
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _trim(self):
+        with self._lock:
+            self._timer = None
+
+        idle = self._pop_idle(time.monotonic())
+
+        # Connection errors are ignored, as the reserved execution slots expire anyway.
+        if idle:
+            try:
+                self.slots.release(*idle)
+            except redis.RedisError:
+                pass
+
+        self._schedule()
+
+
+class AsyncSlotPool(_SlotPoolState):
+    """
+    Process-local pool of execution slots reserved in Redis, using an asyncio Redis client. It behaves the same as
+    the `SlotPool`, but returns idle execution slots using the event loop.
+    """
+
+    slots: AsyncRedisSlots
+
+    def __init__(self, slots: AsyncRedisSlots):
+        super().__init__(slots)
+        self._handle = None
+        self._task = None
+
+    async def acquire(self, lock_ids: list) -> tuple:
+        current = time.monotonic()
+        pool_lock_ids, count, stale = self._take(len(lock_ids), current)
+
+        if stale:
+            await self.slots.release(*stale)
+
+        if pool_lock_ids is not None:
+            return count, pool_lock_ids
+
+        configuration = self.slots.limit_configuration
+        reserve_lock_ids = [
+            *lock_ids,
+            *(
+                str(uuid.uuid4())
+                for _ in range(configuration.limit_prefetch - len(lock_ids))
+            ),
+        ]
+
+        try:
+            _, acquired = await self.slots.acquire_many(
+                reserve_lock_ids, minimum=len(lock_ids)
+            )
+        except MAX_CONNECTIONS_ERROR:
+            return 0, lock_ids
+
+        if not acquired:
+            return 0, lock_ids
+
+        count = self._reserved(reserve_lock_ids[:acquired], len(lock_ids), current)
+        self._schedule()
+
+        return count, lock_ids
+
+    async def release(self, *lock_ids: str):
+        foreign = self._put(lock_ids, time.monotonic())
+
+        if foreign:
+            await self.slots.release(*foreign)
+
+        self._schedule()
+
+    def _schedule(self):
+        if self._handle is None and self._task is None and self._free:
+            with self._lock:
+                delay = self._idle_delay(time.monotonic())
+
+            self._handle = asyncio.get_running_loop().call_later(
+                delay, self._start_trim
+            )
+
+    def _start_trim(self):
+        self._handle = None
+        self._task = asyncio.get_running_loop().create_task(self._trim())
+
+    async def _trim(self):
+        idle = self._pop_idle(time.monotonic())
+
+        # Connection errors are ignored, as the reserved execution slots expire anyway.
+        if idle:
+            try:
+                await self.slots.release(*idle)
+            except redis.RedisError:
+                pass
+
+        self._task = None
+        self._schedule()
+
+
+def get_slots(
+    client: redis.Redis, limit_configuration: LimitConfiguration, priority: int = 0
+) -> RedisSlots:
+    """
+    Gets the execution slots for the given limit configuration. If `limit_prefetch` is set, the process-local slot
+    pool of the limit configuration is returned, which is created once per client and limit configuration. Prefetching
+    is not applied if `limit_fair` is set, as reserved execution slots would bypass the queue of waiting scopes.
+
+    :param client: Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param priority: Priority of the waiting scope if `limit_fair` is set, higher priorities are granted first.
+    :return: Execution slots
+    """
+    global _slot_pool_map
+    global _slot_pool_lock
+
+    slots = RedisSlots(client, limit_configuration, priority)
+
+    if limit_configuration.limit_prefetch <= 1 or limit_configuration.limit_fair:
+        return slots
+
+    with _slot_pool_lock:
+        client_pools = _slot_pool_map.setdefault(client, {})
+
+        if limit_configuration not in client_pools:
+            client_pools[limit_configuration] = SlotPool(slots)
+
+        return client_pools[limit_configuration]
+
+
+def get_async_slots(
+    client: redis.asyncio.Redis,
+    limit_configuration: LimitConfiguration,
+    priority: int = 0,
+) -> AsyncRedisSlots:
+    """
+    Gets the execution slots for the given limit configuration using an asyncio Redis client. If `limit_prefetch`
+    is set, the process-local slot pool of the limit configuration is returned.
+
+    :param client: asyncio Redis client
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param priority: Priority of the waiting scope if `limit_fair` is set, higher priorities are granted first.
+    :return: Execution slots
+    """
+    global _slot_pool_map
+    global _slot_pool_lock
+
+    slots = AsyncRedisSlots(client, limit_configuration, priority)
+
+    if limit_configuration.limit_prefetch <= 1 or limit_configuration.limit_fair:
+        return slots
+
+    with _slot_pool_lock:
+        client_pools = _slot_pool_map.setdefault(client, {})
+
+        if limit_configuration not in client_pools:
+            client_pools[limit_configuration] = AsyncSlotPool(slots)
+
+        return client_pools[limit_configuration]
@@ -0,0 +1,811 @@
+import dataclasses
+import itertools
+import time
+import typing
+
+import redis
+import redis.asyncio
+
+from ._adaptive import *
+from ._circuit import *
+from ._connections import *
+from ._local import *
+from ._renewal import *
+from ._scripts import *
+from ._slots import *
+from .configuration import *
+
+__all__ = [
+    "Backend",
+    "AsyncBackend",
+    "RedisBackend",
+    "AsyncRedisBackend",
+    "LocalBackend",
+    "AsyncLocalBackend",
+    "LimitStats",
+    "get_backend",
+    "get_async_backend",
+]
+
+_CLEAN_BATCH = 1000
+"Number of keys cleaned per pipeline, and number of stale slots removed per command, by the Redis backends."
+
+
+@dataclasses.dataclass(frozen=True)
+class LimitStats:
+    """
+    Snapshot of the execution slots of a concurrency limit key.
+    """
+
+    key: str
+    "Concurrency limit key."
+
+    count: int
+    "Number of execution slots in use."
+
+    stale: int
+    "Number of stale execution slots, i.e. expired ones or ones of terminated processes, that were not cleaned yet."
+
+    oldest_expire: typing.Optional[int] = None
+    "UNIX timestamp of the earliest expiry of the execution slots in use, if they expire."
+
+    newest_expire: typing.Optional[int] = None
+    "UNIX timestamp of the latest expiry of the execution slots in use, if they expire."
+
+
+class Backend:
+    """
+    Base class of the storages of the concurrency limits. The context managers, decorators and executors use a backend
+    to acquire and release execution slots, so any store can be plugged in by passing a backend instance in place of a
+    `RedisConfiguration`.
+
+    A backend hands out slots objects, which acquire and release the execution slots of their limit configurations:
+
+    - `acquire(lock_ids)` tries to acquire the given slot ids, and returns a tuple of the number of execution slots in
+      use including the new ones, or 0 if the limit is exceeded, and the acquired slot ids.
+    - `release(*lock_ids)` releases the given slot ids.
+    - `items(lock_ids)` maps the acquired slot ids to the limit configurations they were acquired on.
+    - `limit_configuration` is the limit configuration whose limit was exceeded by the last attempt.
+    """
+
+    def get_slots(self, limit_configuration: LimitConfiguration, priority: int = 0):
+        """
+        Gets the slots object of a limit configuration.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :param priority: Priority of the scope if `limit_fair` is set, scopes of higher priority are granted first.
+        :return: Slots object
+        """
+        raise NotImplementedError()
+
+    def get_slot_group(self, limit_configurations: typing.Sequence[LimitConfiguration]):
+        """
+        Gets the slots object of multiple limit configurations, which acquires the execution slots of all of them or
+        of none.
+
+        :param limit_configurations: LimitConfiguration objects containing the configuration details for the limits.
+        :return: Slots object
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support multiple limits"
+        )
+
+    def register(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        """
+        Registers acquired execution slots for renewal of their expiry, until they are unregistered. Backends without
+        expiry of execution slots ignore it.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :param lock_ids: Slot ids
+        """
+
+    def unregister(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        """
+        Unregisters execution slots from renewal before they are released.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :param lock_ids: Slot ids
+        """
+
+    def adapt(
+        self, limit_configuration: LimitConfiguration, duration: float, failed: bool
+    ):
+        """
+        Adjusts the limit by the outcome of a scope if `limit_adaptive` is set. Backends without adaptive limits
+        ignore it.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :param duration: Duration of the scope in seconds
+        :param failed: Whether the scope raised an exception
+        """
+
+    def wait(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        timeout: float,
+    ) -> bool:
+        """
+        Waits until an execution slot of the limit configurations is released, or until the timeout is reached.
+
+        :param limit_configurations: LimitConfiguration objects containing the configuration details for the limits.
+        :param timeout: Maximum time to wait in seconds
+        :return: False without waiting if the backend does not notify released execution slots, True otherwise
+        """
+        return False
+
+    def count(self, limit_configuration: LimitConfiguration) -> int:
+        """
+        Counts the execution slots in use of a limit configuration.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :return: Number of execution slots in use
+        """
+        raise NotImplementedError()
+
+    def get_limit(self, limit_configuration: LimitConfiguration) -> int:
+        """
+        Gets the limit in effect for a limit configuration. Backends without adaptive limits return its `limit`.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :return: Limit in effect
+        """
+        return limit_configuration.limit
+
+    def clean(self, limit_configuration: LimitConfiguration) -> int:
+        """
+        Cleans stale execution slots of a limit configuration.
+
+        :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+        :return: Number of cleaned items
+        """
+        raise NotImplementedError()
+
+    def clean_many(
+        self, keys: typing.Iterable[str], limit_storage: str = "hash"
+    ) -> typing.Dict[str, int]:
+        """
+        Cleans stale execution slots of many keys. The default implementation cleans one key after another.
+
+        :param keys: Concurrency limit keys
+        :param limit_storage: Storage type of the keys, either `hash` or `zset`
+        :return: Dictionary of the number of cleaned items per key
+        """
+        return {
+            key: self.clean(
+                LimitConfiguration(key=key, limit=1, limit_storage=limit_storage)
+            )
+            for key in keys
+        }
+
+    def stats(
+        self, keys: typing.Iterable[str], batch_size: int = _CLEAN_BATCH
+    ) -> typing.Iterator[LimitStats]:
+        """
+        Returns an iterator over the snapshots of the execution slots of many keys. Keys not containing execution
+        slots are skipped.
+
+        :param keys: Concurrency limit keys
+        :param batch_size: Number of keys read at once
+        :return: Iterator of LimitStats objects
+        """
+        raise NotImplementedError()
+
+    def iterate(self, key_pattern: str, count: int = None) -> typing.Iterator[str]:
+        """
+        Returns an iterator over the concurrency limit keys matching `key_pattern`.
+
+        :param key_pattern: The glob-style pattern of the keys to iterate over.
+        :param count: Number of keys to look at per call, e.g. the `COUNT` of `SCAN`, defaults to the backend's default
+        :return: Key iterator
+        """
+        raise NotImplementedError()
+
+
+class AsyncBackend:
+    """
+    Base class of the asyncio storages of the concurrency limits, used by `alimit`, `alimit_all` and `bounded_map`.
+    It has the same methods as `Backend`, but the methods of its slots objects and the `wait`, `count` and `clean`
+    methods are awaitable, and `iterate` returns an asynchronous iterator.
+    """
+
+    def get_slots(self, limit_configuration: LimitConfiguration, priority: int = 0):
+        raise NotImplementedError()
+
+    def get_slot_group(self, limit_configurations: typing.Sequence[LimitConfiguration]):
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support multiple limits"
+        )
+
+    def register(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        pass
+
+    def unregister(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        pass
+
+    async def adapt(
+        self, limit_configuration: LimitConfiguration, duration: float, failed: bool
+    ):
+        pass
+
+    async def wait(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        timeout: float,
+    ) -> bool:
+        return False
+
+    async def count(self, limit_configuration: LimitConfiguration) -> int:
+        raise NotImplementedError()
+
+    async def get_limit(self, limit_configuration: LimitConfiguration) -> int:
+        return limit_configuration.limit
+
+    async def clean(self, limit_configuration: LimitConfiguration) -> int:
+        raise NotImplementedError()
+
+    async def clean_many(
+        self, keys: typing.Iterable[str], limit_storage: str = "hash"
+    ) -> typing.Dict[str, int]:
+        return {
+            key: await self.clean(
+                LimitConfiguration(key=key, limit=1, limit_storage=limit_storage)
+            )
+            for key in keys
+        }
+
+    def iterate(self, key_pattern: str, count: int = None) -> typing.AsyncIterator[str]:
+        raise NotImplementedError()
+
+
+class RedisBackend(Backend):
+    """
+    Backend storing the execution slots of each key in a Redis hash or sorted set, which limits all hosts using the
+    same Redis server.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        cache_client: redis.Redis = None,
+        circuit: Circuit = None,
+    ):
+        self.client = client
+        self.cache_client = cache_client
+        self.circuit = circuit
+
+    def get_slots(self, limit_configuration: LimitConfiguration, priority: int = 0):
+        return self._guard(
+            get_slots(
+                self.client,
+                get_adaptive_configuration(self.client, limit_configuration),
+                priority,
+            )
+        )
+
+    def get_slot_group(self, limit_configurations: typing.Sequence[LimitConfiguration]):
+        return self._guard(
+            RedisSlotGroup(
+                self.client,
+                [
+                    get_adaptive_configuration(self.client, configuration)
+                    for configuration in limit_configurations
+                ],
+            )
+        )
+
+    def register(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        get_renewer().register(
+            self.client,
+            limit_configuration.key,
+            lock_ids,
+            limit_configuration.limit_expire,
+            limit_configuration.limit_storage,
+        )
+
+    def unregister(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        get_renewer().unregister(self.client, limit_configuration.key, lock_ids)
+
+    def adapt(
+        self, limit_configuration: LimitConfiguration, duration: float, failed: bool
+    ):
+        # Scopes limited by the process while the circuit is open do not adjust the limit on Redis.
+        if self.circuit is not None and self.circuit.is_open():
+            return
+
+        adapt(self.client, limit_configuration, duration, failed)
+
+    def wait(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        timeout: float,
+    ) -> bool:
+        if self.circuit is None:
+            # Clients without a blocking connection pool raise once all of their connections are in use, so the
+            # scopes fall back to sleeping for the interval instead.
+            count_commands()
+
+            try:
+                self.client.blpop(
+                    [
+                        configuration.get_notify_key()
+                        for configuration in limit_configurations
+                    ],
+                    timeout=timeout,
+                )
+            except MAX_CONNECTIONS_ERROR:
+                return False
+
+            return True
+
+        # While the circuit is open, or if Redis failed, the scopes fall back to sleeping for the interval.
+        if self.circuit.is_open():
+            return False
+
+        # The wait stays below the socket timeout, so an idle key does not count as a failed call.
+        count_commands()
+
+        try:
+            self.client.blpop(
+                [
+                    configuration.get_notify_key()
+                    for configuration in limit_configurations
+                ],
+                timeout=min(timeout, self.circuit.circuit_breaker.call_timeout / 2),
+            )
+        except redis.RedisError:
+            self.circuit.record(0.0, failed=True)
+            return False
+
+        return True
+
+    def get_limit(self, limit_configuration: LimitConfiguration) -> int:
+        return refresh_adaptive_configuration(self.client, limit_configuration).limit
+
+    def count(self, limit_configuration: LimitConfiguration) -> int:
+        lock_key = limit_configuration.key
+        current = int(time.time())
+
+        try:
+            # Replies of the client with client-side caching are served from memory until the key changes. The
+            # expiry of the execution slots is checked here, so cached replies stay valid while the time passes.
+            if limit_configuration.limit_storage == "zset":
+                return (self.cache_client or self.client).zcount(
+                    lock_key, f"({current}", "+inf"
+                )
+
+            if self.cache_client is not None:
+                lock_expires = self.cache_client.hvals(lock_key)
+            else:
+                lock_expires = (
+                    scan_lock_expire
+                    for _, scan_lock_expire in self.client.hscan_iter(lock_key)
+                )
+
+            return sum(_is_valid(lock_expire, current) for lock_expire in lock_expires)
+
+        except redis.ResponseError as exc:
+            if str(exc).startswith("WRONGTYPE"):
+                return 0
+
+            raise  # pragma: no cover
+
+    def clean(self, limit_configuration: LimitConfiguration) -> int:
+        client = self.client
+        current = int(time.time())
+        count = 0
+
+        lock_key = limit_configuration.key
+
+        # If the key does not contain the configured storage type, Redis fails with a WRONGTYPE exception that
+        # we handle by deleting the key and re-trying.
+        try:
+            if limit_configuration.limit_storage == "zset":
+                # The sorted set is scored by the expiry of each slot, so the stale slots are removed by their score.
+                count += client.zremrangebyscore(lock_key, "-inf", current)
+
+            else:
+                # The stale slots are collected while scanning, and removed in batches instead of one by one.
+                stale_lock_ids = (
+                    scan_lock_id
+                    for scan_lock_id, scan_lock_expire in client.hscan_iter(lock_key)
+                    if not _is_valid(scan_lock_expire, current)
+                )
+                for batch in _batched(stale_lock_ids, _CLEAN_BATCH):
+                    count += client.hdel(lock_key, *batch)
+
+        except redis.ResponseError as exc:
+            if str(exc).startswith("WRONGTYPE"):
+                client.delete(lock_key)
+                return 1
+
+            raise  # pragma: no cover
+
+        return count
+
+    def clean_many(
+        self, keys: typing.Iterable[str], limit_storage: str = "hash"
+    ) -> typing.Dict[str, int]:
+        # Each key is cleaned by a script filtering the stale slots on the server, and the scripts of a batch of keys
+        # are sent in a single pipeline. The scripts only access a single key each, so they work in a Redis Cluster.
+        counts = {}
+
+        for batch in _batched(keys, _CLEAN_BATCH):
+            try:
+                results = self._clean_batch(batch, limit_storage)
+
+            # Pipelines of Redis Cluster clients do not load scripts, so a missing script is loaded before trying
+            # again. Cleaning keys twice has no effect.
+            except redis.exceptions.NoScriptError:
+                self.client.script_load(CLEAN_SCRIPT)
+                results = self._clean_batch(batch, limit_storage)
+
+            counts.update(zip(batch, results))
+
+        return counts
+
+    def stats(
+        self, keys: typing.Iterable[str], batch_size: int = _CLEAN_BATCH
+    ) -> typing.Iterator[LimitStats]:
+        # Each key is summarized by a script on the server, so only a few numbers per key are transferred, and the
+        # scripts of a batch of keys are sent in a single pipeline. Only a single batch is held in memory at a time.
+        for batch in _batched(keys, batch_size):
+            try:
+                results = self._stats_batch(batch)
+
+            except redis.exceptions.NoScriptError:
+                self.client.script_load(STATS_SCRIPT)
+                results = self._stats_batch(batch)
+
+            for key, result in zip(batch, results):
+                if result is None:
+                    continue
+
+                _, count, stale, oldest_expire, newest_expire = result
+
+                yield LimitStats(
+                    key=key.decode() if isinstance(key, bytes) else key,
+                    count=count,
+                    stale=stale,
+                    oldest_expire=oldest_expire or None,
+                    newest_expire=newest_expire or None,
+                )
+
+    def iterate(self, key_pattern: str, count: int = None) -> typing.Iterator[str]:
+        return self.client.scan_iter(key_pattern, count=count)
+
+    def _stats_batch(self, keys: list) -> list:
+        stats_script = get_script(self.client, STATS_SCRIPT)
+        pipeline = get_pipeline(self.client)
+        current = int(time.time())
+
+        for key in keys:
+            stats_script(keys=[key], args=[current], client=pipeline)
+
+        return pipeline.execute()
+
+    def _clean_batch(self, keys: list, limit_storage: str) -> list:
+        clean_script = get_script(self.client, CLEAN_SCRIPT)
+        pipeline = get_pipeline(self.client)
+        current = int(time.time())
+
+        for key in keys:
+            clean_script(keys=[key], args=[current, limit_storage], client=pipeline)
+
+        return pipeline.execute()
+
+    def _guard(self, slots):
+        return slots if self.circuit is None else CircuitSlots(self.circuit, slots)
+
+
+class AsyncRedisBackend(AsyncBackend):
+    """
+    Backend storing the execution slots in Redis like the `RedisBackend`, using an asyncio Redis client.
+    """
+
+    def __init__(self, client: redis.asyncio.Redis, circuit: Circuit = None):
+        self.client = client
+        self.circuit = circuit
+
+    def get_slots(self, limit_configuration: LimitConfiguration, priority: int = 0):
+        return self._guard(
+            get_async_slots(
+                self.client,
+                get_adaptive_configuration(self.client, limit_configuration),
+                priority,
+            )
+        )
+
+    def get_slot_group(self, limit_configurations: typing.Sequence[LimitConfiguration]):
+        return self._guard(
+            AsyncRedisSlotGroup(
+                self.client,
+                [
+                    get_adaptive_configuration(self.client, configuration)
+                    for configuration in limit_configurations
+                ],
+            )
+        )
+
+    def register(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        get_async_renewer().register(
+            self.client,
+            limit_configuration.key,
+            lock_ids,
+            limit_configuration.limit_expire,
+            limit_configuration.limit_storage,
+        )
+
+    def unregister(self, limit_configuration: LimitConfiguration, lock_ids: list):
+        get_async_renewer().unregister(self.client, limit_configuration.key, lock_ids)
+
+    async def adapt(
+        self, limit_configuration: LimitConfiguration, duration: float, failed: bool
+    ):
+        if self.circuit is not None and self.circuit.is_open():
+            return
+
+        await async_adapt(self.client, limit_configuration, duration, failed)
+
+    async def wait(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        timeout: float,
+    ) -> bool:
+        if self.circuit is None:
+            count_commands()
+
+            try:
+                await self.client.blpop(
+                    [
+                        configuration.get_notify_key()
+                        for configuration in limit_configurations
+                    ],
+                    timeout=timeout,
+                )
+            except MAX_CONNECTIONS_ERROR:
+                return False
+
+            return True
+
+        if self.circuit.is_open():
+            return False
+
+        count_commands()
+
+        try:
+            await self.client.blpop(
+                [
+                    configuration.get_notify_key()
+                    for configuration in limit_configurations
+                ],
+                timeout=min(timeout, self.circuit.circuit_breaker.call_timeout / 2),
+            )
+        except redis.RedisError:
+            self.circuit.record(0.0, failed=True)
+            return False
+
+        return True
+
+    async def get_limit(self, limit_configuration: LimitConfiguration) -> int:
+        configuration = await async_refresh_adaptive_configuration(
+            self.client, limit_configuration
+        )
+        return configuration.limit
+
+    async def count(self, limit_configuration: LimitConfiguration) -> int:
+        lock_key = limit_configuration.key
+        current = int(time.time())
+
+        try:
+            if limit_configuration.limit_storage == "zset":
+                return await self.client.zcount(lock_key, f"({current}", "+inf")
+
+            return sum(
+                _is_valid(scan_lock_expire, current)
+                for scan_lock_expire in await self.client.hvals(lock_key)
+            )
+
+        except redis.ResponseError as exc:
+            if str(exc).startswith("WRONGTYPE"):
+                return 0
+
+            raise  # pragma: no cover
+
+    async def clean(self, limit_configuration: LimitConfiguration) -> int:
+        client = self.client
+        current = int(time.time())
+        count = 0
+
+        lock_key = limit_configuration.key
+
+        try:
+            if limit_configuration.limit_storage == "zset":
+                count += await client.zremrangebyscore(lock_key, "-inf", current)
+
+            else:
+                stale_lock_ids = [
+                    scan_lock_id
+                    async for scan_lock_id, scan_lock_expire in client.hscan_iter(
+                        lock_key
+                    )
+                    if not _is_valid(scan_lock_expire, current)
+                ]
+                for batch in _batched(stale_lock_ids, _CLEAN_BATCH):
+                    count += await client.hdel(lock_key, *batch)
+
+        except redis.ResponseError as exc:
+            if str(exc).startswith("WRONGTYPE"):
+                await client.delete(lock_key)
+                return 1
+
+            raise  # pragma: no cover
+
+        return count
+
+    async def clean_many(
+        self, keys: typing.Iterable[str], limit_storage: str = "hash"
+    ) -> typing.Dict[str, int]:
+        counts = {}
+
+        for batch in _batched(keys, _CLEAN_BATCH):
+            try:
+                results = await self._clean_batch(batch, limit_storage)
+            except redis.exceptions.NoScriptError:
+                await self.client.script_load(CLEAN_SCRIPT)
+                results = await self._clean_batch(batch, limit_storage)
+
+            counts.update(zip(batch, results))
+
+        return counts
+
+    def iterate(self, key_pattern: str, count: int = None) -> typing.AsyncIterator[str]:
+        return self.client.scan_iter(key_pattern, count=count)
+
+    async def _clean_batch(self, keys: list, limit_storage: str) -> list:
+        clean_script = get_script(self.client, CLEAN_SCRIPT)
+        pipeline = get_pipeline(self.client)
+        current = int(time.time())
+
+        for key in keys:
+            await clean_script(
+                keys=[key], args=[current, limit_storage], client=pipeline
+            )
+
+        return await pipeline.execute()
+
+    def _guard(self, slots):
+        if self.circuit is None:
+            return slots
+
+        return AsyncCircuitSlots(self.circuit, slots)
+
+
+class LocalBackend(Backend):
+    """
+    Backend storing the execution slots of each key in a file in shared memory of the local host, which limits the
+    processes of a single host. Execution slots are held until they are released or their process terminates.
+    """
+
+    def __init__(self, configuration: LocalConfiguration):
+        self.configuration = configuration
+
+    def get_slots(self, limit_configuration: LimitConfiguration, priority: int = 0):
+        return LocalSlots(self.configuration, limit_configuration)
+
+    def count(self, limit_configuration: LimitConfiguration) -> int:
+        return local_count(self.configuration, limit_configuration)
+
+    def clean(self, limit_configuration: LimitConfiguration) -> int:
+        return local_clean(self.configuration, limit_configuration)
+
+    def stats(
+        self, keys: typing.Iterable[str], batch_size: int = _CLEAN_BATCH
+    ) -> typing.Iterator[LimitStats]:
+        for key in keys:
+            count, stale = local_stats(self.configuration, key)
+
+            yield LimitStats(key=key, count=count, stale=stale)
+
+    def iterate(self, key_pattern: str, count: int = None) -> typing.Iterator[str]:
+        return local_iter(self.configuration, key_pattern)
+
+
+class AsyncLocalBackend(AsyncBackend):
+    """
+    Backend storing the execution slots in shared memory of the local host like the `LocalBackend`, for the asyncio
+    context managers. The files are only locked for a single read and write, so it does not yield to the event loop.
+    """
+
+    def __init__(self, configuration: LocalConfiguration):
+        self.configuration = configuration
+
+    def get_slots(self, limit_configuration: LimitConfiguration, priority: int = 0):
+        return AsyncLocalSlots(self.configuration, limit_configuration)
+
+    async def count(self, limit_configuration: LimitConfiguration) -> int:
+        return local_count(self.configuration, limit_configuration)
+
+    async def clean(self, limit_configuration: LimitConfiguration) -> int:
+        return local_clean(self.configuration, limit_configuration)
+
+    async def iterate(
+        self, key_pattern: str, count: int = None
+    ) -> typing.AsyncIterator[str]:
+        for key in local_iter(self.configuration, key_pattern):
+            yield key
+
+
+def _batched(items: typing.Iterable, size: int) -> typing.Iterator[list]:
+    iterator = iter(items)
+
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _is_valid(lock_expire, current: int) -> bool:
+    try:
+        return current < int(lock_expire)
+    except (ValueError, TypeError):
+        return False
+
+
+def get_backend(
+    configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+) -> Backend:
+    """
+    Gets the backend of a configuration. Backend instances are returned as they are, and an `AsyncLocalBackend` is
+    mapped to the `LocalBackend` of its configuration. Other asyncio backends raise a `TypeError`.
+
+    :param configuration: RedisConfiguration, LocalConfiguration or Backend object
+    :return: Backend
+    """
+    if isinstance(configuration, Backend):
+        return configuration
+
+    if isinstance(configuration, AsyncLocalBackend):
+        return LocalBackend(configuration.configuration)
+
+    if isinstance(configuration, AsyncBackend):
+        raise TypeError(
+            f"{type(configuration).__name__} is an asyncio backend, use a Backend instead"
+        )
+
+    if isinstance(configuration, LocalConfiguration):
+        return LocalBackend(configuration)
+
+    return RedisBackend(
+        get_redis(configuration),
+        get_cached_redis(configuration) if configuration.client_cache else None,
+        get_circuit(configuration) if configuration.circuit_breaker else None,
+    )
+
+
+def get_async_backend(
+    configuration: typing.Union[RedisConfiguration, LocalConfiguration, AsyncBackend],
+) -> AsyncBackend:
+    """
+    Gets the asyncio backend of a configuration. Backend instances are returned as they are, and a `LocalBackend` is
+    mapped to the `AsyncLocalBackend` of its configuration. Other synchronous backends raise a `TypeError`, as their
+    clients would block the event loop.
+
+    :param configuration: RedisConfiguration, LocalConfiguration or AsyncBackend object
+    :return: asyncio Backend
+    """
+    if isinstance(configuration, AsyncBackend):
+        return configuration
+
+    if isinstance(configuration, LocalBackend):
+        return AsyncLocalBackend(configuration.configuration)
+
+    if isinstance(configuration, Backend):
+        raise TypeError(
+            f"{type(configuration).__name__} is not an asyncio backend, use an AsyncBackend instead"
+        )
+
+    if isinstance(configuration, LocalConfiguration):
+        return AsyncLocalBackend(configuration)
+
+    return AsyncRedisBackend(
+        get_async_redis(configuration),
+        get_circuit(configuration) if configuration.circuit_breaker else None,
+    )
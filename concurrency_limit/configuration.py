@@ -1,10 +1,62 @@
 import dataclasses
+import os
+import random
+import tempfile
 import typing
 
 import redis
+import redis.asyncio
 import redis.connection
 
-__all__ = ["RedisConfiguration", "LimitConfiguration"]
+__all__ = [
+    "RedisConfiguration",
+    "LocalConfiguration",
+    "LimitConfiguration",
+    "Backoff",
+    "FixedBackoff",
+    "ExponentialBackoff",
+    "AdaptiveLimit",
+    "CircuitBreaker",
+]
+
+_MAX_EXPONENT = 64
+"Maximum exponent of the exponential backoff, beyond which every wait time is capped anyway."
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class CircuitBreaker:
+    """
+    Circuit breaker around the Redis calls of the context managers. After `failure_threshold` consecutive failed or
+    slow calls, the circuit opens, and the scopes of the process fall back to a process-local limit, or fail fast.
+    A background thread probes Redis every `reset_timeout` seconds, and closes the circuit once Redis responds again.
+    """
+
+    failure_threshold: int = 5
+    "Number of consecutive failed or slow calls after which the circuit opens."
+
+    slow_call_duration: typing.Optional[float] = None
+    "Duration in seconds above which a successful call counts as failed, or only errors if not set."
+
+    reset_timeout: float = 10.0
+    "Time in seconds between the probes of Redis while the circuit is open."
+
+    fallback: typing.Literal["local", "fail"] = "local"
+    "Limit the scopes by a process-local limit while the circuit is open, or fail fast using `fail`."
+
+    expected_nodes: int = 1
+    "Number of processes sharing the limits, the process-local limit is the `limit` divided by this number."
+
+    call_timeout: float = 5.0
+    "Socket timeout in seconds of the Redis calls, so a stalled Redis server fails the calls instead of blocking them."
+
+    def get_local_limit(self, limit: int) -> int:
+        """
+        Returns the process-local limit used while the circuit is open.
+
+        :param limit: Limit of the limit configuration
+        :return: Process-local limit, at least 1
+        """
+        return max(limit // self.expected_nodes, 1)
 
 
 @dataclasses.dataclass(eq=True, frozen=True)
@@ -35,7 +87,7 @@ class RedisConfiguration:
     "The maximum connections on the connection pool."
 
     timeout: int = 10
-    "The Redis server connection timeout."
+    "The Redis server connection timeout, and the time to wait for a free connection of the connection pool."
 
     secure: bool = False
     "Use secure connection to Redis server."
@@ -49,6 +101,24 @@ class RedisConfiguration:
     connection_pool: redis.ConnectionPool = None
     "Use this connection pool instance instead of the other fields, if set."
 
+    async_connection_pool: redis.asyncio.ConnectionPool = None
+    "Use this asyncio connection pool instance for asyncio clients instead of the other fields, if set."
+
+    cluster_nodes: typing.Tuple[typing.Tuple[str, int], ...] = None
+    "Seed nodes of a Redis Cluster as `(host, port)` tuples, connects to the cluster instead of `host`, if set."
+
+    sentinels: typing.Tuple[typing.Tuple[str, int], ...] = None
+    "Redis Sentinel nodes as `(host, port)` tuples, connects to the master monitored by them instead of `host`, if set."
+
+    sentinel_master: str = None
+    "The name of the master monitored by the Redis Sentinel nodes."
+
+    client_cache: bool = False
+    "Cache the reads of `limit_count` and `is_saturated` on the client, invalidated by Redis using RESP3 tracking."
+
+    circuit_breaker: typing.Optional[CircuitBreaker] = None
+    "Stop calling Redis after repeated failures or slow calls, and limit the scopes of the process locally meanwhile."
+
     def get_connection_class(self) -> typing.Type[redis.connection.AbstractConnection]:
         """
         Returns the `redis.Connection` class to use based on this configuration.
@@ -73,6 +143,40 @@ class RedisConfiguration:
 
         return redis.Connection
 
+    def get_socket_timeouts(self) -> dict:
+        """
+        Returns the socket timeouts of the Redis clients based on this configuration. If `circuit_breaker` is set, the
+        calls time out after its `call_timeout`, so a stalled Redis server counts as failed calls. Otherwise, the
+        calls wait for the Redis server as long as it takes.
+
+        :return: Keyword arguments of the Redis clients
+        """
+        if self.circuit_breaker is None:
+            return {}
+
+        return {
+            "socket_timeout": self.circuit_breaker.call_timeout,
+            "socket_connect_timeout": self.circuit_breaker.call_timeout,
+        }
+
+    def get_async_connection_class(
+        self,
+    ) -> typing.Type[redis.asyncio.connection.AbstractConnection]:
+        """
+        Returns the `redis.asyncio.Connection` class to use based on this configuration. The `redis.Connection` class
+        determined by `get_connection_class` is replaced by its asyncio counterpart. Other connection classes set
+        on `connection_class` are returned as they are.
+
+        :return: Determined `redis.asyncio.Connection` class
+        """
+        connection_class = self.get_connection_class()
+
+        return {
+            redis.Connection: redis.asyncio.Connection,
+            redis.SSLConnection: redis.asyncio.SSLConnection,
+            redis.UnixDomainSocketConnection: redis.asyncio.UnixDomainSocketConnection,
+        }.get(connection_class, connection_class)
+
     @classmethod
     def from_url(cls, url, **kwargs):
         """
@@ -97,6 +201,144 @@ class RedisConfiguration:
         return cls(**kwargs)
 
 
+@dataclasses.dataclass(eq=True, frozen=True)
+class LocalConfiguration:
+    """
+    Local host configuration, to store concurrency limits in shared memory of the local host instead of Redis. It
+    is used in place of a `RedisConfiguration` to limit the processes of a single host.
+    """
+
+    path: str = None
+    "The directory storing the concurrency limit files, defaults to `/dev/shm/concurrency-limit` if available."
+
+    def get_path(self) -> str:
+        """
+        Returns the directory storing the concurrency limit files. If no directory is configured, a directory in the
+        shared memory file system `/dev/shm` is used, or in the temporary directory on systems without it.
+
+        :return: Directory path
+        """
+        if self.path is not None:
+            return self.path
+
+        if os.path.isdir("/dev/shm"):
+            return "/dev/shm/concurrency-limit"
+
+        return os.path.join(tempfile.gettempdir(), "concurrency-limit")
+
+
+class Backoff:
+    """
+    Base class of the strategies computing the wait time between attempts to acquire an execution slot.
+    """
+
+    def get_interval(self, attempt: int, previous: float) -> float:
+        """
+        Returns the wait time before the next attempt to acquire an execution slot.
+
+        :param attempt: Number of failed attempts, starting with 1
+        :param previous: Previous wait time in seconds, or 0 before the first wait
+        :return: Wait time in seconds
+        """
+        raise NotImplementedError()
+
+    def get_max_interval(self) -> float:
+        """
+        Returns the longest wait time this strategy may return.
+
+        :return: Wait time in seconds
+        """
+        raise NotImplementedError()
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class FixedBackoff(Backoff):
+    """
+    Waits the same time between all attempts.
+    """
+
+    interval: float = 0.1
+    "Wait time between attempts."
+
+    def get_interval(self, attempt: int, previous: float) -> float:
+        return self.interval
+
+    def get_max_interval(self) -> float:
+        return self.interval
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class ExponentialBackoff(Backoff):
+    """
+    Waits exponentially longer after each failed attempt, capped by `cap`. The jitter randomizes the wait times, so
+    scopes that started waiting together do not retry in lockstep. Using `"full"` jitter, a random time between zero
+    and the exponential wait time is waited. Using `"decorrelated"` jitter, a random time between `base` and three
+    times the previous wait time is waited instead.
+    """
+
+    base: float = 0.01
+    "Wait time after the first attempt."
+
+    factor: float = 2.0
+    "Factor the wait time grows by after each attempt."
+
+    cap: float = 1.0
+    "Maximum wait time between attempts."
+
+    jitter: typing.Literal["none", "full", "decorrelated"] = "full"
+    "Randomization of the wait times, either `none`, `full` or `decorrelated`."
+
+    def get_interval(self, attempt: int, previous: float) -> float:
+        if self.jitter == "decorrelated":
+            return min(
+                self.cap, random.uniform(self.base, max(previous, self.base) * 3)
+            )
+
+        interval = min(
+            self.cap, self.base * self.factor ** min(attempt - 1, _MAX_EXPONENT)
+        )
+
+        if self.jitter == "full":
+            return random.uniform(0, interval)
+
+        return interval
+
+    def get_max_interval(self) -> float:
+        return self.cap
+
+
+@dataclasses.dataclass(eq=True, frozen=True)
+class AdaptiveLimit:
+    """
+    Adaptive concurrency limit, which adjusts the limit by the duration and the exceptions of the scopes using
+    additive increase and multiplicative decrease (AIMD). Each successful scope raises the limit by `increase` divided
+    by the limit, i.e. by `increase` once as many scopes as the limit succeeded. A scope that raised an exception, or
+    took more than `latency_tolerance` times the smoothed duration of the scopes, cuts the limit by `decrease`, at most
+    once per smoothed duration. The adjusted limit is stored in Redis, so all processes share it.
+    """
+
+    min_limit: int = 1
+    "Lower bound of the adjusted limit."
+
+    max_limit: typing.Optional[int] = None
+    "Upper bound of the adjusted limit, defaults to the `limit` of the limit configuration."
+
+    increase: float = 1.0
+    "Additive increase of the limit once as many scopes as the limit succeeded."
+
+    decrease: float = 0.5
+    "Factor the limit is multiplied by if the protected service is overloaded."
+
+    latency_tolerance: typing.Optional[float] = 2.0
+    "Factor of the smoothed scope duration above which a scope indicates overload, or only exceptions if not set."
+
+    smoothing: float = 0.1
+    "Weight of the duration of each successful scope in the smoothed scope duration."
+
+    expire: int = 3600
+    "Expire time of the adjusted limit on Redis, after which the `limit` of the limit configuration applies again."
+
+
 @dataclasses.dataclass(eq=True, frozen=True)
 class LimitConfiguration:
     """
@@ -117,3 +359,108 @@ class LimitConfiguration:
 
     limit_expire: int = 60
     "Expire time for the concurrency counter on Redis."
+
+    limit_weight: int = 1
+    "Number of execution slots a scope consumes, at least 1 and at most `limit`, to limit scopes by their load."
+
+    limit_renew: bool = False
+    "Renew the expire time of acquired execution slots in the background while the scope is executed."
+
+    limit_prefetch: int = 0
+    "Number of execution slots a process reserves at once, to hand them out to its scopes without Redis round trips."
+
+    limit_prefetch_idle: float = 1.0
+    "Time after which reserved execution slots that were not used are returned to Redis."
+
+    limit_storage: typing.Literal["hash", "zset"] = "hash"
+    "Redis data type storing the execution slots of a concurrency group, either `hash` or `zset`."
+
+    limit_notify: bool = False
+    "Wait for released execution slots using blocking notifications instead of polling, ignored if `limit_fair` is set."
+
+    limit_fair: bool = False
+    "Grant execution slots to waiting scopes in their order of arrival, using a queue of tickets on Redis."
+
+    limit_priority_aging: typing.Optional[float] = None
+    "Wait time after which a waiting scope ranks like one of the next higher priority, or strict priorities if not set."
+
+    limit_backoff: typing.Optional[Backoff] = None
+    "Strategy computing the wait time between attempts to acquire an execution slot instead of `limit_interval`."
+
+    limit_janitor: bool = False
+    "Clean stale execution slots of the key in the background while the process uses it, using the janitor thread."
+
+    limit_adaptive: typing.Optional[AdaptiveLimit] = None
+    "Adjust the limit by the duration and exceptions of the scopes, starting from `limit`, which is shared via Redis."
+
+    limit_saturation_cache: float = 0.0
+    "Time a rejection is cached by the process, during which scopes with a `limit_timeout` of 0 are rejected locally."
+
+    def __post_init__(self):
+        if self.limit_weight < 1:
+            raise ValueError(
+                f"limit_weight must be at least 1, got {self.limit_weight}"
+            )
+
+        # A scope consuming more execution slots than the limit allows would wait until it times out. A limit of 0
+        # rejects all scopes on purpose, so it is not compared.
+        if 1 <= self.limit < self.limit_weight:
+            raise ValueError(
+                f"limit_weight must not exceed the limit of {self.limit}, got {self.limit_weight}"
+            )
+
+    def get_max_interval(self) -> float:
+        """
+        Returns the longest wait time between attempts to acquire an execution slot.
+
+        :return: Wait time in seconds
+        """
+        if self.limit_backoff is None:
+            return self.limit_interval
+
+        return self.limit_backoff.get_max_interval()
+
+    def get_notify_key(self) -> str:
+        """
+        Returns the Redis key of the notification list used if `limit_notify` is set. The key shares the hash tag
+        of the concurrency limit key, so both keys are stored in the same slot of a Redis Cluster.
+
+        :return: Notification list key
+        """
+        return self._get_tagged_key("notify")
+
+    def get_queue_key(self) -> str:
+        """
+        Returns the Redis key of the sorted set ordering the tickets of waiting scopes if `limit_fair` is set. The key
+        shares the hash tag of the concurrency limit key.
+
+        :return: Queue key
+        """
+        return self._get_tagged_key("queue")
+
+    def get_ticket_key(self) -> str:
+        """
+        Returns the Redis key of the hash storing the expiry of the tickets of waiting scopes if `limit_fair` is set.
+        The key shares the hash tag of the concurrency limit key.
+
+        :return: Ticket key
+        """
+        return self._get_tagged_key("tickets")
+
+    def get_adaptive_key(self) -> str:
+        """
+        Returns the Redis key of the hash storing the adjusted limit if `limit_adaptive` is set. The key shares the
+        hash tag of the concurrency limit key.
+
+        :return: Adaptive limit key
+        """
+        return self._get_tagged_key("adaptive")
+
+    def _get_tagged_key(self, suffix: str) -> str:
+        start = self.key.find("{")
+        end = self.key.find("}", start + 1)
+
+        if start != -1 and end > start + 1:
+            return f"{self.key}:{suffix}"
+
+        return f"{{{self.key}}}:{suffix}"
@@ -1,19 +1,27 @@
+import asyncio
 import contextlib
 import time
+import typing
 import uuid
 
-import redis
-
-from ._connections import *
+from ._janitor import *
+from ._saturation import *
+from ._scripts import *
+from .backends import *
 from .configuration import *
 from .exceptions import *
+from .metrics import *
 
-__all__ = ["limit"]
+__all__ = ["limit", "alimit", "limit_all", "alimit_all"]
+
+_NOTIFY_MAX_WAIT = 1.0
+"Maximum time to block on the notification list, so slots freed by expiry instead of release are noticed too."
 
 
-@contextlib.contextmanager
 def limit(
-    redis_configuration: RedisConfiguration, limit_configuration: LimitConfiguration
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    limit_configuration: LimitConfiguration,
+    priority: int = 0,
 ):
     """
     The `limit` method is a context manager that allows for executing a scoped block of code under a concurrency limit.
@@ -30,82 +38,485 @@ def limit(
             # Scoped block of code that will be executed under the concurrency limit.
             print(f"Executing the scoped block of code. Current count: {count}")
 
-    The method acquires an execution slot by increasing a concurrency counter stored in Redis, and checks if the
-    counter is below the configured limit. If the limit is exceeded, the method waits for the configured interval
-    before trying again. If the configured timeout is reached, a `ConcurrencyLimitExceededException` is raised. Upon
-    exiting the scoped block, the context manager releases the execution slot and updates the concurrency counter
-    in Redis accordingly.
+    The method acquires an execution slot by atomically checking the concurrency counter stored in Redis and
+    increasing it if it is below the configured limit. If the limit is exceeded, the method waits for the configured
+    interval, or the wait time of the configured `limit_backoff`, before trying again. If `limit_notify` is set, the
+    method instead blocks on Redis until another scope releases its execution slot. The wait time is cut short at the
+    configured timeout, and if it is reached, a `ConcurrencyLimitExceededException` is raised. Upon exiting the scoped
+    block, the context manager releases the execution slot and updates the concurrency counter in Redis accordingly.
+
+    If `limit_fair` is set, waiting scopes acquire their execution slots in their order of arrival. Waiting scopes of
+    a higher `priority` are granted first, unless the ones of lower priority waited longer than `limit_priority_aging`
+    per priority level in between. Fair scopes wait for the interval or backoff, as `limit_notify` is ignored.
+
+    If `limit_weight` is set, the scoped block consumes that number of execution slots, and the yielded count is the
+    number of execution slots in use including the ones of the scoped block.
+
+    If `limit_prefetch` is set, the execution slots are handed out from the slots reserved by the process without a
+    round trip, so the yielded count is the number of reserved execution slots in use by the process rather than the
+    number of execution slots in use by all processes. Use `limit_count` to count the latter.
+
+    If a `LocalConfiguration` is given instead of a `RedisConfiguration`, the execution slots are stored in shared
+    memory of the local host and only limit the processes of this host. Execution slots are held until they are
+    released or their process terminates, so `limit_expire`, `limit_renew`, `limit_notify`, `limit_prefetch` and
+    `limit_fair` are ignored. Any other store can be plugged in by passing a `Backend` instance instead.
+
+    If `limit_adaptive` is set, the limit is adjusted by the duration of the scoped blocks and the exceptions raised
+    by them, starting from `limit`. It is raised while the scoped blocks succeed in steady time, and cut if they slow
+    down or fail, and it is shared by all processes via Redis.
+
+    If `limit_janitor` is set, a background thread of the process cleans the stale execution slots of the key, e.g.
+    the ones of crashed processes, for as long as the process uses the key.
+
+    If `limit_saturation_cache` is set and `limit_timeout` is 0, a rejection is cached by the process for that time, so
+    further scopes of the key are rejected without a round trip, until a scope of the process releases its slot.
 
     Note: Any exceptions raised within the scoped block will propagate outside the scope of the `limit` method.
 
-    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis.
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to limit the processes of the local host, or Backend object.
     :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param priority: Priority of the scope if `limit_fair` is set, scopes of higher priority are granted first.
     """
 
-    class _LockAcquireException(Exception):
-        pass
+    backend = get_backend(redis_configuration)
+    _track(redis_configuration, [limit_configuration])
+
+    return _limit(
+        redis_configuration,
+        backend,
+        backend.get_slots(limit_configuration, priority),
+        [limit_configuration],
+    )
+
+
+def alimit(
+    redis_configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, AsyncBackend
+    ],
+    limit_configuration: LimitConfiguration,
+    priority: int = 0,
+):
+    """
+    The `alimit` method is the asyncio counterpart of the `limit` context manager. It uses an asyncio Redis client
+    and waits for an execution slot without blocking the event loop.
 
-    client = get_redis(redis_configuration)
+    Example usage:
+
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
+        limit_configuration = LimitConfiguration(key='my_key', limit=5, limit_timeout=10, limit_expire=30)
+
+        async with alimit(redis_configuration, limit_configuration) as count:
+            # Scoped block of code that will be executed under the concurrency limit.
+            print(f"Executing the scoped block of code. Current count: {count}")
+
+    The execution slot is released upon exiting the scoped block, even if the task gets cancelled while waiting for
+    an execution slot or while executing the scoped block.
+
+    Note: Any exceptions raised within the scoped block will propagate outside the scope of the `alimit` method.
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to limit the processes of the local host, or AsyncBackend object.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param priority: Priority of the scope if `limit_fair` is set, scopes of higher priority are granted first.
+    """
+
+    backend = get_async_backend(redis_configuration)
+    _track(redis_configuration, [limit_configuration])
+
+    return _alimit(
+        redis_configuration,
+        backend,
+        backend.get_slots(limit_configuration, priority),
+        [limit_configuration],
+    )
+
+
+def limit_all(
+    redis_configuration: typing.Union[RedisConfiguration, Backend],
+    limit_configurations: typing.Sequence[LimitConfiguration],
+):
+    """
+    The `limit_all` method is a context manager that allows for executing a scoped block of code under multiple
+    concurrency limits at once, e.g. a per-tenant limit and a global limit.
+
+    Example usage:
+
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
+        tenant_configuration = LimitConfiguration(key='{my_key}:tenant:1', limit=2)
+        global_configuration = LimitConfiguration(key='{my_key}:global', limit=10)
+
+        with limit_all(redis_configuration, [tenant_configuration, global_configuration]) as counts:
+            # Scoped block of code that will be executed under both concurrency limits.
+            print(f"Executing the scoped block of code. Current counts: {counts}")
+
+    The method acquires an execution slot on all concurrency limit keys using a single atomic script, either on all of
+    them or on none, so a waiting scope never holds an execution slot of one limit while it waits for another one.
+    The scope waits for the first `limit_backoff` or the shortest `limit_interval`, times out after the shortest
+    `limit_timeout` of the limit configurations, and blocks on Redis instead if all of them set `limit_notify`. Upon
+    exiting the scoped block, the execution slots of all keys are released in a single transaction. In a Redis
+    Cluster, all keys must share the same hash tag, e.g. `{my_key}`. The `limit_prefetch` and `limit_fair` options are
+    ignored.
+
+    Note: Any exceptions raised within the scoped block will propagate outside the scope of the `limit_all` method.
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        or Backend object supporting multiple limits.
+    :param limit_configurations: LimitConfiguration objects containing the configuration details for the limits.
+    :return: Context manager yielding the number of execution slots in use of each limit
+    """
+    backend = get_backend(redis_configuration)
+    _track(redis_configuration, limit_configurations)
+
+    return _limit(
+        redis_configuration,
+        backend,
+        backend.get_slot_group(limit_configurations),
+        limit_configurations,
+    )
+
+
+def alimit_all(
+    redis_configuration: typing.Union[RedisConfiguration, AsyncBackend],
+    limit_configurations: typing.Sequence[LimitConfiguration],
+):
+    """
+    The `alimit_all` method is the asyncio counterpart of the `limit_all` context manager.
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        or AsyncBackend object supporting multiple limits.
+    :param limit_configurations: LimitConfiguration objects containing the configuration details for the limits.
+    :return: Context manager yielding the number of execution slots in use of each limit
+    """
+    backend = get_async_backend(redis_configuration)
+    _track(redis_configuration, limit_configurations)
+
+    return _alimit(
+        redis_configuration,
+        backend,
+        backend.get_slot_group(limit_configurations),
+        limit_configurations,
+    )
+
+
+def _track(
+    configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, Backend, AsyncBackend
+    ],
+    limit_configurations: typing.Sequence[LimitConfiguration],
+):
+    # The janitor thread cleans the keys using synchronous backends, so keys of asyncio backends are not tracked.
+    if isinstance(configuration, AsyncBackend):
+        return
 
-    start = time.monotonic()
+    for limit_configuration in limit_configurations:
+        if limit_configuration.limit_janitor:
+            get_janitor().track(configuration, limit_configuration)
 
-    lock_limit = limit_configuration.limit
-    lock_key = limit_configuration.key
-    lock_expire = limit_configuration.limit_expire
-    lock_timeout = limit_configuration.limit_timeout
-    lock_interval = limit_configuration.limit_interval
-    lock_id = str(uuid.uuid4())
+
+class _Attempts:
+    """
+    State of a scope while it acquires, holds and releases its execution slots, shared by `_limit` and `_alimit`. It
+    keeps the attempts, the backoff and the deadline of the scope, and reports them to the observer.
+    """
+
+    def __init__(
+        self,
+        redis_configuration: typing.Union[
+            RedisConfiguration, LocalConfiguration, Backend, AsyncBackend
+        ],
+        limit_configurations: typing.Sequence[LimitConfiguration],
+    ):
+        self.redis_configuration = redis_configuration
+        self.limit_configurations = limit_configurations
+        self.start = time.monotonic()
+
+        self.lock_timeout = min(
+            configuration.limit_timeout for configuration in limit_configurations
+        )
+        lock_interval = min(
+            configuration.limit_interval for configuration in limit_configurations
+        )
+        # A notification of a released slot wakes up a single waiting scope. Under a fair limit, it may wake up a
+        # scope that is not next in line, and get lost for the one that is, so fair scopes poll instead.
+        self.lock_notify = all(
+            configuration.limit_notify for configuration in limit_configurations
+        ) and not (
+            len(limit_configurations) == 1 and limit_configurations[0].limit_fair
+        )
+        lock_weight = max(
+            configuration.limit_weight for configuration in limit_configurations
+        )
+        self.lock_backoff = next(
+            (
+                configuration.limit_backoff
+                for configuration in limit_configurations
+                if configuration.limit_backoff is not None
+            ),
+            FixedBackoff(lock_interval),
+        )
+        self.lock_ids = [str(uuid.uuid4()) for _ in range(lock_weight)]
+        self.lock_renew_items = []
+        # Whether the scope may hold execution slots, which are released when the scope exits. An acquisition that
+        # raised an error may have acquired the execution slots nevertheless, so they are released in that case too.
+        self.holding = False
+        self.attempt = 0
+        self.interval = 0.0
+        self.elapsed = 0.0
+        self.scope_start = None
+        self.scope_duration = None
+        self.scope_failed = False
+        self.observer = get_observer()
+        self.observer.on_acquire_start(limit_configurations)
+        # The Redis commands are counted per thread or asyncio task, so the ones sent by this scope are the difference.
+        self.commands_start = get_command_count()
+
+        # Rejections of fast-failing scopes of a single limit are cached by the process if `limit_saturation_cache`
+        # is set.
+        self.saturation_cache = get_saturation_cache()
+        self.saturation_key = None
+        self.saturation_cached = False
+
+        if (
+            len(limit_configurations) == 1
+            and self.lock_timeout <= 0
+            and limit_configurations[0].limit_saturation_cache > 0
+        ):
+            self.saturation_key = (redis_configuration, limit_configurations[0].key)
+
+    def is_saturated(self) -> bool:
+        # A fast-failing scope of a key that rejected a scope moments ago is rejected without a round trip.
+        if self.saturation_key is None or not self.saturation_cache.is_saturated(
+            self.saturation_key
+        ):
+            return False
+
+        self.saturation_cached = True
+
+        return True
+
+    def rejected(self):
+        # Waiting scopes of fair limits keep their tickets in the queue, which are removed by the release.
+        self.holding = any(
+            configuration.limit_fair for configuration in self.limit_configurations
+        )
+
+        if self.saturation_key is not None:
+            self.saturation_cache.mark(
+                self.saturation_key, self.limit_configurations[0].limit_saturation_cache
+            )
+
+    def retry(self, slots) -> float:
+        self.elapsed = time.monotonic() - self.start
+
+        # If we are waiting longer than the configured timeout, we raise a `ConcurrencyLimitExceededException`
+        # exception. Executing the context manager's scope failed in this case.
+        if self.elapsed > self.lock_timeout:
+            self.observer.on_rejected(
+                self.limit_configurations,
+                self.elapsed,
+                self.attempt + 1 - self.saturation_cached,
+                get_command_count() - self.commands_start,
+            )
+            raise ConcurrencyLimitExceededException(
+                limit=slots.limit_configuration.limit, timeout=self.lock_timeout
+            )
+
+        self.attempt += 1
+
+        # The time to block for a notification of a released execution slot.
+        return max(min(self.lock_timeout - self.elapsed, _NOTIFY_MAX_WAIT), 0.001)
+
+    def get_interval(self) -> float:
+        # The wait never exceeds the remaining timeout, so the last attempt happens at the deadline.
+        self.interval = self.lock_backoff.get_interval(self.attempt, self.interval)
+
+        return max(min(self.interval, self.lock_timeout - self.elapsed), 0)
+
+    def acquired(self, backend: typing.Union[Backend, AsyncBackend], slots):
+        # The expire time of the execution slot is renewed in the background while the scope is executed.
+        self.lock_renew_items = [
+            (configuration, configuration_lock_ids)
+            for configuration, configuration_lock_ids in slots.items(self.lock_ids)
+            if configuration.limit_renew
+        ]
+        for configuration, configuration_lock_ids in self.lock_renew_items:
+            backend.register(configuration, configuration_lock_ids)
+
+        self.scope_start = time.monotonic()
+        self.observer.on_acquired(
+            self.limit_configurations,
+            self.scope_start - self.start,
+            self.attempt + 1,
+            get_command_count() - self.commands_start,
+        )
+
+    def failed(self, exception: Exception):
+        # Exceptions raised by the scoped block are not observed, and timeouts were observed as rejections already.
+        if not self.scope_failed and not isinstance(
+            exception, ConcurrencyLimitExceededException
+        ):
+            self.observer.on_error(self.limit_configurations, exception)
+
+    def unregister(self, backend: typing.Union[Backend, AsyncBackend]):
+        for configuration, configuration_lock_ids in self.lock_renew_items:
+            backend.unregister(configuration, configuration_lock_ids)
+
+        if self.scope_start is not None:
+            self.scope_duration = time.monotonic() - self.scope_start
+
+    def released(self) -> list:
+        """
+        Reports the released execution slots of the scope.
+
+        :return: Limit configurations whose limit is adjusted by the outcome of the scope
+        """
+        if self.scope_start is None:
+            return []
+
+        self.observer.on_released(self.limit_configurations, self.scope_duration)
+
+        # The released execution slots are free for the fast-failing scopes of the process right away.
+        for configuration in self.limit_configurations:
+            if configuration.limit_saturation_cache > 0:
+                self.saturation_cache.invalidate(
+                    (self.redis_configuration, configuration.key)
+                )
+
+        return [
+            configuration
+            for configuration in self.limit_configurations
+            if configuration.limit_adaptive is not None
+        ]
+
+
+@contextlib.contextmanager
+def _limit(
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    backend: Backend,
+    slots,
+    limit_configurations: typing.Sequence[LimitConfiguration],
+):
+    attempts = _Attempts(redis_configuration, limit_configurations)
 
     try:
         # We loop as long as it was not possible to execute the context manager's scope.
         while True:
-            try:
-                # First we check if we should try to acquire an execution slot. If the limit is already exceeded,
-                # there is no need to set the lock-key. If the key does not contain a hash, Redis fails with a
-                # WRONGTYPE exception that we handle by deleting the key and re-trying.
-                try:
-                    count = client.hlen(lock_key)
-                    if count >= lock_limit:
-                        raise _LockAcquireException()
-
-                except redis.ResponseError as exc:
-                    if str(exc).startswith("WRONGTYPE"):
-                        client.delete(lock_key)
-                        continue
-
-                    raise  # pragma: no cover
-
-                # We have the chance to acquire a slot, so we set current id on the lock-key. After doing so, we
-                # re-check the number of acquired slots, and are re-trying if we now exceeded the limit.
-                count = (
-                    client.pipeline()
-                    .hset(lock_key, lock_id, int(time.time()) + lock_expire)
-                    .expire(lock_key, lock_expire)
-                    .hlen(lock_key)
-                    .execute()[-1]
-                )
+            if not attempts.is_saturated():
+                # We try to acquire an execution slot using a single atomic script. The script prunes expired slots,
+                # checks the number of acquired slots, and sets the current ids on the lock-key if the limit is not
+                # exceeded. A scope acquires one slot id per unit of `limit_weight`, either all of them or none. If
+                # the key does not contain the configured storage type, the script deletes it. If `limit_prefetch` is
+                # set, the execution slots are taken from the slots reserved by the process instead. For multiple
+                # limits, the script acquires the execution slots of all keys or of none.
+                attempts.holding = True
+                count, attempts.lock_ids = slots.acquire(attempts.lock_ids)
+
+                if count:
+                    break
+
+                attempts.rejected()
+
+            # We failed to acquire an execution slot for the context manager's scope, but we want to try again.
+            # However, we wait for a released slot to be notified, or the configured interval or backoff before we do
+            # so.
+            notify_timeout = attempts.retry(slots)
+
+            if not attempts.lock_notify or not backend.wait(
+                limit_configurations, notify_timeout
+            ):
+                time.sleep(attempts.get_interval())
+
+        # Now we are in the critical section and yield to the context manager's scope. The duration of the scope, and
+        # whether it raised an exception, adjust the limit if `limit_adaptive` is set.
+        attempts.acquired(backend, slots)
+
+        try:
+            yield count
+        except Exception:
+            attempts.scope_failed = True
+            raise
+
+    except Exception as exception:
+        attempts.failed(exception)
+        raise
+
+    finally:
+        attempts.unregister(backend)
+
+        # Rejected scopes hold no execution slots, so they are rejected without another round trip.
+        try:
+            if attempts.holding:
+                slots.release(*attempts.lock_ids)
+        except Exception as exception:
+            attempts.observer.on_error(limit_configurations, exception)
+            raise
+
+        for configuration in attempts.released():
+            backend.adapt(configuration, attempts.scope_duration, attempts.scope_failed)
+
+
+@contextlib.asynccontextmanager
+async def _alimit(
+    redis_configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, AsyncBackend
+    ],
+    backend: AsyncBackend,
+    slots,
+    limit_configurations: typing.Sequence[LimitConfiguration],
+):
+    attempts = _Attempts(redis_configuration, limit_configurations)
+
+    try:
+        # We loop as long as it was not possible to execute the context manager's scope.
+        while True:
+            if not attempts.is_saturated():
+                # We try to acquire an execution slot using the same atomic script as the `limit` context manager.
+                attempts.holding = True
+                count, attempts.lock_ids = await slots.acquire(attempts.lock_ids)
+
+                if count:
+                    break
 
-                if count > lock_limit:
-                    client.hdel(lock_key, lock_id)
-                    raise _LockAcquireException()
+                attempts.rejected()
 
-                # Now we are in the critical section and yield to the context manager's scope.
-                yield count
-                break
+            # We wait for a released slot to be notified, or the configured interval or backoff, without blocking the
+            # event loop.
+            notify_timeout = attempts.retry(slots)
 
-            except _LockAcquireException:
-                elapsed = time.monotonic() - start
+            if not attempts.lock_notify or not await backend.wait(
+                limit_configurations, notify_timeout
+            ):
+                await asyncio.sleep(attempts.get_interval())
 
-                # If we are waiting longer than the configured timeout, we raise a `ConcurrencyLimitExceededException`
-                # exception. Executing the context manager's scope failed in this case.
-                if elapsed > lock_timeout:
-                    raise ConcurrencyLimitExceededException(
-                        limit=lock_limit, timeout=lock_timeout
-                    )
+        attempts.acquired(backend, slots)
 
-                # We failed to acquire an execution slot for the context manager's scope, but we want to try again.
-                # However, we wait the configured interval before we do so.
-                time.sleep(lock_interval)
+        try:
+            yield count
+        except Exception:
+            attempts.scope_failed = True
+            raise
+
+    except Exception as exception:
+        attempts.failed(exception)
+        raise
 
     finally:
-        client.hdel(lock_key, lock_id)
+        attempts.unregister(backend)
+
+        # The release is shielded, so the execution slot is released even if the task gets cancelled meanwhile.
+        try:
+            if attempts.holding:
+                await asyncio.shield(slots.release(*attempts.lock_ids))
+        except Exception as exception:
+            attempts.observer.on_error(limit_configurations, exception)
+            raise
+
+        for configuration in attempts.released():
+            await backend.adapt(
+                configuration, attempts.scope_duration, attempts.scope_failed
+            )
@@ -0,0 +1,66 @@
+import functools
+import inspect
+import typing
+
+from .backends import *
+from .configuration import *
+from .context_managers import *
+
+__all__ = ["limited"]
+
+
+def limited(
+    redis_configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, Backend, AsyncBackend
+    ],
+    limit_configuration: LimitConfiguration,
+    priority: int = 0,
+):
+    """
+    The `limited` method is a decorator that executes each call of the decorated function under a concurrency limit.
+    It works for regular functions using the `limit` context manager, and for coroutine functions using the `alimit`
+    context manager.
+
+    Example usage:
+
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
+        limit_configuration = LimitConfiguration(key='my_key', limit=5, limit_timeout=10, limit_expire=30)
+
+        @limited(redis_configuration, limit_configuration)
+        def do_something_magic():
+            ...
+
+        @limited(redis_configuration, limit_configuration)
+        async def do_something_magic_async():
+            ...
+
+    Note: If no execution slot is acquired within the configured timeout, the call raises a
+    `ConcurrencyLimitExceededException` without executing the decorated function.
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to limit the processes of the local host, or Backend object for regular functions
+        and AsyncBackend object for coroutine functions.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param priority: Priority of the calls if `limit_fair` is set, calls of higher priority are granted first.
+    """
+
+    def _decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                async with alimit(redis_configuration, limit_configuration, priority):
+                    return await func(*args, **kwargs)
+
+            return _async_wrapper
+
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            with limit(redis_configuration, limit_configuration, priority):
+                return func(*args, **kwargs)
+
+        return _wrapper
+
+    return _decorator
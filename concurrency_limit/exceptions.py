@@ -1,4 +1,8 @@
-__all__ = ["ConcurrencyLimitException", "ConcurrencyLimitExceededException"]
+__all__ = [
+    "ConcurrencyLimitException",
+    "ConcurrencyLimitExceededException",
+    "ConcurrencyLimitUnavailableException",
+]
 
 
 class ConcurrencyLimitException(Exception):
@@ -16,3 +20,7 @@ class ConcurrencyLimitException(Exception):
 
 class ConcurrencyLimitExceededException(ConcurrencyLimitException):
     _msg_template = "Exceeded the concurrency limit of {limit} executions. Waited for {timeout} seconds."
+
+
+class ConcurrencyLimitUnavailableException(ConcurrencyLimitException):
+    _msg_template = "Redis is unavailable, the circuit breaker opened after {failures} failed calls."
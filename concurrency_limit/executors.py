@@ -0,0 +1,285 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import queue
+import threading
+import typing
+
+from .backends import *
+from .configuration import *
+from .context_managers import *
+
+__all__ = ["LimitedExecutor", "bounded_map"]
+
+
+class LimitedExecutor(concurrent.futures.Executor):
+    """
+    Executor wrapping a `concurrent.futures` thread or process pool, which dispatches each submitted task to the pool
+    only once an execution slot has been acquired. A single dispatcher thread acquires the execution slots in the order
+    the tasks were submitted, so the workers of the pool never block while waiting for an execution slot. The execution
+    slot of a task is released as soon as the task is done.
+
+    Example usage:
+
+        from concurrent.futures import ThreadPoolExecutor
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
+        limit_configuration = LimitConfiguration(key='my_key', limit=5, limit_timeout=10, limit_expire=30)
+
+        with LimitedExecutor(ThreadPoolExecutor(5), redis_configuration, limit_configuration) as executor:
+            results = list(executor.map(do_something_magic, items))
+
+    If no execution slot is acquired within the configured timeout, the future of the task fails with a
+    `ConcurrencyLimitExceededException`. Tasks may be cancelled as long as they wait for an execution slot.
+    """
+
+    def __init__(
+        self,
+        executor: concurrent.futures.Executor,
+        redis_configuration: typing.Union[
+            RedisConfiguration, LocalConfiguration, Backend
+        ],
+        limit_configuration: LimitConfiguration,
+        priority: int = 0,
+    ):
+        self.executor = executor
+        self.redis_configuration = redis_configuration
+        self.limit_configuration = limit_configuration
+        self.priority = priority
+
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._shutdown = False
+        self._cancel_futures = False
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Submits a task, which is dispatched to the wrapped pool once an execution slot has been acquired.
+
+        :param fn: Callable to execute
+        :return: Future of the task
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            future = concurrent.futures.Future()
+            self._queue.put((future, fn, args, kwargs))
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._dispatch,
+                    name="concurrency-limit-dispatcher",
+                    daemon=True,
+                )
+                self._thread.start()
+
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """
+        Shuts down the executor after all submitted tasks have been dispatched, and shuts down the wrapped pool. Without
+        `wait`, the dispatcher keeps dispatching the submitted tasks in the background, and shuts down the wrapped pool
+        once it is done.
+
+        :param wait: Wait until all submitted tasks are done
+        :param cancel_futures: Cancel all submitted tasks that were not dispatched yet
+        """
+        with self._lock:
+            self._shutdown = True
+            self._cancel_futures = cancel_futures
+
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    if item is not None:
+                        item[0].cancel()
+
+            thread = self._thread
+            self._queue.put(None)
+
+        if thread is None:
+            self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+        elif wait:
+            thread.join()
+            self.executor.shutdown(wait=True, cancel_futures=cancel_futures)
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+
+            # The dispatcher stops once all tasks submitted before the shutdown were dispatched.
+            if item is None:
+                self.executor.shutdown(wait=False, cancel_futures=self._cancel_futures)
+                return
+
+            future, fn, args, kwargs = item
+
+            if future.cancelled():
+                continue
+
+            scope = limit(
+                self.redis_configuration, self.limit_configuration, self.priority
+            )
+
+            try:
+                scope.__enter__()
+            except BaseException as e:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+
+                continue
+
+            # Tasks cancelled while waiting for their execution slot give it up immediately.
+            if not future.set_running_or_notify_cancel():
+                scope.__exit__(None, None, None)
+                continue
+
+            try:
+                task = self.executor.submit(fn, *args, **kwargs)
+            except BaseException as e:
+                scope.__exit__(type(e), e, e.__traceback__)
+                future.set_exception(e)
+                continue
+
+            task.add_done_callback(functools.partial(self._done, future, scope))
+
+    @staticmethod
+    def _done(
+        future: concurrent.futures.Future,
+        scope: contextlib.AbstractContextManager,
+        task: concurrent.futures.Future,
+    ):
+        # The exception of the task is passed to the scope, so adaptive limits and observers see the failed task.
+        exception = None if task.cancelled() else task.exception()
+
+        try:
+            if exception is None:
+                scope.__exit__(None, None, None)
+            else:
+                scope.__exit__(type(exception), exception, exception.__traceback__)
+
+        finally:
+            if task.cancelled():
+                future.set_exception(concurrent.futures.CancelledError())
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+
+async def bounded_map(
+    redis_configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, AsyncBackend
+    ],
+    limit_configuration: LimitConfiguration,
+    func: typing.Callable[[typing.Any], typing.Awaitable],
+    iterable: typing.Iterable,
+    priority: int = 0,
+) -> list:
+    """
+    The `bounded_map` method applies a coroutine function to all items of an iterable concurrently, like
+    `asyncio.gather`, but under a concurrency limit. The execution slots are acquired one after another in the order
+    of the items, and the task of an item is only created once its execution slot has been acquired, so there are never
+    more waiting tasks than items being processed.
+
+    Example usage:
+
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
+        limit_configuration = LimitConfiguration(key='my_key', limit=5, limit_timeout=10, limit_expire=30)
+
+        results = await bounded_map(redis_configuration, limit_configuration, do_something_magic, items)
+
+    Note: If a task fails, or no execution slot is acquired within the configured timeout, all remaining tasks are
+    cancelled and the exception propagates.
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to limit the processes of the local host, or AsyncBackend object.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :param func: Coroutine function to apply to each item
+    :param iterable: Items to process
+    :param priority: Priority of the tasks if `limit_fair` is set, tasks of higher priority are granted first.
+    :return: List of the results in the order of the items
+    """
+
+    tasks = []
+
+    try:
+        await _bounded_dispatch(
+            redis_configuration, limit_configuration, func, iterable, priority, tasks
+        )
+
+        return await asyncio.gather(*tasks)
+
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+
+        # The cancelled tasks are awaited, so they release their execution slots before the exception propagates.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _bounded_dispatch(
+    redis_configuration: typing.Union[
+        RedisConfiguration, LocalConfiguration, AsyncBackend
+    ],
+    limit_configuration: LimitConfiguration,
+    func: typing.Callable[[typing.Any], typing.Awaitable],
+    iterable: typing.Iterable,
+    priority: int,
+    tasks: list,
+):
+    """
+    Creates the task of each item of `bounded_map` once its execution slot has been acquired, and appends it to
+    `tasks`, so the caller cancels the created tasks if dispatching fails.
+    """
+    failed = []
+
+    def _failed(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            failed.append(task)
+
+    for item in iterable:
+        # We stop dispatching items as soon as a task failed, also if it failed while we waited for an execution
+        # slot. Its exception propagates from the gather of `bounded_map`.
+        if failed:
+            break
+
+        scope = alimit(redis_configuration, limit_configuration, priority)
+        await scope.__aenter__()
+
+        if failed:
+            await scope.__aexit__(None, None, None)
+            break
+
+        tasks.append(asyncio.ensure_future(_bounded_run(scope, func, item)))
+        tasks[-1].add_done_callback(_failed)
+
+
+async def _bounded_run(
+    scope: contextlib.AbstractAsyncContextManager,
+    func: typing.Callable[[typing.Any], typing.Awaitable],
+    item,
+):
+    """
+    Applies the coroutine function to an item of `bounded_map`, and exits the scope holding its execution slot.
+    """
+    try:
+        result = await func(item)
+    except BaseException as e:
+        await scope.__aexit__(type(e), e, e.__traceback__)
+        raise
+
+    await scope.__aexit__(None, None, None)
+    return result
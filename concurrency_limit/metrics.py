@@ -0,0 +1,462 @@
+import bisect
+import dataclasses
+import threading
+import typing
+
+from .configuration import *
+
+__all__ = [
+    "Observer",
+    "Histogram",
+    "KeyMetrics",
+    "MetricsAggregator",
+    "add_observer",
+    "remove_observer",
+    "get_observer",
+]
+
+_DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"Upper bounds of the histogram buckets in seconds, like the default buckets of the Prometheus clients."
+
+_FAMILIES = {
+    "started_total": ("counter", "Scopes that started to acquire execution slots."),
+    "acquired_total": ("counter", "Scopes that acquired execution slots."),
+    "released_total": ("counter", "Scopes that released execution slots."),
+    "rejected_total": ("counter", "Scopes that exceeded the concurrency limit."),
+    "errors_total": ("counter", "Scopes that failed due to an error."),
+    "attempts_total": ("counter", "Acquire attempts of the scopes."),
+    "redis_commands_total": (
+        "counter",
+        "Redis commands sent by the scopes to acquire execution slots.",
+    ),
+    "wait_seconds": ("histogram", "Time waited for execution slots."),
+    "hold_seconds": ("histogram", "Time the execution slots were held."),
+}
+"Type and help text of the metric families exported by `MetricsAggregator.to_prometheus`, by name without prefix."
+
+_observers = ()
+_observer_lock = threading.Lock()
+
+
+class Observer:
+    """
+    Base class of the instrumentation hooks of the context managers. All methods are called synchronously by the
+    scopes, so they must be fast and must not raise exceptions. The limit configurations are the ones of the scope,
+    i.e. a single one for `limit` and `alimit`, and all of them for `limit_all` and `alimit_all`.
+    """
+
+    def on_acquire_start(
+        self, limit_configurations: typing.Sequence[LimitConfiguration]
+    ):
+        """
+        Called when a scope starts to acquire its execution slots.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        """
+
+    def on_acquired(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        wait_time: float,
+        attempts: int,
+        redis_commands: int = 0,
+    ):
+        """
+        Called when a scope acquired its execution slots.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        :param wait_time: Time waited for the execution slots in seconds
+        :param attempts: Number of acquire attempts, which may be served by the process without calling Redis, e.g.
+            from prefetched execution slots
+        :param redis_commands: Number of Redis commands sent to acquire the execution slots, i.e. the acquire scripts,
+            the notification waits and the reads of adaptive limits, which is 0 for other backends
+        """
+
+    def on_released(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        hold_time: float,
+    ):
+        """
+        Called when a scope released its execution slots.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        :param hold_time: Time the execution slots were held in seconds
+        """
+
+    def on_rejected(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        wait_time: float,
+        attempts: int,
+        redis_commands: int = 0,
+    ):
+        """
+        Called when a scope raises a `ConcurrencyLimitExceededException`, as it reached its timeout.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        :param wait_time: Time waited for the execution slots in seconds
+        :param attempts: Number of attempts
+        :param redis_commands: Number of Redis commands sent while trying to acquire the execution slots
+        """
+
+    def on_error(
+        self,
+        limit_configurations: typing.Sequence[LimitConfiguration],
+        exception: Exception,
+    ):
+        """
+        Called when acquiring, waiting for or releasing execution slots failed. This covers the Redis errors, e.g. a
+        lost connection, which are told apart from other errors by being a `redis.RedisError`. Exceptions raised by the
+        scoped block are not reported.
+
+        :param limit_configurations: LimitConfiguration objects of the scope
+        :param exception: Raised exception
+        """
+
+
+class _Observers(Observer):
+    """
+    Observer calling all registered observers.
+    """
+
+    def __init__(self, observers: typing.Sequence[Observer]):
+        self.observers = tuple(observers)
+
+    def on_acquire_start(self, limit_configurations):
+        for observer in self.observers:
+            observer.on_acquire_start(limit_configurations)
+
+    def on_acquired(self, limit_configurations, wait_time, attempts, redis_commands=0):
+        for observer in self.observers:
+            observer.on_acquired(
+                limit_configurations, wait_time, attempts, redis_commands
+            )
+
+    def on_released(self, limit_configurations, hold_time):
+        for observer in self.observers:
+            observer.on_released(limit_configurations, hold_time)
+
+    def on_rejected(self, limit_configurations, wait_time, attempts, redis_commands=0):
+        for observer in self.observers:
+            observer.on_rejected(
+                limit_configurations, wait_time, attempts, redis_commands
+            )
+
+    def on_error(self, limit_configurations, exception):
+        for observer in self.observers:
+            observer.on_error(limit_configurations, exception)
+
+
+_observer = Observer()
+
+
+@dataclasses.dataclass
+class Histogram:
+    """
+    Histogram of durations with cumulative export in the style of Prometheus.
+    """
+
+    buckets: typing.Tuple[float, ...] = _DEFAULT_BUCKETS
+    "Upper bounds of the buckets in seconds."
+
+    counts: typing.List[int] = None
+    "Number of observations per bucket, the last one counts the observations above all bounds."
+
+    sum: float = 0.0
+    "Sum of all observations in seconds."
+
+    count: int = 0
+    "Number of observations."
+
+    def __post_init__(self):
+        if self.counts is None:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        """
+        Adds an observation.
+
+        :param value: Observed duration in seconds
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> typing.List[typing.Tuple[float, int]]:
+        """
+        Returns the cumulative number of observations up to each bound, ending with the bound `inf`.
+
+        :return: List of tuples of the upper bound and the number of observations up to it
+        """
+        total = 0
+        result = []
+
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+
+@dataclasses.dataclass
+class KeyMetrics:
+    """
+    Aggregated metrics of a concurrency limit key.
+    """
+
+    started: int = 0
+    "Number of scopes that started to acquire execution slots."
+
+    acquired: int = 0
+    "Number of scopes that acquired execution slots."
+
+    released: int = 0
+    "Number of scopes that released execution slots."
+
+    rejected: int = 0
+    "Number of scopes that raised a `ConcurrencyLimitExceededException`."
+
+    errors: int = 0
+    "Number of scopes that failed to acquire or release execution slots due to an error, e.g. a Redis error."
+
+    attempts: int = 0
+    "Number of acquire attempts of the scopes, including attempts served by the process without calling Redis."
+
+    redis_commands: int = 0
+    "Number of Redis commands sent by the scopes to acquire execution slots, including the ones of rejected scopes."
+
+    wait_time: Histogram = dataclasses.field(default_factory=Histogram)
+    "Time waited for execution slots by the scopes that acquired them."
+
+    hold_time: Histogram = dataclasses.field(default_factory=Histogram)
+    "Time the execution slots were held by the scopes."
+
+
+class MetricsAggregator(Observer):
+    """
+    In-process aggregator of counters and histograms per concurrency limit key, which is registered using
+    `add_observer`. The aggregated metrics are exported using `to_prometheus` in the Prometheus text format, or using
+    `collect` to a callback, e.g. an observable instrument of OpenTelemetry.
+
+    Example usage:
+
+        from concurrency_limit import *
+
+        aggregator = MetricsAggregator()
+        add_observer(aggregator)
+
+        print(aggregator.to_prometheus())
+    """
+
+    def __init__(self, buckets: typing.Sequence[float] = _DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def on_acquire_start(self, limit_configurations):
+        with self._lock:
+            for configuration in limit_configurations:
+                self._get(configuration.key).started += 1
+
+    def on_acquired(self, limit_configurations, wait_time, attempts, redis_commands=0):
+        with self._lock:
+            for configuration in limit_configurations:
+                metrics = self._get(configuration.key)
+                metrics.acquired += 1
+                metrics.attempts += attempts
+                metrics.redis_commands += redis_commands
+                metrics.wait_time.observe(wait_time)
+
+    def on_released(self, limit_configurations, hold_time):
+        with self._lock:
+            for configuration in limit_configurations:
+                metrics = self._get(configuration.key)
+                metrics.released += 1
+                metrics.hold_time.observe(hold_time)
+
+    def on_rejected(self, limit_configurations, wait_time, attempts, redis_commands=0):
+        with self._lock:
+            for configuration in limit_configurations:
+                metrics = self._get(configuration.key)
+                metrics.rejected += 1
+                metrics.attempts += attempts
+                metrics.redis_commands += redis_commands
+
+    def on_error(self, limit_configurations, exception):
+        with self._lock:
+            for configuration in limit_configurations:
+                self._get(configuration.key).errors += 1
+
+    def snapshot(self) -> typing.Dict[str, KeyMetrics]:
+        """
+        Returns a copy of the aggregated metrics per key.
+
+        :return: Dictionary of the metrics per key
+        """
+        with self._lock:
+            return {
+                key: dataclasses.replace(
+                    metrics,
+                    wait_time=dataclasses.replace(
+                        metrics.wait_time, counts=list(metrics.wait_time.counts)
+                    ),
+                    hold_time=dataclasses.replace(
+                        metrics.hold_time, counts=list(metrics.hold_time.counts)
+                    ),
+                )
+                for key, metrics in self._metrics.items()
+            }
+
+    def reset(self):
+        """
+        Removes all aggregated metrics.
+        """
+        with self._lock:
+            self._metrics.clear()
+
+    def collect(
+        self,
+        callback: typing.Callable[[str, float, typing.Dict[str, str]], None],
+        prefix: str = "concurrency_limit",
+    ):
+        """
+        Passes each aggregated value to the callback with its metric name and attributes. Counters are named like
+        `concurrency_limit_acquired_total`, and histograms are passed as their `_bucket`, `_sum` and `_count` values,
+        with the upper bound of each bucket as the `le` attribute.
+
+        :param callback: Callable taking the metric name, the value and the attributes
+        :param prefix: Prefix of the metric names
+        """
+        for key, metrics in sorted(self.snapshot().items()):
+            attributes = {"key": key}
+
+            for name in ("started", "acquired", "released", "rejected", "errors"):
+                callback(f"{prefix}_{name}_total", getattr(metrics, name), attributes)
+
+            callback(f"{prefix}_attempts_total", metrics.attempts, attributes)
+            callback(
+                f"{prefix}_redis_commands_total", metrics.redis_commands, attributes
+            )
+
+            for name, histogram in (
+                ("wait_seconds", metrics.wait_time),
+                ("hold_seconds", metrics.hold_time),
+            ):
+                for bound, count in histogram.cumulative():
+                    callback(
+                        f"{prefix}_{name}_bucket",
+                        count,
+                        {**attributes, "le": _format_bound(bound)},
+                    )
+
+                callback(f"{prefix}_{name}_sum", histogram.sum, attributes)
+                callback(f"{prefix}_{name}_count", histogram.count, attributes)
+
+    def to_prometheus(self, prefix: str = "concurrency_limit") -> str:
+        """
+        Returns the aggregated metrics in the Prometheus text exposition format. The samples of each metric family
+        are grouped below its `# HELP` and `# TYPE` lines.
+
+        :param prefix: Prefix of the metric names
+        :return: Metrics text
+        """
+        families = {}
+
+        def _line(name: str, value: float, attributes: typing.Dict[str, str]):
+            family = name[len(prefix) + 1 :]
+
+            # The samples of histograms are suffixed with `_bucket`, `_sum` or `_count`.
+            if family not in _FAMILIES:
+                family = family.rsplit("_", 1)[0]
+
+            labels = ",".join(
+                f'{label}="{_escape(text)}"' for label, text in attributes.items()
+            )
+            families.setdefault(family, []).append(f"{name}{{{labels}}} {value}")
+
+        self.collect(_line, prefix)
+
+        lines = []
+
+        for family, samples in families.items():
+            kind, text = _FAMILIES[family]
+            lines += [
+                f"# HELP {prefix}_{family} {text}",
+                f"# TYPE {prefix}_{family} {kind}",
+                *samples,
+            ]
+
+        return "".join(f"{line}\n" for line in lines)
+
+    def _get(self, key: str) -> KeyMetrics:
+        metrics = self._metrics.get(key)
+
+        if metrics is None:
+            metrics = self._metrics[key] = KeyMetrics(
+                wait_time=Histogram(self.buckets), hold_time=Histogram(self.buckets)
+            )
+
+        return metrics
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def add_observer(observer: Observer):
+    """
+    Registers an observer, which is called by all scopes of the process.
+
+    :param observer: Observer to register
+    """
+    global _observers
+    global _observer
+    global _observer_lock
+
+    with _observer_lock:
+        _observers = (*_observers, observer)
+        _observer = _Observers(_observers)
+
+
+def remove_observer(observer: Observer):
+    """
+    Unregisters an observer.
+
+    :param observer: Observer to unregister
+    """
+    global _observers
+    global _observer
+    global _observer_lock
+
+    with _observer_lock:
+        _observers = tuple(item for item in _observers if item is not observer)
+        _observer = _Observers(_observers) if _observers else Observer()
+
+
+def get_observer() -> Observer:
+    """
+    Gets the observer calling all registered observers. If no observer is registered, an observer doing nothing is
+    returned.
+
+    :return: Observer
+    """
+    return _observer
@@ -1,58 +1,181 @@
-import time
+import typing
 
-import redis
-
-from ._connections import *
+from .backends import *
 from .configuration import *
 
-__all__ = ["limit_clean", "limit_iter"]
+__all__ = [
+    "limit_clean",
+    "limit_clean_many",
+    "limit_iter",
+    "limit_stats",
+    "limit_count",
+    "is_saturated",
+]
+
+_AUXILIARY_SUFFIXES = (":notify", ":queue", ":tickets", ":adaptive")
+"Suffixes of the notification, queue, ticket and adaptive limit keys, which are skipped when iterating a key pattern."
+
+_SCAN_COUNT = 1000
+"Number of keys scanned per call when cleaning a key pattern, matching the number of keys cleaned per pipeline."
 
 
 def limit_clean(
-    redis_configuration: RedisConfiguration, limit_configuration: LimitConfiguration
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    limit_configuration: LimitConfiguration,
 ):
     """
-    Cleans stale limit locks in the hash for the given limit configuration.
+    Cleans stale limit locks in the hash or sorted set for the given limit configuration. For a `LocalConfiguration`,
+    the execution slots of processes that do not exist anymore are cleaned.
 
-    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis.
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to clean the execution slots of the local host, or Backend object.
     :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
     :return: Number of cleaned items
     """
-    client = get_redis(redis_configuration)
-    current = int(time.time())
-    count = 0
+    return get_backend(redis_configuration).clean(limit_configuration)
+
+
+def limit_clean_many(
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    keys: typing.Union[str, typing.Iterable[str]],
+    limit_storage: str = "hash",
+) -> typing.Dict[str, int]:
+    """
+    Cleans stale limit locks of many keys at once, e.g. all keys found by `limit_iter`. For Redis, the stale locks are
+    filtered and removed by a script on the server, and the scripts of up to 1000 keys are sent in a single pipeline,
+    so a key costs no round trip of its own. A key pattern is scanned with a `COUNT` of 1000 as well. Keys not
+    containing the `limit_storage` type are skipped.
+
+    Example usage:
 
-    lock_key = limit_configuration.key
+        from concurrency_limit import *
 
-    # If the key does not contain a hash, Redis fails with a WRONGTYPE exception that
-    # we handle by deleting the key and re-trying.
-    try:
-        for scan_lock_id, scan_lock_expire in client.hscan_iter(lock_key):
-            try:
-                clean_lock = current >= int(scan_lock_expire)
-            except (ValueError, TypeError):
-                clean_lock = True
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
 
-            if clean_lock:
-                count += client.hdel(lock_key, scan_lock_id)
+        counts = limit_clean_many(redis_configuration, 'tenant:*')
 
-    except redis.ResponseError as exc:
-        if str(exc).startswith("WRONGTYPE"):
-            client.delete(lock_key)
-            return 1
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to clean the execution slots of the local host, or Backend object.
+    :param keys: The glob-style pattern of the keys to clean, or an iterable of keys. The notification, queue, ticket and
+        adaptive limit keys are not cleaned when matching the pattern.
+    :param limit_storage: Storage type of the keys, either `hash` or `zset`.
+    :return: Dictionary of the number of cleaned items per key
+    """
+    backend = get_backend(redis_configuration)
 
-        raise  # pragma: no cover
+    if isinstance(keys, str):
+        keys = (
+            key
+            for key in backend.iterate(keys, _SCAN_COUNT)
+            if not _decode(key).endswith(_AUXILIARY_SUFFIXES)
+        )
 
-    return count
+    return backend.clean_many(keys, limit_storage)
 
 
-def limit_iter(redis_configuration: RedisConfiguration, key_pattern: str):
+def limit_iter(
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    key_pattern: str,
+):
     """
     Return an iterator over the items in Redis specified by `key_pattern`
     using the Redis connection specified by `redis_configuration`.
 
-    :param redis_configuration: The configuration for connecting to Redis.
+    :param redis_configuration: The configuration for connecting to Redis, the local host configuration, or a backend.
     :param key_pattern: The pattern for Redis to iterate over.
     :return: Scan Iterator
     """
-    return get_redis(redis_configuration).scan_iter(key_pattern)
+    return get_backend(redis_configuration).iterate(key_pattern)
+
+
+def limit_stats(
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    key_pattern: str,
+    batch_size: int = 1000,
+) -> typing.Iterator[LimitStats]:
+    """
+    Returns an iterator over the snapshots of all concurrency limit keys matching `key_pattern`, e.g. for dashboards.
+    Each snapshot contains the number of execution slots in use, the number of stale ones, and the earliest and latest
+    expiry of the ones in use. For Redis, the keys are found by `SCAN` with a `COUNT` of `batch_size`, and summarized by
+    a script on the server in pipelines of `batch_size` keys, so a key costs no round trip of its own, and only a single
+    batch is held in memory.
+
+    Example usage:
+
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379)
+
+        for stats in limit_stats(redis_configuration, 'tenant:*'):
+            print(f"{stats.key}: {stats.count} in use, {stats.stale} stale")
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to inspect the execution slots of the local host, or Backend object.
+    :param key_pattern: The glob-style pattern of the keys to inspect. The notification, queue, ticket and adaptive
+        limit keys are skipped.
+    :param batch_size: Number of keys scanned per call and read per pipeline.
+    :return: Iterator of LimitStats objects
+    """
+    backend = get_backend(redis_configuration)
+    keys = (
+        key
+        for key in backend.iterate(key_pattern, batch_size)
+        if not _decode(key).endswith(_AUXILIARY_SUFFIXES)
+    )
+
+    return backend.stats(keys, batch_size)
+
+
+def limit_count(
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    limit_configuration: LimitConfiguration,
+) -> int:
+    """
+    Counts the execution slots in use for the given limit configuration without acquiring one. If `client_cache` is
+    set on the Redis configuration, repeated reads of a key are served from memory until the key changes.
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to count the execution slots of the local host, or Backend object.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: Number of execution slots in use
+    """
+    return get_backend(redis_configuration).count(limit_configuration)
+
+
+def is_saturated(
+    redis_configuration: typing.Union[RedisConfiguration, LocalConfiguration, Backend],
+    limit_configuration: LimitConfiguration,
+) -> bool:
+    """
+    Checks whether a scope of the given limit configuration would have to wait for an execution slot, e.g. for load
+    shedding or routing. The check does not acquire an execution slot, so its result may be outdated as soon as it is
+    returned. If `client_cache` is set on the Redis configuration, repeated checks of a key are served from memory
+    until the key changes. If `limit_adaptive` is set, the check compares against the limit adjusted by all processes,
+    which costs another round trip.
+
+    Example usage:
+
+        from concurrency_limit import *
+
+        redis_configuration = RedisConfiguration(host='localhost', port=6379, client_cache=True)
+        limit_configuration = LimitConfiguration(key='my_key', limit=5)
+
+        if is_saturated(redis_configuration, limit_configuration):
+            route_elsewhere()
+
+    :param redis_configuration: RedisConfiguration object containing the configuration details for connecting to Redis,
+        LocalConfiguration object to check the execution slots of the local host, or Backend object.
+    :param limit_configuration: LimitConfiguration object containing the configuration details for the limit.
+    :return: True if less than `limit_weight` execution slots are free
+    """
+    backend = get_backend(redis_configuration)
+    count = backend.count(limit_configuration)
+
+    # If `limit_adaptive` is set, the limit adjusted by all processes applies instead of the configured `limit`.
+    limit = backend.get_limit(limit_configuration)
+
+    return count + limit_configuration.limit_weight > limit
+
+
+def _decode(key: typing.Union[str, bytes]) -> str:
+    return key.decode() if isinstance(key, bytes) else key
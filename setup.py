@@ -20,7 +20,7 @@ setup(
     url="https://github.com/anexia/python-concurrency-limit",
     author="Andreas Stocker",
     author_email="AStocker@anexia.com",
-    install_requires=["redis>=4.0"],
+    install_requires=["redis>=4.4"],
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
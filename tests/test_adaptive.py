@@ -0,0 +1,225 @@
+import asyncio
+import time
+
+import pytest
+import pytest_mock
+
+import concurrency_limit
+from concurrency_limit._adaptive import (
+    get_adaptive_configuration,
+    refresh_adaptive_configuration,
+)
+
+from test_base import *
+
+
+def _limit_configuration(**kwargs) -> concurrency_limit.LimitConfiguration:
+    return concurrency_limit.LimitConfiguration(
+        key="key-1",
+        limit=4,
+        limit_adaptive=concurrency_limit.AdaptiveLimit(**kwargs),
+    )
+
+
+def test_adaptive_limit_increase(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = _limit_configuration(max_limit=6)
+
+    for _ in range(30):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            pass
+
+    # The limit grows by one once as many scopes as the limit succeeded, up to the upper bound.
+    assert float(client._hashes["{key-1}:adaptive"]["limit"]) == 6
+
+    slots = concurrency_limit.get_backend(
+        concurrency_limit.RedisConfiguration()
+    ).get_slots(limit_configuration)
+    assert slots.limit_configuration.limit == 6
+
+
+def test_adaptive_limit_decrease_on_exception(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = _limit_configuration(min_limit=2)
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                raise ValueError()
+
+    # Without a smoothed duration, each failed scope cuts the limit, down to the lower bound.
+    assert float(client._hashes["{key-1}:adaptive"]["limit"]) == 2
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        limit_configuration,
+    ) as count:
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(),
+                concurrency_limit.LimitConfiguration(
+                    key="key-1",
+                    limit=4,
+                    limit_timeout=0,
+                    limit_weight=2,
+                    limit_adaptive=concurrency_limit.AdaptiveLimit(min_limit=2),
+                ),
+            ):
+                pass  # pragma: no cover
+
+        assert count == 1
+
+
+def test_adaptive_limit_decrease_on_latency(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = _limit_configuration(latency_tolerance=2.0)
+
+    for duration in [0.01, 0.01, 0.1]:
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            time.sleep(duration)
+
+    state = client._hashes["{key-1}:adaptive"]
+
+    assert float(state["limit"]) == 2
+    assert 0.01 < float(state["latency"]) < 0.1
+
+
+def test_adaptive_limit_cut_once(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = _limit_configuration()
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        time.sleep(0.1)
+
+    # Scopes failing within the smoothed duration of the last cut only cut the limit once.
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                raise ValueError()
+
+    assert float(client._hashes["{key-1}:adaptive"]["limit"]) == 2
+
+
+def test_adaptive_limit_async(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    limit_configuration = _limit_configuration(max_limit=8)
+
+    async def _main():
+        for _ in range(10):
+            async with concurrency_limit.alimit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                pass
+
+        with pytest.raises(ValueError):
+            async with concurrency_limit.alimit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                raise ValueError()
+
+    asyncio.run(_main())
+
+    assert 2 <= float(client.client._hashes["{key-1}:adaptive"]["limit"]) < 4
+
+
+def test_adaptive_limit_rejected_refresh(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = _limit_configuration(min_limit=1)
+    backend = concurrency_limit.get_backend(concurrency_limit.RedisConfiguration())
+    slots = backend.get_slots(limit_configuration)
+
+    for index in range(4):
+        assert slots.acquire([f"slot-{index}"])[0]
+
+    # Another process cuts the limit. The rejected scopes of this process never adjust the limit themselves, so
+    # they read it on rejection, and the next scopes of the process acquire execution slots up to the cut limit.
+    client.hset("{key-1}:adaptive", "limit", "2.5")
+
+    assert slots.acquire(["rejected-1"])[0] == 0
+    assert slots.limit_configuration.limit == 2
+    assert backend.get_slots(limit_configuration).limit_configuration.limit == 2
+
+
+def test_adaptive_limit_group_rejected_refresh(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configurations = [
+        concurrency_limit.LimitConfiguration(key="{key}-1", limit=4),
+        concurrency_limit.LimitConfiguration(
+            key="{key}-2",
+            limit=1,
+            limit_adaptive=concurrency_limit.AdaptiveLimit(max_limit=4),
+        ),
+    ]
+    slot_group = concurrency_limit.get_backend(
+        concurrency_limit.RedisConfiguration()
+    ).get_slot_group(limit_configurations)
+
+    assert slot_group.acquire(["slot-1"])[0] == (1, 1)
+
+    # Another process raised the limit of the second key.
+    client.hset("{key}-2:adaptive", "limit", "3")
+
+    assert slot_group.acquire(["slot-2"])[0] == 0
+    assert slot_group.limit_configuration.limit == 3
+    assert slot_group.acquire(["slot-2"])[0] == (2, 2)
+
+
+def test_adaptive_limit_is_saturated(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = _limit_configuration()
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        assert not concurrency_limit.is_saturated(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        )
+
+        # The limit adjusted by all processes applies instead of the configured one.
+        client.hset("{key-1}:adaptive", "limit", "1")
+
+        assert concurrency_limit.is_saturated(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        )
+
+
+def test_adaptive_limit_weight():
+    client = RedisMock()
+    client.hset("{key-1}:adaptive", "limit", "1")
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1",
+        limit=4,
+        limit_weight=2,
+        limit_adaptive=concurrency_limit.AdaptiveLimit(min_limit=1),
+    )
+
+    # The adjusted limit is not cut below the weight of the scopes, so they still run one at a time.
+    assert refresh_adaptive_configuration(client, limit_configuration).limit == 2
+    assert get_adaptive_configuration(client, limit_configuration).limit == 2
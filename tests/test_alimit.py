@@ -0,0 +1,406 @@
+import asyncio
+import time
+
+import pytest
+import pytest_mock
+import redis.exceptions
+
+import concurrency_limit
+from concurrency_limit._circuit import get_circuit
+from concurrency_limit._slots import get_async_slots
+
+from test_base import *
+
+
+def test_alimit_without_concurrency(mocker: pytest_mock.MockerFixture):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis",
+        return_value=AsyncRedisMock(),
+    )
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ) as slot_id:
+            assert slot_id == 1
+
+    asyncio.run(_function())
+
+
+def test_alimit_slot_ids(mocker: pytest_mock.MockerFixture):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis",
+        return_value=AsyncRedisMock(),
+    )
+
+    slot_ids = []
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=10, limit_timeout=0
+            ),
+        ) as slot_id:
+            slot_ids.append(slot_id)
+            await asyncio.sleep(0.5)
+
+    async def _main():
+        await asyncio.gather(*(_function() for _ in range(10)))
+
+    asyncio.run(_main())
+
+    slot_ids.sort()
+    assert slot_ids == list(range(1, 11))
+
+
+def test_alimit_exceeded_limit_without_timeout(mocker: pytest_mock.MockerFixture):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis",
+        return_value=AsyncRedisMock(),
+    )
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1, limit_timeout=0),
+        ):
+            await asyncio.sleep(0.5)
+
+    async def _main():
+        await asyncio.gather(*(_function() for _ in range(10)))
+
+    with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+        asyncio.run(_main())
+
+
+def test_alimit_with_high_load(mocker: pytest_mock.MockerFixture):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis",
+        return_value=AsyncRedisMock(),
+    )
+
+    counter = 0
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=50, limit_timeout=10, limit_interval=0.01
+            ),
+        ) as slot_id:
+            nonlocal counter
+
+            counter += 1
+
+            assert 1 <= slot_id <= 50
+            assert 1 <= counter <= 50
+
+            await asyncio.sleep(0.01)
+            counter -= 1
+
+    async def _main():
+        await asyncio.gather(*(_function() for _ in range(2_000)))
+
+    asyncio.run(_main())
+
+
+def test_alimit_cancelled(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ):
+            await asyncio.sleep(10)
+
+    async def _main():
+        task = asyncio.create_task(_function())
+        await asyncio.sleep(0.1)
+        assert client.client.hlen("key-1") == 1
+
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.sleep(0.1)
+        assert client.client.hlen("key-1") == 0
+
+    asyncio.run(_main())
+
+
+def test_alimit_cancelled_while_waiting(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    client.client.hset("key-1", "holder-1", int(time.time()) + 10)
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ):
+            pass  # pragma: no cover
+
+    async def _main():
+        task = asyncio.create_task(_function())
+        await asyncio.sleep(0.3)
+
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.sleep(0.1)
+        assert client.client.hlen("key-1") == 1
+
+    asyncio.run(_main())
+
+
+def test_alimit_notify(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=5, limit_interval=10, limit_notify=True
+    )
+    waits = []
+
+    async def _function():
+        start = time.monotonic()
+
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            waits.append(time.monotonic() - start)
+            await asyncio.sleep(0.2)
+
+    async def _main():
+        await asyncio.gather(*(_function() for _ in range(5)))
+
+    asyncio.run(_main())
+
+    assert max(waits) < 2
+    assert client.client.hlen("key-1") == 0
+
+
+def test_alimit_renew(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_expire=3, limit_timeout=0, limit_renew=True
+    )
+
+    async def _main():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            await asyncio.sleep(5)
+
+            # The execution slot did not expire, as it was renewed in the background.
+            with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+                async with concurrency_limit.alimit(
+                    concurrency_limit.RedisConfiguration(), limit_configuration
+                ):
+                    pass  # pragma: no cover
+
+    asyncio.run(_main())
+
+
+def test_alimit_prefetch(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    evalsha = mocker.spy(client.client, "evalsha")
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=10, limit_prefetch=5, limit_prefetch_idle=0.5
+    )
+
+    async def _main():
+        for _ in range(20):
+            async with concurrency_limit.alimit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ) as slot_id:
+                assert slot_id == 1
+                assert client.client.hlen("key-1") == 5
+
+        # Reserved execution slots that were not used are returned to Redis.
+        await asyncio.sleep(1)
+
+    asyncio.run(_main())
+
+    assert evalsha.call_count == 1
+    assert client.client.hlen("key-1") == 0
+
+
+def test_alimit_weight(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=5, limit_timeout=0, limit_weight=3
+    )
+
+    async def _main():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ) as slot_id:
+            assert slot_id == 3
+
+            with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+                async with concurrency_limit.alimit(
+                    concurrency_limit.RedisConfiguration(), limit_configuration
+                ):
+                    pass  # pragma: no cover
+
+    asyncio.run(_main())
+
+    assert client.client.hlen("key-1") == 0
+
+
+def test_alimit_all(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    def _alimit_all(tenant: str):
+        return concurrency_limit.alimit_all(
+            concurrency_limit.RedisConfiguration(),
+            [
+                concurrency_limit.LimitConfiguration(
+                    key=f"{{key-1}}:{tenant}", limit=2, limit_timeout=0
+                ),
+                concurrency_limit.LimitConfiguration(
+                    key="{key-1}:global", limit=3, limit_timeout=0, limit_notify=True
+                ),
+            ],
+        )
+
+    async def _main():
+        async with _alimit_all("tenant-1") as counts_1:
+            async with _alimit_all("tenant-1") as counts_2:
+                assert (counts_1, counts_2) == ((1, 1), (2, 2))
+
+                with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+                    async with _alimit_all("tenant-1"):
+                        pass  # pragma: no cover
+
+                assert await client.hlen("{key-1}:global") == 2
+
+    asyncio.run(_main())
+
+    assert client.client.hlen("{key-1}:tenant-1") == 0
+    assert client.client.hlen("{key-1}:global") == 0
+
+
+def test_alimit_fair(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_interval=0.01, limit_fair=True
+    )
+    order = []
+
+    async def _function(index: int):
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            order.append(index)
+            await asyncio.sleep(0.02)
+
+    async def _main():
+        async with concurrency_limit.alimit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            tasks = []
+
+            for index in range(10):
+                tasks.append(asyncio.create_task(_function(index)))
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(*tasks)
+
+    asyncio.run(_main())
+
+    assert order == list(range(10))
+    assert client.client.zcard("{key-1}:queue") == 0
+
+
+def test_alimit_circuit_breaker(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+    mocker.patch("concurrency_limit._circuit.get_redis", return_value=client.client)
+    mocker.patch.object(
+        client.client, "ping", side_effect=redis.exceptions.ConnectionError()
+    )
+    mocker.patch.object(
+        client.client, "evalsha", side_effect=redis.exceptions.ConnectionError()
+    )
+
+    redis_configuration = concurrency_limit.RedisConfiguration(
+        circuit_breaker=concurrency_limit.CircuitBreaker(
+            failure_threshold=1, expected_nodes=3
+        )
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=6, limit_timeout=0
+    )
+
+    async def _function():
+        async with concurrency_limit.alimit(
+            redis_configuration, limit_configuration
+        ) as count:
+            await asyncio.sleep(0.2)
+            return count
+
+    async def _main():
+        return await asyncio.gather(
+            *(_function() for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(_main())
+
+    # The circuit opens on the first failure, and the local limit admits two of the three scopes.
+    assert sorted(
+        result for result in results if not isinstance(result, Exception)
+    ) == [1, 2]
+    assert any(
+        isinstance(result, concurrency_limit.ConcurrencyLimitExceededException)
+        for result in results
+    )
+
+
+def test_alimit_circuit_breaker_prefetch(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+    mocker.patch("concurrency_limit._circuit.get_redis", return_value=client.client)
+
+    redis_configuration = concurrency_limit.RedisConfiguration(
+        circuit_breaker=concurrency_limit.CircuitBreaker(
+            failure_threshold=1, reset_timeout=0.4
+        )
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=10, limit_timeout=0, limit_prefetch=3
+    )
+    circuit = get_circuit(redis_configuration)
+
+    async def _main():
+        async with concurrency_limit.alimit(
+            redis_configuration, limit_configuration
+        ) as count:
+            assert count == 1
+
+            # The circuit opens while the scope holds a reserved execution slot.
+            circuit.record(0.0, failed=True)
+
+        assert circuit.is_open()
+        assert get_async_slots(client, limit_configuration)._in_use == 0
+
+    asyncio.run(_main())
+    assert client.client.hlen("key-1") == 3
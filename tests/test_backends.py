@@ -0,0 +1,174 @@
+import asyncio
+import pathlib
+import threading
+import time
+
+import pytest
+import pytest_mock
+
+import concurrency_limit
+
+from test_base import *
+
+
+class _MemoryBackend(concurrency_limit.Backend):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.registered = []
+
+    def get_slots(self, limit_configuration, priority=0):
+        backend = self
+
+        class _Slots:
+            def __init__(self):
+                self.limit_configuration = limit_configuration
+
+            def acquire(self, lock_ids):
+                with backend.lock:
+                    slots = backend.slots.setdefault(limit_configuration.key, set())
+
+                    if len(slots) + len(lock_ids) > limit_configuration.limit:
+                        return 0, lock_ids
+
+                    slots.update(lock_ids)
+                    return len(slots), lock_ids
+
+            def release(self, *lock_ids):
+                with backend.lock:
+                    backend.slots.get(limit_configuration.key, set()).difference_update(
+                        lock_ids
+                    )
+
+            def items(self, lock_ids):
+                return [(limit_configuration, lock_ids)]
+
+        return _Slots()
+
+    def register(self, limit_configuration, lock_ids):
+        self.registered.append(limit_configuration.key)
+
+    def count(self, limit_configuration):
+        return len(self.slots.get(limit_configuration.key, ()))
+
+
+def test_backend_custom():
+    backend = _MemoryBackend()
+    counter = 0
+
+    @concurrent(threads=10)
+    def _concurrent_function():
+        nonlocal counter
+
+        with concurrency_limit.limit(
+            backend,
+            concurrency_limit.LimitConfiguration(
+                key="key-1",
+                limit=2,
+                limit_interval=0.01,
+                limit_notify=True,
+                limit_renew=True,
+            ),
+        ):
+            counter += 1
+            assert counter <= 2
+
+            time.sleep(0.01)
+            counter -= 1
+
+    _concurrent_function()
+
+    assert backend.registered == ["key-1"] * 10
+    assert (
+        backend.count(concurrency_limit.LimitConfiguration(key="key-1", limit=2)) == 0
+    )
+
+
+def test_backend_custom_multiple_limits():
+    with pytest.raises(NotImplementedError):
+        concurrency_limit.limit_all(
+            _MemoryBackend(),
+            [concurrency_limit.LimitConfiguration(key="key-1", limit=1)],
+        )
+
+
+def test_backend_get_backend(tmp_path: pathlib.Path, mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    backend = _MemoryBackend()
+    local_configuration = concurrency_limit.LocalConfiguration(path=str(tmp_path))
+
+    assert concurrency_limit.get_backend(backend) is backend
+    assert isinstance(
+        concurrency_limit.get_backend(local_configuration),
+        concurrency_limit.LocalBackend,
+    )
+    assert (
+        concurrency_limit.get_backend(concurrency_limit.RedisConfiguration()).client
+        is client
+    )
+    assert isinstance(
+        concurrency_limit.get_async_backend(local_configuration),
+        concurrency_limit.AsyncLocalBackend,
+    )
+
+
+def test_backend_get_backend_mismatch(tmp_path: pathlib.Path):
+    local_configuration = concurrency_limit.LocalConfiguration(path=str(tmp_path))
+    limit_configuration = concurrency_limit.LimitConfiguration(key="key-1", limit=1)
+
+    # Local backends are mapped to their counterpart, as they share the same files.
+    async def _main():
+        async with concurrency_limit.alimit(
+            concurrency_limit.LocalBackend(local_configuration), limit_configuration
+        ) as count:
+            assert count == 1
+
+    asyncio.run(_main())
+
+    assert isinstance(
+        concurrency_limit.get_backend(
+            concurrency_limit.AsyncLocalBackend(local_configuration)
+        ),
+        concurrency_limit.LocalBackend,
+    )
+
+    # Redis backends cannot be mapped, as their clients are either synchronous or asyncio.
+    with pytest.raises(TypeError):
+        concurrency_limit.get_async_backend(_MemoryBackend())
+
+    with pytest.raises(TypeError):
+        concurrency_limit.get_backend(
+            concurrency_limit.AsyncRedisBackend(AsyncRedisMock())
+        )
+
+
+@pytest.mark.parametrize("limit_storage", ["hash", "zset"])
+def test_backend_redis_count(limit_storage: str, mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+
+    backend = concurrency_limit.get_backend(concurrency_limit.RedisConfiguration())
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=3, limit_storage=limit_storage
+    )
+
+    assert backend.count(limit_configuration) == 0
+
+    with concurrency_limit.limit(backend, limit_configuration):
+        with concurrency_limit.limit(backend, limit_configuration):
+            assert backend.count(limit_configuration) == 2
+
+    assert backend.count(limit_configuration) == 0
+
+
+def test_backend_local_count(tmp_path: pathlib.Path):
+    backend = concurrency_limit.LocalBackend(
+        concurrency_limit.LocalConfiguration(path=str(tmp_path))
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(key="key-1", limit=3)
+
+    with concurrency_limit.limit(backend, limit_configuration):
+        assert backend.count(limit_configuration) == 1
+
+    assert backend.count(limit_configuration) == 0
@@ -1,33 +1,55 @@
+import asyncio
 import collections
 import fnmatch
 import functools
 import threading
 import time
 
-__all__ = ["RedisMock", "concurrent"]
+__all__ = ["RedisMock", "AsyncRedisMock", "concurrent"]
 
 import redis.exceptions
 
+from concurrency_limit._scripts import *
+
 
 class RedisMock:
     def __init__(self):
         self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
         self._keys = collections.defaultdict(lambda: None)
         self._hashes = collections.defaultdict(lambda: {})
-        self._expires = collections.defaultdict(lambda: time.time() + 2 ** 32)
+        self._lists = collections.defaultdict(lambda: [])
+        self._zsets = collections.defaultdict(lambda: {})
+        self._expires = collections.defaultdict(lambda: time.time() + 2**32)
 
-    def scan_iter(self, match):
-        keys = {*self._keys.keys(), *self._hashes.keys()}
+    def scan_iter(self, match, count=None):
+        keys = {*self._keys.keys(), *self._hashes.keys(), *self._zsets.keys()}
         for key in fnmatch.filter(keys, match):
             yield key
 
+    def ping(self):
+        return True
+
+    def type(self, name):
+        with self._lock:
+            for _type, entries in (
+                ("string", self._keys),
+                ("hash", self._hashes),
+                ("zset", self._zsets),
+                ("list", self._lists),
+            ):
+                if entries.get(name):
+                    return _type
+
+        return "none"
+
     def set(self, name, value):
         with self._lock:
             self._keys[name] = value
 
     def delete(self, name):
         with self._lock:
-            del self._keys[name]
+            self._delete(name)
 
     def hlen(self, name):
         with self._lock:
@@ -40,6 +62,11 @@ class RedisMock:
             self._ensure_type_hash(name)
             self._hashes[name][key] = str(value)
 
+    def hget(self, name, key):
+        with self._lock:
+            self._ensure_type_hash(name)
+            return self._hashes[name].get(key)
+
     def hdel(self, name, *keys):
         count = 0
 
@@ -54,6 +81,12 @@ class RedisMock:
 
         return count
 
+    def hvals(self, name):
+        with self._lock:
+            self._ensure_type_hash(name)
+            self._clean_expired(name)
+            return list(self._hashes[name].values())
+
     def hscan_iter(self, name):
         with self._lock:
             self._ensure_type_hash(name)
@@ -63,11 +96,99 @@ class RedisMock:
         for hkey, hvalue in _hash.items():
             yield hkey, hvalue
 
+    def zadd(self, name, mapping):
+        with self._lock:
+            self._ensure_type_zset(name)
+            self._zsets[name].update(
+                {key: float(value) for key, value in mapping.items()}
+            )
+
+    def zrange(self, name, start, end, withscores=False):
+        with self._lock:
+            self._ensure_type_zset(name)
+            items = sorted(self._zsets[name].items(), key=lambda item: item[1])
+            items = items[start : None if end == -1 else end + 1]
+
+        return items if withscores else [key for key, _ in items]
+
+    def zcard(self, name):
+        with self._lock:
+            self._ensure_type_zset(name)
+            self._clean_expired(name)
+            return len(self._zsets[name])
+
+    def zcount(self, name, _min, _max):
+        with self._lock:
+            self._ensure_type_zset(name)
+            _min = float(_min[1:]) if str(_min).startswith("(") else float(_min)
+            return sum(
+                _min < value <= float(_max) for value in self._zsets[name].values()
+            )
+
+    def zrem(self, name, *keys):
+        with self._lock:
+            self._ensure_type_zset(name)
+            return sum(self._zsets[name].pop(key, None) is not None for key in keys)
+
+    def zremrangebyscore(self, name, _min, _max):
+        with self._lock:
+            self._ensure_type_zset(name)
+            return self._zremrangebyscore(name, float(_min), float(_max))
+
+    def lpush(self, name, *values):
+        with self._lock:
+            self._lists[name][0:0] = reversed([str(value) for value in values])
+            self._condition.notify_all()
+            return len(self._lists[name])
+
+    def llen(self, name):
+        with self._lock:
+            return len(self._lists[name])
+
+    def blpop(self, keys, timeout=0):
+        with self._lock:
+            if not self._condition.wait_for(
+                lambda: any(self._lists[key] for key in keys), timeout=timeout or None
+            ):
+                return None
+
+            return self._lpop_any(keys)
+
     def expire(self, name, _time):
         with self._lock:
             self._expires[name] = _time + time.time()
 
-    def pipeline(self):
+    def register_script(self, script):
+        client = self
+
+        class _Script:
+            def __call__(self, keys=None, args=None, client=None):
+                return (client or self.registered_client).evalsha(
+                    script, len(keys or []), *(keys or []), *(args or [])
+                )
+
+            registered_client = client
+
+        return _Script()
+
+    def evalsha(self, script, numkeys, *keys_and_args):
+        scripts = {
+            ACQUIRE_SCRIPT: self._script_acquire,
+            ACQUIRE_ALL_SCRIPT: self._script_acquire_all,
+            ACQUIRE_FAIR_SCRIPT: self._script_acquire_fair,
+            RELEASE_NOTIFY_SCRIPT: self._script_release_notify,
+            RENEW_SCRIPT: self._script_renew,
+            CLEAN_SCRIPT: self._script_clean,
+            ADAPT_SCRIPT: self._script_adapt,
+            STATS_SCRIPT: self._script_stats,
+        }
+
+        with self._lock:
+            return scripts[script](
+                list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:])
+            )
+
+    def pipeline(self, transaction=True):
         client = self
 
         class _Pipeline:
@@ -83,7 +204,7 @@ class RedisMock:
 
                 return _wrapper
 
-            def execute(self):
+            def execute(self, raise_on_error=True):
                 try:
                     return self.buffer
                 finally:
@@ -91,20 +212,354 @@ class RedisMock:
 
         return _Pipeline()
 
-    def _ensure_type_hash(self, name):
-        if name in self._keys:
-            raise redis.ResponseError(
-                "WRONGTYPE Operation against a key holding the wrong kind of value"
+    def _script_acquire(self, keys, args):
+        lock_key = keys[0]
+        lock_limit, lock_expire, current, lock_storage, lock_minimum, *lock_ids = args
+        lock_limit, lock_expire, current = (
+            int(lock_limit),
+            int(lock_expire),
+            int(current),
+        )
+
+        lock_entries = self._count_slots(
+            lock_key, lock_storage, lock_limit, len(lock_ids), current
+        )
+        count = len(lock_entries)
+
+        if count + int(lock_minimum) > lock_limit:
+            return [count, 0]
+
+        acquired = min(len(lock_ids), lock_limit - count)
+        self._add_slots(
+            lock_key, lock_storage, lock_expire, lock_ids[:acquired], current
+        )
+
+        return [count + acquired, acquired]
+
+    def _script_acquire_all(self, keys, args):
+        current = int(args[0])
+        lock_ids = args[1 + 4 * len(keys) :]
+        lock_args = [args[1 + 4 * i : 5 + 4 * i] for i in range(len(keys))]
+        counts = []
+
+        for i, (lock_key, (lock_limit, _, lock_storage, lock_weight)) in enumerate(
+            zip(keys, lock_args)
+        ):
+            lock_entries = self._count_slots(
+                lock_key, lock_storage, int(lock_limit), int(lock_weight), current
+            )
+            counts.append(len(lock_entries))
+
+            if counts[i] + int(lock_weight) > int(lock_limit):
+                return [0, i + 1]
+
+        for i, (lock_key, (_, lock_expire, lock_storage, lock_weight)) in enumerate(
+            zip(keys, lock_args)
+        ):
+            self._add_slots(
+                lock_key,
+                lock_storage,
+                int(lock_expire),
+                lock_ids[: int(lock_weight)],
+                current,
+            )
+            counts[i] += int(lock_weight)
+
+        return [1, *counts]
+
+    def _script_acquire_fair(self, keys, args):
+        lock_key, queue_key, ticket_key = keys
+        lock_limit, lock_expire, current, lock_storage, now, deadline, rank = args[:7]
+        lock_limit, lock_expire, current = (
+            int(lock_limit),
+            int(lock_expire),
+            int(current),
+        )
+        lock_ids = args[7:]
+
+        for lock_id in lock_ids:
+            self._zsets[queue_key].setdefault(lock_id, float(rank))
+            self._hashes[ticket_key][lock_id] = deadline
+
+        rank = self._zsets[queue_key][lock_ids[0]]
+        count = len(
+            self._count_slots(
+                lock_key, lock_storage, lock_limit, len(lock_ids), current
+            )
+        )
+        ahead = 0
+
+        for ticket, score in sorted(
+            self._zsets[queue_key].items(), key=lambda item: item[1]
+        ):
+            if score >= rank:
+                break
+
+            if float(now) >= float(self._hashes[ticket_key].get(ticket, 0)):
+                del self._zsets[queue_key][ticket]
+                self._hashes[ticket_key].pop(ticket, None)
+            else:
+                ahead += 1
+
+        if count + ahead + len(lock_ids) > lock_limit:
+            return [count, 0]
+
+        self._add_slots(lock_key, lock_storage, lock_expire, lock_ids, current)
+
+        for lock_id in lock_ids:
+            del self._zsets[queue_key][lock_id]
+            del self._hashes[ticket_key][lock_id]
+
+        return [count + len(lock_ids), len(lock_ids)]
+
+    def _script_release_notify(self, keys, args):
+        lock_key, notify_key = keys
+        lock_limit, _, lock_storage, *lock_ids = args
+
+        lock_entries = self._zsets if lock_storage == "zset" else self._hashes
+        removed = sum(
+            lock_entries[lock_key].pop(lock_id, None) is not None
+            for lock_id in lock_ids
+        )
+
+        self._lists[notify_key][0:0] = ["1"] * removed
+        del self._lists[notify_key][int(lock_limit) :]
+        self._condition.notify_all()
+
+        return removed
+
+    def _script_renew(self, keys, args):
+        lock_key = keys[0]
+        lock_id, lock_expire, current, lock_storage = args
+
+        lock_entries = self._zsets if lock_storage == "zset" else self._hashes
+        if lock_id not in lock_entries[lock_key]:
+            return 0
+
+        lock_expire_at = int(current) + int(lock_expire)
+        lock_entries[lock_key][lock_id] = (
+            float(lock_expire_at) if lock_storage == "zset" else str(lock_expire_at)
+        )
+        self._expires[lock_key] = int(lock_expire) + time.time()
+
+        return 1
+
+    def _script_clean(self, keys, args):
+        lock_key = keys[0]
+        current, lock_storage = int(args[0]), args[1]
+
+        try:
+            self._ensure_type(lock_key, lock_storage)
+        except redis.ResponseError:
+            return 0
+
+        if lock_storage == "zset":
+            return self._zremrangebyscore(lock_key, float("-inf"), float(current))
+
+        lock_entries = self._hashes[lock_key]
+        stale = [
+            entry_id
+            for entry_id, entry_expire in lock_entries.items()
+            if not entry_expire.isdigit() or current >= int(entry_expire)
+        ]
+
+        for entry_id in stale:
+            del lock_entries[entry_id]
+
+        return len(stale)
+
+    def _script_stats(self, keys, args):
+        lock_key = keys[0]
+        current = int(args[0])
+
+        if self._zsets.get(lock_key):
+            lock_storage, expires = "zset", list(self._zsets[lock_key].values())
+        elif self._hashes.get(lock_key):
+            lock_storage, expires = "hash", [
+                int(entry_expire) if entry_expire.isdigit() else 0
+                for entry_expire in self._hashes[lock_key].values()
+            ]
+        else:
+            return None
+
+        valid = [
+            int(entry_expire) for entry_expire in expires if entry_expire > current
+        ]
+
+        return [
+            lock_storage,
+            len(valid),
+            len(expires) - len(valid),
+            min(valid, default=0),
+            max(valid, default=0),
+        ]
+
+    def _script_adapt(self, keys, args):
+        adaptive_key = keys[0]
+        initial, min_limit, max_limit, increase, decrease = map(float, args[:5])
+        tolerance, smoothing, _, now, duration = map(float, args[5:10])
+        failed = str(args[10]) == "1"
+
+        state = self._hashes[adaptive_key]
+        limit = float(state.get("limit", initial))
+        latency = float(state["latency"]) if "latency" in state else None
+        decreased_at = float(state.get("decreased_at", 0))
+
+        if failed or (
+            tolerance > 0 and latency is not None and duration > latency * tolerance
+        ):
+            if now - decreased_at >= (latency or 0):
+                limit = max(min_limit, limit * decrease)
+                state["decreased_at"] = str(now)
+        else:
+            limit = min(max_limit, limit + increase / limit)
+
+        if not failed:
+            latency = (
+                duration
+                if latency is None
+                else latency + smoothing * (duration - latency)
             )
+            state["latency"] = str(latency)
+
+        state["limit"] = str(limit)
+
+        return str(limit)
+
+    def _count_slots(self, lock_key, lock_storage, lock_limit, lock_required, current):
+        try:
+            self._ensure_type(lock_key, lock_storage)
+        except redis.ResponseError:
+            self._delete(lock_key)
+
+        self._clean_expired(lock_key)
+
+        if lock_storage == "zset":
+            self._zremrangebyscore(lock_key, float("-inf"), float(current))
+            return self._zsets[lock_key]
+
+        lock_entries = self._hashes[lock_key]
+
+        if len(lock_entries) + lock_required > lock_limit:
+            for entry_id, entry_expire in list(lock_entries.items()):
+                if not entry_expire.isdigit() or current >= int(entry_expire):
+                    del lock_entries[entry_id]
+
+        return lock_entries
+
+    def _add_slots(self, lock_key, lock_storage, lock_expire, lock_ids, current):
+        lock_entries = self._zsets if lock_storage == "zset" else self._hashes
+
+        for lock_id in lock_ids:
+            lock_entries[lock_key][lock_id] = (
+                float(current + lock_expire)
+                if lock_storage == "zset"
+                else str(current + lock_expire)
+            )
+
+        self._expires[lock_key] = lock_expire + time.time()
+
+    def _lpop_any(self, keys):
+        for key in keys:
+            if self._lists[key]:
+                return key, self._lists[key].pop(0)
+
+        return None
+
+    def _zremrangebyscore(self, name, _min, _max):
+        lock_zset = self._zsets[name]
+        removed = [key for key, value in lock_zset.items() if _min <= value <= _max]
+
+        for key in removed:
+            del lock_zset[key]
+
+        return len(removed)
+
+    def _delete(self, name):
+        for entries in (self._keys, self._hashes, self._zsets, self._lists):
+            entries.pop(name, None)
+
+    def _ensure_type(self, name, _type):
+        types = {
+            "string": self._keys,
+            "hash": self._hashes,
+            "zset": self._zsets,
+        }
+
+        for other_type, entries in types.items():
+            if other_type != _type and entries.get(name):
+                raise redis.ResponseError(
+                    "WRONGTYPE Operation against a key holding the wrong kind of value"
+                )
+
+    def _ensure_type_hash(self, name):
+        self._ensure_type(name, "hash")
+
+    def _ensure_type_zset(self, name):
+        self._ensure_type(name, "zset")
 
     def _clean_expired(self, name):
         if time.time() > self._expires[name]:
             del self._expires[name]
 
-            try:
-                del self._hashes[name]
-            except KeyError:
-                pass
+            self._hashes.pop(name, None)
+            self._zsets.pop(name, None)
+
+
+class AsyncRedisMock:
+    def __init__(self, client: RedisMock = None):
+        self.client = client or RedisMock()
+
+    def register_script(self, script):
+        wrapped = self.client.register_script(script)
+
+        async def _script(keys=None, args=None, client=None):
+            if client is not None:
+                return await client.evalsha(
+                    script, len(keys or []), *(keys or []), *(args or [])
+                )
+
+            return wrapped(keys, args)
+
+        return _script
+
+    def pipeline(self, transaction=True):
+        wrapped = self.client.pipeline(transaction=transaction)
+
+        class _Pipeline:
+            def __getattr__(self, item):
+                async def _wrapper(*args, **kwargs):
+                    getattr(wrapped, item)(*args, **kwargs)
+                    return self
+
+                return _wrapper
+
+            async def execute(self, raise_on_error=True):
+                return wrapped.execute(raise_on_error=raise_on_error)
+
+        return _Pipeline()
+
+    async def blpop(self, keys, timeout=0):
+        deadline = time.monotonic() + (timeout or 2**32)
+
+        while time.monotonic() < deadline:
+            with self.client._lock:
+                item = self.client._lpop_any(keys)
+
+            if item:
+                return item
+
+            await asyncio.sleep(0.001)
+
+        return None
+
+    def __getattr__(self, item):
+        async def _wrapper(*args, **kwargs):
+            return wrapped(*args, **kwargs)
+
+        wrapped = getattr(self.client, item)
+
+        return _wrapper
 
 
 def concurrent(threads: int):
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+import pytest_mock
+import redis
+
+from concurrency_limit.__main__ import main
+
+from test_base import *
+
+
+@pytest.fixture
+def client(mocker: pytest_mock.MockerFixture) -> RedisMock:
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    mocker.patch("concurrency_limit.__main__.get_redis", return_value=client)
+
+    return client
+
+
+def test_cli_list(client: RedisMock, capsys: pytest.CaptureFixture):
+    client.hset("key-1", "expired-1", int(time.time()) - 10)
+    client.hset("key-1", "unexpired-1", int(time.time()) + 10)
+    client.hset("other", "unexpired-1", int(time.time()) + 10)
+
+    assert main(["list", "key*"]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[1].split()[:3] == ["key-1", "1", "1"]
+
+
+def test_cli_holders(client: RedisMock, capsys: pytest.CaptureFixture):
+    client.hset("key-1", "expired-1", int(time.time()) - 10)
+    client.hset("key-1", "unexpired-1", int(time.time()) + 100)
+    client.zadd("key-zset", {"unexpired-2": int(time.time()) + 100})
+
+    assert main(["holders", "key-1"]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines[1:]] == ["expired-1", "unexpired-1"]
+    assert lines[1].endswith("stale")
+
+    assert main(["holders", "key-zset"]) == 0
+    assert "unexpired-2" in capsys.readouterr().out
+
+
+def test_cli_clean(client: RedisMock, capsys: pytest.CaptureFixture):
+    for index in range(3):
+        client.hset(f"key-{index}", "expired-1", int(time.time()) - 10)
+        client.hset(f"key-{index}", "unexpired-1", int(time.time()) + 10)
+
+    assert main(["--url", "redis://localhost:6379/1", "clean", "key-*"]) == 0
+
+    assert capsys.readouterr().out.splitlines()[-1] == (
+        "Cleaned 3 execution slots of 3 keys"
+    )
+    assert all(client.hlen(f"key-{index}") == 1 for index in range(3))
+
+
+def test_cli_load(client: RedisMock, capsys: pytest.CaptureFixture):
+    assert (
+        main(["load", "key-1", "--limit", "2", "--workers", "4", "--duration", "0.2"])
+        == 0
+    )
+
+    output = capsys.readouterr().out
+    assert "Acquires:" in output
+    assert "Errors:      0" in output
+    assert "Wait p99:" in output
+
+
+def test_cli_redis_error(
+    client: RedisMock, mocker: pytest_mock.MockerFixture, capsys: pytest.CaptureFixture
+):
+    mocker.patch.object(client, "scan_iter", side_effect=redis.ConnectionError("down"))
+
+    assert main(["list"]) == 1
+    assert capsys.readouterr().err == "Error: down\n"
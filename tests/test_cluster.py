@@ -0,0 +1,207 @@
+import asyncio
+import time
+
+import pytest
+import pytest_mock
+import redis
+import redis.asyncio.cluster
+import redis.cluster
+
+import concurrency_limit
+from concurrency_limit._connections import get_async_redis, get_redis
+from concurrency_limit._renewal import SlotRenewer
+
+# The tests of this module run on a Redis Cluster client of a single in-memory node serving all slots.
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+class _ClusterConnection(fakeredis.FakeRedisConnection):
+    _reply = None
+
+    def send_command(self, *args, **kwargs):
+        # The in-memory server does not know the cluster commands, so the topology of a single node is replied.
+        if str(args[0]).upper().startswith("CLUSTER"):
+            self._reply = [[0, 16383, [self.host.encode(), self.port, b"node-1"]]]
+            return
+
+        super().send_command(*args, **kwargs)
+
+    def read_response(self, **kwargs):
+        if self._reply is not None:
+            reply, self._reply = self._reply, None
+            return reply
+
+        return super().read_response(**kwargs)
+
+
+class _NodeRedis(redis.Redis):
+    def __init__(self, host, port, **kwargs):
+        super().__init__(
+            connection_pool=redis.ConnectionPool(
+                host=host, port=port, connection_class=_ClusterConnection
+            )
+        )
+
+
+class _AsyncClusterConnection(fakeredis.FakeAsyncRedisConnection):
+    _reply = None
+
+    async def send_packed_command(self, command, check_health=True):
+        packed = b"".join(command) if isinstance(command, (list, tuple)) else command
+
+        if b"CLUSTER" in packed.upper()[:32]:
+            self._reply = [[0, 16383, [self.host.encode(), self.port, b"node-1"]]]
+            return
+
+        await super().send_packed_command(command, check_health)
+
+    async def read_response(self, *args, **kwargs):
+        if self._reply is not None:
+            reply, self._reply = self._reply, None
+            return reply
+
+        return await super().read_response(*args, **kwargs)
+
+
+class _AsyncClusterNode(redis.asyncio.cluster.ClusterNode):
+    def __init__(self, host, port, server_type=None, **kwargs):
+        kwargs["connection_class"] = _AsyncClusterConnection
+        super().__init__(host, port, server_type, **kwargs)
+
+
+@pytest.fixture
+def redis_configuration(mocker: pytest_mock.MockerFixture, request):
+    mocker.patch("redis.cluster.Redis", _NodeRedis)
+    mocker.patch("redis.asyncio.cluster.ClusterNode", _AsyncClusterNode)
+
+    # Each test uses a node of its own, as clients are cached per configuration.
+    return concurrency_limit.RedisConfiguration(
+        cluster_nodes=((request.node.name, 7000),)
+    )
+
+
+@pytest.fixture
+def client(redis_configuration):
+    client = get_redis(redis_configuration)
+    assert isinstance(client, redis.cluster.RedisCluster)
+
+    return client
+
+
+@pytest.mark.parametrize("storage", ["hash", "zset"])
+def test_limit(redis_configuration, client, storage: str):
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0, limit_storage=storage, limit_notify=True
+    )
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(redis_configuration, limit_configuration):
+                pass
+
+    assert not client.exists("key-1")
+
+
+def test_limit_fair(redis_configuration, client):
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="{key-1}", limit=1, limit_timeout=0, limit_fair=True
+    )
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration):
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(redis_configuration, limit_configuration):
+                pass
+
+    assert not client.exists("{key-1}")
+    assert client.zcard(limit_configuration.get_queue_key()) == 0
+
+
+def test_limit_all(redis_configuration, client):
+    limit_configurations = [
+        concurrency_limit.LimitConfiguration(
+            key="{tenant-1}:global", limit=2, limit_notify=True
+        ),
+        concurrency_limit.LimitConfiguration(
+            key="{tenant-1}:user-1", limit=1, limit_timeout=0, limit_notify=True
+        ),
+    ]
+
+    with concurrency_limit.limit_all(
+        redis_configuration, limit_configurations
+    ) as counts:
+        assert counts == (1, 1)
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit_all(redis_configuration, limit_configurations):
+                pass
+
+    assert not client.exists("{tenant-1}:global", "{tenant-1}:user-1")
+    assert client.llen(limit_configurations[1].get_notify_key()) == 1
+
+
+def test_limit_clean_and_stats(redis_configuration, client):
+    current = int(time.time())
+
+    for key in ("{tenant-1}:a", "{tenant-2}:b"):
+        client.hset(key, mapping={"expired-1": current - 10, "valid-1": current + 60})
+
+    assert sorted(
+        (stats.key, stats.stale)
+        for stats in concurrency_limit.limit_stats(redis_configuration, "*")
+    ) == [("{tenant-1}:a", 1), ("{tenant-2}:b", 1)]
+    assert (
+        concurrency_limit.limit_clean(
+            redis_configuration,
+            concurrency_limit.LimitConfiguration(key="{tenant-1}:a", limit=1),
+        )
+        == 1
+    )
+    assert concurrency_limit.limit_clean_many(
+        redis_configuration, ["{tenant-2}:b"]
+    ) == {"{tenant-2}:b": 1}
+
+
+def test_renew(client):
+    client.hset("key-1", "lock-1", int(time.time()) + 10)
+
+    renewer = SlotRenewer()
+
+    # The first renewal loads the missing script, and the next one renews the execution slot.
+    renewer._renew(client, [("key-1", "lock-1", 60, "hash")])
+    renewer._renew(client, [("key-1", "lock-1", 60, "hash")])
+
+    assert int(client.hget("key-1", "lock-1")) > time.time() + 40
+
+
+def test_alimit_all(redis_configuration):
+    limit_configurations = [
+        concurrency_limit.LimitConfiguration(
+            key="{tenant-1}:global", limit=2, limit_notify=True
+        ),
+        concurrency_limit.LimitConfiguration(
+            key="{tenant-1}:user-1", limit=1, limit_timeout=0, limit_notify=True
+        ),
+    ]
+
+    async def _main():
+        client = get_async_redis(redis_configuration)
+        assert isinstance(client, redis.asyncio.cluster.RedisCluster)
+
+        async with concurrency_limit.alimit_all(
+            redis_configuration, limit_configurations
+        ) as counts:
+            assert counts == (1, 1)
+
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                async with concurrency_limit.alimit_all(
+                    redis_configuration, limit_configurations
+                ):
+                    pass
+
+        assert not await client.exists("{tenant-1}:global", "{tenant-1}:user-1")
+        assert await client.llen(limit_configurations[1].get_notify_key()) == 1
+
+    asyncio.run(_main())
@@ -1,10 +1,17 @@
 import typing
 
+import redis.asyncio
 import redis.connection
 
 import pytest
 
-from concurrency_limit import RedisConfiguration
+from concurrency_limit import (
+    CircuitBreaker,
+    ExponentialBackoff,
+    FixedBackoff,
+    LimitConfiguration,
+    RedisConfiguration,
+)
 
 
 @pytest.mark.parametrize(
@@ -123,3 +130,130 @@ def test_configuration_get_connection_class(
     config: RedisConfiguration, expected_class: typing.Type[redis.Connection]
 ):
     assert config.get_connection_class() == expected_class
+
+
+@pytest.mark.parametrize(
+    "config,expected_class",
+    [
+        (RedisConfiguration(), redis.asyncio.Connection),
+        (RedisConfiguration(secure=True), redis.asyncio.SSLConnection),
+        (
+            RedisConfiguration(unix_socket=True),
+            redis.asyncio.UnixDomainSocketConnection,
+        ),
+        (
+            RedisConfiguration(connection_class=redis.SSLConnection),
+            redis.asyncio.SSLConnection,
+        ),
+        (
+            RedisConfiguration(connection_class=redis.asyncio.SSLConnection),
+            redis.asyncio.SSLConnection,
+        ),
+    ],
+)
+def test_configuration_get_async_connection_class(
+    config: RedisConfiguration, expected_class: typing.Type[redis.asyncio.Connection]
+):
+    assert config.get_async_connection_class() == expected_class
+
+
+@pytest.mark.parametrize(
+    "key,notify_key",
+    [
+        ("key-1", "{key-1}:notify"),
+        ("{tenant-1}:key-1", "{tenant-1}:key-1:notify"),
+        ("key-{tenant-1}", "key-{tenant-1}:notify"),
+        ("key-{}", "{key-{}}:notify"),
+    ],
+)
+def test_limit_configuration_get_notify_key(key: str, notify_key: str):
+    assert LimitConfiguration(key=key, limit=1).get_notify_key() == notify_key
+
+
+@pytest.mark.parametrize(
+    "key,queue_key,ticket_key",
+    [
+        ("key-1", "{key-1}:queue", "{key-1}:tickets"),
+        ("{tenant-1}:key-1", "{tenant-1}:key-1:queue", "{tenant-1}:key-1:tickets"),
+    ],
+)
+def test_limit_configuration_get_queue_key(key: str, queue_key: str, ticket_key: str):
+    limit_configuration = LimitConfiguration(key=key, limit=1)
+
+    assert limit_configuration.get_queue_key() == queue_key
+    assert limit_configuration.get_ticket_key() == ticket_key
+
+
+@pytest.mark.parametrize(
+    "key,adaptive_key",
+    [("key-1", "{key-1}:adaptive"), ("{tenant-1}:key-1", "{tenant-1}:key-1:adaptive")],
+)
+def test_limit_configuration_get_adaptive_key(key: str, adaptive_key: str):
+    assert LimitConfiguration(key=key, limit=1).get_adaptive_key() == adaptive_key
+
+
+def test_fixed_backoff():
+    backoff = FixedBackoff(interval=0.5)
+
+    assert [backoff.get_interval(attempt, 0.5) for attempt in range(1, 4)] == [0.5] * 3
+    assert backoff.get_max_interval() == 0.5
+
+
+def test_exponential_backoff():
+    backoff = ExponentialBackoff(base=0.1, factor=2, cap=1, jitter="none")
+
+    assert [backoff.get_interval(attempt, 0) for attempt in range(1, 7)] == [
+        0.1,
+        0.2,
+        0.4,
+        0.8,
+        1,
+        1,
+    ]
+    assert backoff.get_interval(10000, 1) == 1
+
+
+@pytest.mark.parametrize("jitter", ["full", "decorrelated"])
+def test_exponential_backoff_jitter(jitter: str):
+    backoff = ExponentialBackoff(base=0.1, factor=2, cap=1, jitter=jitter)
+    interval = 0
+
+    for attempt in range(1, 100):
+        interval = backoff.get_interval(attempt, interval)
+        assert 0 <= interval <= 1
+
+    assert len({backoff.get_interval(4, 0.5) for _ in range(10)}) > 1
+
+
+def test_limit_configuration_get_max_interval():
+    assert LimitConfiguration(key="key-1", limit=1).get_max_interval() == 0.1
+    assert (
+        LimitConfiguration(
+            key="key-1", limit=1, limit_backoff=ExponentialBackoff(cap=2)
+        ).get_max_interval()
+        == 2
+    )
+
+
+@pytest.mark.parametrize("limit_weight", [0, -1, 4])
+def test_limit_configuration_invalid_weight(limit_weight: int):
+    with pytest.raises(ValueError):
+        LimitConfiguration(key="key-1", limit=3, limit_weight=limit_weight)
+
+
+def test_limit_configuration_weight():
+    assert LimitConfiguration(key="key-1", limit=3, limit_weight=3).limit_weight == 3
+
+
+def test_limit_configuration_zero_limit():
+    # A limit of 0 rejects all scopes, and is valid with the default weight.
+    assert LimitConfiguration(key="key-1", limit=0).limit == 0
+
+    with pytest.raises(ValueError, match="at least 1"):
+        LimitConfiguration(key="key-1", limit=0, limit_weight=0)
+
+
+def test_circuit_breaker_get_local_limit():
+    assert CircuitBreaker().get_local_limit(10) == 10
+    assert CircuitBreaker(expected_nodes=3).get_local_limit(10) == 3
+    assert CircuitBreaker(expected_nodes=20).get_local_limit(10) == 1
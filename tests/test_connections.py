@@ -0,0 +1,144 @@
+import pytest_mock
+import redis.asyncio.sentinel
+import redis.sentinel
+
+from concurrency_limit import CircuitBreaker, RedisConfiguration
+from concurrency_limit._connections import get_async_redis, get_cached_redis, get_redis
+
+
+def test_get_redis_cluster(mocker: pytest_mock.MockerFixture):
+    cluster = mocker.patch("redis.cluster.RedisCluster")
+
+    client = get_redis(
+        RedisConfiguration(
+            cluster_nodes=(("redis-1", 6379), ("redis-2", 6380)),
+            password="password",
+            secure=True,
+        )
+    )
+
+    assert client == cluster.return_value
+
+    startup_nodes = cluster.call_args.kwargs["startup_nodes"]
+    assert [(node.host, node.port) for node in startup_nodes] == [
+        ("redis-1", 6379),
+        ("redis-2", 6380),
+    ]
+    assert cluster.call_args.kwargs["password"] == "password"
+    assert cluster.call_args.kwargs["ssl"] is True
+    assert cluster.call_args.kwargs["socket_connect_timeout"] == 10
+
+
+def test_get_async_redis_cluster(mocker: pytest_mock.MockerFixture):
+    cluster = mocker.patch("redis.asyncio.cluster.RedisCluster")
+
+    client = get_async_redis(
+        RedisConfiguration(cluster_nodes=(("redis-1", 6379),), max_connections=5)
+    )
+
+    assert client == cluster.return_value
+    assert cluster.call_args.kwargs["max_connections"] == 5
+
+
+def test_get_redis_socket_timeouts(mocker: pytest_mock.MockerFixture):
+    cluster = mocker.patch("redis.cluster.RedisCluster")
+    circuit_breaker = CircuitBreaker(call_timeout=0.5)
+
+    get_redis(
+        RedisConfiguration(
+            cluster_nodes=(("redis-1", 6379),), circuit_breaker=circuit_breaker
+        )
+    )
+    client = get_redis(
+        RedisConfiguration(host="redis-1", circuit_breaker=circuit_breaker)
+    )
+    sentinel_client = get_redis(
+        RedisConfiguration(
+            sentinels=(("sentinel-1", 26379),),
+            sentinel_master="master-1",
+            circuit_breaker=circuit_breaker,
+        )
+    )
+
+    assert cluster.call_args.kwargs["socket_timeout"] == 0.5
+    assert cluster.call_args.kwargs["socket_connect_timeout"] == 0.5
+    assert client.connection_pool.connection_kwargs["socket_timeout"] == 0.5
+    assert client.connection_pool.connection_kwargs["socket_connect_timeout"] == 0.5
+    assert sentinel_client.connection_pool.connection_kwargs["socket_timeout"] == 0.5
+    assert [
+        sentinel.connection_pool.connection_kwargs["socket_timeout"]
+        for sentinel in sentinel_client.connection_pool.sentinel_manager.sentinels
+    ] == [0.5]
+
+
+def test_get_redis_sentinel():
+    client = get_redis(
+        RedisConfiguration(
+            sentinels=(("sentinel-1", 26379), ("sentinel-2", 26379)),
+            sentinel_master="master-1",
+            db=2,
+            max_connections=3,
+            timeout=5,
+            secure=True,
+        )
+    )
+
+    assert isinstance(client.connection_pool, redis.sentinel.SentinelConnectionPool)
+    assert isinstance(client.connection_pool, redis.BlockingConnectionPool)
+    assert client.connection_pool.max_connections == 3
+    assert client.connection_pool.timeout == 5
+    assert client.connection_pool.service_name == "master-1"
+    assert client.connection_pool.connection_kwargs["db"] == 2
+    assert (
+        client.connection_pool.connection_class
+        == redis.sentinel.SentinelManagedSSLConnection
+    )
+    assert [
+        sentinel.connection_pool.connection_kwargs["host"]
+        for sentinel in client.connection_pool.sentinel_manager.sentinels
+    ] == ["sentinel-1", "sentinel-2"]
+
+
+def test_get_async_redis_sentinel():
+    client = get_async_redis(
+        RedisConfiguration(
+            sentinels=(("sentinel-1", 26379),), sentinel_master="master-1"
+        )
+    )
+
+    assert isinstance(
+        client.connection_pool, redis.asyncio.sentinel.SentinelConnectionPool
+    )
+    assert isinstance(client.connection_pool, redis.asyncio.BlockingConnectionPool)
+    assert client.connection_pool.timeout == 10
+    assert client.connection_pool.service_name == "master-1"
+
+
+def test_get_redis_connection_address():
+    client = get_redis(RedisConfiguration(host="redis-1", port=6380, db=2))
+    connection = client.connection_pool.make_connection()
+    assert (connection.host, connection.port, connection.db) == ("redis-1", 6380, 2)
+
+    client = get_redis(RedisConfiguration(path="/tmp/redis.sock", unix_socket=True))
+    assert client.connection_pool.make_connection().path == "/tmp/redis.sock"
+
+
+def test_get_async_redis_connection_address():
+    client = get_async_redis(RedisConfiguration(host="redis-1", port=6380))
+    connection = client.connection_pool.make_connection()
+    assert (connection.host, connection.port) == ("redis-1", 6380)
+
+
+def test_get_cached_redis():
+    configuration = RedisConfiguration(host="redis-1", client_cache=True)
+    client = get_cached_redis(configuration)
+
+    assert client is get_cached_redis(configuration)
+    assert client is not get_redis(configuration)
+    assert client.connection_pool.cache is not None
+    assert client.connection_pool.connection_kwargs["protocol"] == 3
+
+    configuration = RedisConfiguration(
+        connection_pool=redis.ConnectionPool(), client_cache=True
+    )
+    assert get_cached_redis(configuration) is get_redis(configuration)
@@ -0,0 +1,97 @@
+import time
+
+import pytest_mock
+
+import concurrency_limit
+from concurrency_limit import _janitor
+
+from test_base import *
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+
+        time.sleep(0.01)
+
+    return True
+
+
+def test_janitor(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    mocker.patch("concurrency_limit._janitor._janitor", None)
+    mocker.patch("concurrency_limit._janitor._JANITOR_MIN_INTERVAL", 0.01)
+
+    client.hset("key-1", "expired-1", int(time.time()) - 10)
+    client.hset("key-1", "expired-2", int(time.time()) - 10)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=5, limit_expire=1, limit_janitor=True
+        ),
+    ):
+        # The stale execution slots are not pruned on acquisition, as the limit is not reached.
+        assert client.hlen("key-1") == 3
+        assert _wait_for(lambda: client.hlen("key-1") == 1)
+
+    # The key is forgotten once it was cleaned after the expire time of its last use.
+    assert _wait_for(lambda: _janitor.get_janitor()._thread is None)
+
+
+def test_janitor_local(tmp_path, mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit._janitor._janitor", None)
+    mocker.patch("concurrency_limit._janitor._JANITOR_MIN_INTERVAL", 0.01)
+
+    clean_many = mocker.spy(concurrency_limit.LocalBackend, "clean_many")
+
+    with concurrency_limit.limit(
+        concurrency_limit.LocalConfiguration(path=str(tmp_path)),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=1, limit_expire=0, limit_janitor=True
+        ),
+    ):
+        pass
+
+    assert _wait_for(lambda: _janitor.get_janitor()._thread is None)
+    assert clean_many.call_count == 1
+
+
+def test_janitor_budget(mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit._janitor._JANITOR_BUDGET", 2)
+
+    janitor = _janitor.Janitor()
+    configuration = concurrency_limit.RedisConfiguration()
+
+    for key in ["key-1", "key-2", "key-3"]:
+        janitor._entries[
+            (configuration, concurrency_limit.LimitConfiguration(key=key, limit=1))
+        ] = 0.0
+
+    def _keys(due):
+        return [
+            limit_configuration.key
+            for limit_configuration, _ in due[(configuration, "hash")]
+        ]
+
+    assert _keys(janitor._pop_due()) == ["key-1", "key-2"]
+    assert _keys(janitor._pop_due()) == ["key-3", "key-1"]
+
+
+def test_janitor_interval():
+    interval = _janitor._JANITOR_MIN_INTERVAL
+
+    for _ in range(10):
+        interval = _janitor._next_interval(interval, 0)
+
+    assert interval == _janitor._JANITOR_MAX_INTERVAL
+    assert _janitor._next_interval(interval, 5) == interval / 2
+
+    for _ in range(10):
+        interval = _janitor._next_interval(interval, 5)
+
+    assert interval == _janitor._JANITOR_MIN_INTERVAL
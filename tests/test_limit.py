@@ -1,17 +1,22 @@
+import dataclasses
+import socket
+import threading
 import time
 
 import pytest
 import pytest_mock
+import redis.exceptions
 
 import concurrency_limit
+from concurrency_limit._circuit import get_circuit
+from concurrency_limit._renewal import SlotRenewer
+from concurrency_limit._slots import get_slots
 
 from test_base import *
 
 
 def test_limit_without_concurrency(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     with concurrency_limit.limit(
         concurrency_limit.RedisConfiguration(),
@@ -21,9 +26,7 @@ def test_limit_without_concurrency(mocker: pytest_mock.MockerFixture):
 
 
 def test_limit_slot_ids(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     slot_ids = []
 
@@ -45,9 +48,7 @@ def test_limit_slot_ids(mocker: pytest_mock.MockerFixture):
 
 
 def test_limit_within_limit(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     @concurrent(threads=1)
     def _concurrent_function():
@@ -61,9 +62,7 @@ def test_limit_within_limit(mocker: pytest_mock.MockerFixture):
 
 
 def test_limit_exceeded_limit_without_timeout(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     @concurrent(threads=10)
     def _concurrent_function():
@@ -78,9 +77,7 @@ def test_limit_exceeded_limit_without_timeout(mocker: pytest_mock.MockerFixture)
 
 
 def test_limit_exceeded_limit_within_timeout(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     @concurrent(threads=10)
     def _concurrent_function():
@@ -94,9 +91,7 @@ def test_limit_exceeded_limit_within_timeout(mocker: pytest_mock.MockerFixture):
 
 
 def test_limit_exceeded_limit_exceeded_timeout(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     @concurrent(threads=10)
     def _concurrent_function():
@@ -111,9 +106,7 @@ def test_limit_exceeded_limit_exceeded_timeout(mocker: pytest_mock.MockerFixture
 
 
 def test_limit_within_limit_expire(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     with concurrency_limit.limit(
         concurrency_limit.RedisConfiguration(),
@@ -134,9 +127,7 @@ def test_limit_within_limit_expire(mocker: pytest_mock.MockerFixture):
 
 
 def test_limit_exceeded_limit_expire(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     with concurrency_limit.limit(
         concurrency_limit.RedisConfiguration(),
@@ -156,9 +147,7 @@ def test_limit_exceeded_limit_expire(mocker: pytest_mock.MockerFixture):
 
 
 def test_limit_with_high_load(mocker: pytest_mock.MockerFixture):
-    mocker.patch(
-        "concurrency_limit.context_managers.get_redis", return_value=RedisMock()
-    )
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
 
     counter = 0
 
@@ -186,7 +175,7 @@ def test_limit_with_high_load(mocker: pytest_mock.MockerFixture):
 
 def test_limit_wrong_type(mocker: pytest_mock.MockerFixture):
     client = RedisMock()
-    mocker.patch("concurrency_limit.context_managers.get_redis", return_value=client)
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
 
     client.set("key-1", int(time.time()) + 10)
 
@@ -199,7 +188,7 @@ def test_limit_wrong_type(mocker: pytest_mock.MockerFixture):
 
 def test_limit_clean(mocker: pytest_mock.MockerFixture):
     client = RedisMock()
-    mocker.patch("concurrency_limit.utils.get_redis", return_value=client)
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
 
     client.hset("key-1", "expired-1", int(time.time()) - 10)
     client.hset("key-1", "expired-2", int(time.time()) - 10)
@@ -225,7 +214,7 @@ def test_limit_clean(mocker: pytest_mock.MockerFixture):
 
 def test_limit_clean_expire_wrong_type(mocker: pytest_mock.MockerFixture):
     client = RedisMock()
-    mocker.patch("concurrency_limit.utils.get_redis", return_value=client)
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
 
     client.hset("key-1", "valid-1", int(time.time()) + 10)
     client.hset("key-1", "valid-2", int(time.time()) + 10)
@@ -251,7 +240,7 @@ def test_limit_clean_expire_wrong_type(mocker: pytest_mock.MockerFixture):
 
 def test_limit_clean_wrong_type(mocker: pytest_mock.MockerFixture):
     client = RedisMock()
-    mocker.patch("concurrency_limit.utils.get_redis", return_value=client)
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
 
     client.set("key-1", int(time.time()) + 10)
 
@@ -262,3 +251,1124 @@ def test_limit_clean_wrong_type(mocker: pytest_mock.MockerFixture):
         )
         == 1
     )
+
+
+def test_limit_clean_many(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    mocker.patch("concurrency_limit.backends._CLEAN_BATCH", 2)
+
+    for index in range(5):
+        client.hset(f"key-{index}", "expired-1", int(time.time()) - 10)
+        client.hset(f"key-{index}", "invalid-1", "abc")
+        client.hset(f"key-{index}", "unexpired-1", int(time.time()) + 10)
+
+    client.zadd("key-zset", {"expired-1": int(time.time()) - 10})
+    client.zadd("{key-5}:queue", {"ticket-1": 1})
+    scan_iter = mocker.spy(client, "scan_iter")
+
+    counts = concurrency_limit.limit_clean_many(
+        concurrency_limit.RedisConfiguration(), "*"
+    )
+
+    assert counts == {**{f"key-{index}": 2 for index in range(5)}, "key-zset": 0}
+    scan_iter.assert_called_once_with("*", count=1000)
+    assert all(client.hlen(f"key-{index}") == 1 for index in range(5))
+    assert client.zcard("key-zset") == 1
+    assert client.zcard("{key-5}:queue") == 1
+
+    assert concurrency_limit.limit_clean_many(
+        concurrency_limit.RedisConfiguration(), ["key-zset", "key-0"], "zset"
+    ) == {"key-zset": 1, "key-0": 0}
+
+
+def test_limit_clean_many_missing_script(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    client.hset("key-1", "expired-1", int(time.time()) - 10)
+    client.script_load = mocker.Mock()
+
+    pipeline = client.pipeline
+    attempts = []
+
+    def _pipeline(transaction=True):
+        wrapped = pipeline(transaction=transaction)
+        execute = wrapped.execute
+
+        def _execute(raise_on_error=True):
+            attempts.append(True)
+
+            if len(attempts) == 1:
+                wrapped.buffer = []
+                raise redis.exceptions.NoScriptError()
+
+            return execute(raise_on_error)
+
+        wrapped.execute = _execute
+        return wrapped
+
+    client.pipeline = _pipeline
+
+    assert list(
+        concurrency_limit.limit_clean_many(
+            concurrency_limit.RedisConfiguration(), ["key-1"]
+        )
+    ) == ["key-1"]
+    assert client.hlen("key-1") == 0
+    assert len(attempts) == 2
+    client.script_load.assert_called_once()
+
+
+def test_limit_stats(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    current = int(time.time())
+
+    for index in range(3):
+        client.hset(f"key-{index}", "expired-1", current - 10)
+        client.hset(f"key-{index}", "unexpired-1", current + 10)
+        client.hset(f"key-{index}", "unexpired-2", current + 20 + index)
+
+    client.zadd("key-zset", {"expired-1": current - 10, "unexpired-1": current + 5})
+    client.zadd("{key-0}:queue", {"ticket-1": 1})
+    client.set("key-string", "value")
+    scan_iter = mocker.spy(client, "scan_iter")
+
+    stats = concurrency_limit.limit_stats(
+        concurrency_limit.RedisConfiguration(), "key*", batch_size=2
+    )
+
+    assert sorted(stats, key=lambda item: item.key) == [
+        *(
+            concurrency_limit.LimitStats(
+                key=f"key-{index}",
+                count=2,
+                stale=1,
+                oldest_expire=current + 10,
+                newest_expire=current + 20 + index,
+            )
+            for index in range(3)
+        ),
+        concurrency_limit.LimitStats(
+            key="key-zset",
+            count=1,
+            stale=1,
+            oldest_expire=current + 5,
+            newest_expire=current + 5,
+        ),
+    ]
+
+    # The keys are scanned in steps of the batch size, instead of the default `COUNT` of 10.
+    scan_iter.assert_called_once_with("key*", count=2)
+    assert (
+        list(
+            concurrency_limit.limit_stats(concurrency_limit.RedisConfiguration(), "{*")
+        )
+        == []
+    )
+
+
+def test_limit_saturation_cache(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    commands = [
+        mocker.spy(client, name)
+        for name in ("evalsha", "hdel", "zrem", "pipeline", "lpush", "hget")
+    ]
+    evalsha = commands[0]
+
+    redis_configuration = concurrency_limit.RedisConfiguration()
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0, limit_saturation_cache=0.2
+    )
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration):
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(redis_configuration, limit_configuration):
+                pass
+
+        # The rejected scope only probed Redis, and released nothing.
+        assert sum(command.call_count for command in commands) == 2
+
+        for _ in range(2):
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                with concurrency_limit.limit(redis_configuration, limit_configuration):
+                    pass
+
+        # The other scopes were rejected by the process without sending any command to Redis.
+        assert sum(command.call_count for command in commands) == 2
+        assert evalsha.call_count == 2
+
+        time.sleep(0.2)
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(redis_configuration, limit_configuration):
+                pass
+
+        assert evalsha.call_count == 3
+
+    # Releasing the execution slot invalidates the cached rejection right away.
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+
+
+def test_limit_count(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    redis_configuration = concurrency_limit.RedisConfiguration()
+    limit_configuration = concurrency_limit.LimitConfiguration(key="key-1", limit=3)
+
+    client.hset("key-1", "expired-1", int(time.time()) - 10)
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration):
+        with concurrency_limit.limit(redis_configuration, limit_configuration):
+            assert (
+                concurrency_limit.limit_count(redis_configuration, limit_configuration)
+                == 2
+            )
+            assert not concurrency_limit.is_saturated(
+                redis_configuration, limit_configuration
+            )
+            assert concurrency_limit.is_saturated(
+                redis_configuration,
+                concurrency_limit.LimitConfiguration(
+                    key="key-1", limit=3, limit_weight=2
+                ),
+            )
+
+    assert concurrency_limit.limit_count(redis_configuration, limit_configuration) == 0
+
+
+def test_limit_count_client_cache(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    cache_client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    get_cached_redis = mocker.patch(
+        "concurrency_limit.backends.get_cached_redis", return_value=cache_client
+    )
+
+    redis_configuration = concurrency_limit.RedisConfiguration(client_cache=True)
+
+    cache_client.hset("key-1", "expired-1", int(time.time()) - 10)
+    cache_client.hset("key-1", "unexpired-1", int(time.time()) + 10)
+    cache_client.zadd("key-zset", {"unexpired-1": int(time.time()) + 10})
+
+    # The counts are read using the client with client-side caching, while the execution slots are acquired using
+    # the regular client.
+    assert (
+        concurrency_limit.limit_count(
+            redis_configuration,
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        )
+        == 1
+    )
+    assert concurrency_limit.is_saturated(
+        redis_configuration,
+        concurrency_limit.LimitConfiguration(
+            key="key-zset", limit=1, limit_storage="zset"
+        ),
+    )
+    get_cached_redis.assert_called_with(redis_configuration)
+
+    with concurrency_limit.limit(
+        redis_configuration, concurrency_limit.LimitConfiguration(key="key-1", limit=1)
+    ) as count:
+        assert count == 1
+
+
+def test_limit_prunes_expired(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    client.hset("key-1", "expired-1", int(time.time()) - 10)
+    client.hset("key-1", "invalid-1", "abc")
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=1, limit_timeout=0),
+    ) as slot_id:
+        assert slot_id == 1
+        assert client.hlen("key-1") == 1
+
+    assert client.hlen("key-1") == 0
+
+
+def test_limit_script_cache():
+    client = RedisMock()
+
+    assert concurrency_limit._scripts.get_script(
+        client, concurrency_limit._scripts.ACQUIRE_SCRIPT
+    ) is concurrency_limit._scripts.get_script(
+        client, concurrency_limit._scripts.ACQUIRE_SCRIPT
+    )
+
+
+def test_limit_notify(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=5, limit_interval=10, limit_notify=True
+    )
+    waits = []
+
+    @concurrent(threads=5)
+    def _concurrent_function():
+        start = time.monotonic()
+
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            waits.append(time.monotonic() - start)
+            time.sleep(0.2)
+
+    _concurrent_function()
+
+    # Waiting scopes are woken up by the release, instead of waiting for the huge interval.
+    assert max(waits) < 2
+    assert client.hlen("key-1") == 0
+
+
+def test_limit_notify_exceeded_limit_exceeded_timeout(
+    mocker: pytest_mock.MockerFixture,
+):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    client.hset("key-1", "holder-1", int(time.time()) + 10)
+
+    start = time.monotonic()
+
+    with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=1, limit_timeout=2, limit_notify=True
+            ),
+        ):
+            pass  # pragma: no cover
+
+    assert 2 <= time.monotonic() - start < 3
+
+
+def test_limit_zset_slot_ids(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    slot_ids = []
+
+    @concurrent(threads=10)
+    def _concurrent_function():
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=10, limit_timeout=0, limit_storage="zset"
+            ),
+        ) as slot_id:
+            slot_ids.append(slot_id)
+            time.sleep(1)
+
+    _concurrent_function()
+
+    slot_ids.sort()
+    assert slot_ids == list(range(1, 11))
+    assert client.zcard("key-1") == 0
+
+
+def test_limit_zset_exceeded_limit_without_timeout(mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+
+    @concurrent(threads=10)
+    def _concurrent_function():
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=1, limit_timeout=0, limit_storage="zset"
+            ),
+        ):
+            time.sleep(1)
+
+    with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+        _concurrent_function()
+
+
+def test_limit_zset_prunes_expired(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    # A crashed holder of a busy key does not reduce the usable capacity once its slot expired.
+    client.zadd("key-1", {"crashed-1": int(time.time()) - 1})
+    client.expire("key-1", 60)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=1, limit_timeout=0, limit_storage="zset"
+        ),
+    ) as slot_id:
+        assert slot_id == 1
+
+    assert client.zcard("key-1") == 0
+
+
+def test_limit_zset_wrong_type(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    client.hset("key-1", "holder-1", int(time.time()) + 10)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=1, limit_timeout=0, limit_storage="zset"
+        ),
+    ):
+        assert client.zcard("key-1") == 1
+
+
+def test_limit_clean_zset(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    client.zadd(
+        "key-1",
+        {
+            "expired-1": int(time.time()) - 10,
+            "expired-2": int(time.time()) - 10,
+            "unexpired-1": int(time.time()) + 10,
+        },
+    )
+
+    assert (
+        concurrency_limit.limit_clean(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=1, limit_storage="zset"
+            ),
+        )
+        == 2
+    )
+    assert client.zcard("key-1") == 1
+
+
+@pytest.mark.parametrize("limit_storage", ["hash", "zset"])
+def test_limit_renew(mocker: pytest_mock.MockerFixture, limit_storage: str):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1",
+            limit=1,
+            limit_expire=3,
+            limit_timeout=0,
+            limit_renew=True,
+            limit_storage=limit_storage,
+        ),
+    ):
+        time.sleep(5)
+
+        # The execution slot did not expire, as it was renewed in the background.
+        with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(),
+                concurrency_limit.LimitConfiguration(
+                    key="key-1",
+                    limit=1,
+                    limit_expire=3,
+                    limit_timeout=0,
+                    limit_storage=limit_storage,
+                ),
+            ):
+                pass  # pragma: no cover
+
+
+def test_limit_renew_batched(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    pipeline = mocker.spy(client, "pipeline")
+
+    @concurrent(threads=10)
+    def _concurrent_function():
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=10, limit_expire=3, limit_renew=True
+            ),
+        ):
+            time.sleep(1.5)
+
+    _concurrent_function()
+
+    # All ten execution slots are renewed with a single pipeline.
+    assert pipeline.call_count == 1
+    assert client.hlen("key-1") == 0
+
+
+def test_limit_prefetch(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    evalsha = mocker.spy(client, "evalsha")
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=10, limit_prefetch=5, limit_prefetch_idle=0.5
+    )
+
+    for _ in range(20):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ) as slot_id:
+            assert slot_id == 1
+            assert client.hlen("key-1") == 5
+
+    # All scopes used the execution slots reserved by the first scope.
+    assert evalsha.call_count == 1
+
+    # Reserved execution slots that were not used are returned to Redis.
+    time.sleep(1)
+    assert client.hlen("key-1") == 0
+
+
+def test_limit_prefetch_count(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    for index in range(3):
+        client.hset("key-1", f"other-{index}", int(time.time()) + 60)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=10, limit_prefetch=5
+    )
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ) as count:
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ) as nested_count:
+            # The yielded count only covers the reserved execution slots in use by the process, while the count of
+            # all processes includes the reserved execution slots and the ones of the other processes.
+            assert (count, nested_count) == (1, 2)
+            assert (
+                concurrency_limit.limit_count(
+                    concurrency_limit.RedisConfiguration(), limit_configuration
+                )
+                == 8
+            )
+
+
+def test_limit_prefetch_exceeded_limit(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=2, limit_timeout=0, limit_prefetch=5
+        ),
+    ):
+        # The process reserved as many execution slots as the limit allows.
+        assert client.hlen("key-1") == 2
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(),
+                concurrency_limit.LimitConfiguration(
+                    key="key-1", limit=2, limit_timeout=0
+                ),
+            ):
+                pass  # pragma: no cover
+
+
+def test_limit_prefetch_with_high_load(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    counter = 0
+
+    @concurrent(threads=200)
+    def _concurrent_function():
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1",
+                limit=20,
+                limit_timeout=10,
+                limit_interval=0.01,
+                limit_prefetch=8,
+            ),
+        ):
+            nonlocal counter
+
+            counter += 1
+
+            assert 1 <= counter <= 20
+            assert client.hlen("key-1") <= 20
+
+            time.sleep(0.05)
+            counter -= 1
+
+    _concurrent_function()
+
+
+@pytest.mark.parametrize("limit_storage", ["hash", "zset"])
+def test_limit_weight(mocker: pytest_mock.MockerFixture, limit_storage: str):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    def _limit(weight: int):
+        return concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1",
+                limit=8,
+                limit_timeout=0,
+                limit_weight=weight,
+                limit_storage=limit_storage,
+            ),
+        )
+
+    with _limit(3) as slot_id_1:
+        with _limit(3) as slot_id_2:
+            assert (slot_id_1, slot_id_2) == (3, 6)
+
+            # The weight of a scope is acquired either completely or not at all.
+            with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+                with _limit(3):
+                    pass  # pragma: no cover
+
+            with _limit(2) as slot_id_3:
+                assert slot_id_3 == 8
+
+    with _limit(8) as slot_id_4:
+        assert slot_id_4 == 8
+
+
+def test_limit_weight_prefetch(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=10, limit_timeout=0, limit_weight=3, limit_prefetch=4
+    )
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ) as slot_id_1:
+        assert slot_id_1 == 3
+        assert client.hlen("key-1") == 4
+
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ) as slot_id_2:
+            assert slot_id_2 == 6
+            assert client.hlen("key-1") == 8
+
+            with pytest.raises(concurrency_limit.ConcurrencyLimitException):
+                with concurrency_limit.limit(
+                    concurrency_limit.RedisConfiguration(), limit_configuration
+                ):
+                    pass  # pragma: no cover
+
+
+def test_limit_all(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    def _limit_all(tenant: str):
+        return concurrency_limit.limit_all(
+            concurrency_limit.RedisConfiguration(),
+            [
+                concurrency_limit.LimitConfiguration(
+                    key=f"{{key-1}}:{tenant}", limit=2, limit_timeout=0
+                ),
+                concurrency_limit.LimitConfiguration(
+                    key="{key-1}:global",
+                    limit=3,
+                    limit_timeout=0,
+                    limit_storage="zset",
+                ),
+            ],
+        )
+
+    with _limit_all("tenant-1") as counts_1:
+        with _limit_all("tenant-1") as counts_2:
+            assert (counts_1, counts_2) == ((1, 1), (2, 2))
+
+            # The tenant limit is exceeded, so the global slot is not acquired either.
+            with pytest.raises(
+                concurrency_limit.ConcurrencyLimitExceededException
+            ) as e:
+                with _limit_all("tenant-1"):
+                    pass  # pragma: no cover
+
+            assert "limit of 2 executions" in str(e.value)
+            assert client.zcard("{key-1}:global") == 2
+
+            with _limit_all("tenant-2") as counts_3:
+                assert counts_3 == (1, 3)
+
+                # The global limit is exceeded, so the tenant slot is not acquired either.
+                with pytest.raises(
+                    concurrency_limit.ConcurrencyLimitExceededException
+                ) as e:
+                    with _limit_all("tenant-3"):
+                        pass  # pragma: no cover
+
+                assert "limit of 3 executions" in str(e.value)
+                assert client.hlen("{key-1}:tenant-3") == 0
+
+    assert client.hlen("{key-1}:tenant-1") == 0
+    assert client.hlen("{key-1}:tenant-2") == 0
+    assert client.zcard("{key-1}:global") == 0
+
+
+def test_limit_all_with_high_load(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    counter = 0
+
+    @concurrent(threads=40)
+    def _concurrent_function():
+        with concurrency_limit.limit_all(
+            concurrency_limit.RedisConfiguration(),
+            [
+                concurrency_limit.LimitConfiguration(
+                    key="{key-1}:tenant", limit=10, limit_interval=0.01
+                ),
+                concurrency_limit.LimitConfiguration(
+                    key="{key-1}:global",
+                    limit=5,
+                    limit_interval=0.01,
+                    limit_weight=2,
+                    limit_renew=True,
+                ),
+            ],
+        ):
+            nonlocal counter
+
+            counter += 1
+
+            assert 1 <= counter <= 2
+            assert client.hlen("{key-1}:global") <= 4
+
+            time.sleep(0.05)
+            counter -= 1
+
+    _concurrent_function()
+
+    assert client.hlen("{key-1}:tenant") == 0
+    assert client.hlen("{key-1}:global") == 0
+
+
+def test_limit_fair(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_interval=0.01, limit_fair=True
+    )
+    order = []
+
+    def _function(index: int):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            order.append(index)
+            time.sleep(0.02)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        threads = []
+
+        for index in range(10):
+            threads.append(threading.Thread(target=_function, args=(index,)))
+            threads[-1].start()
+            time.sleep(0.05)
+
+    for thread in threads:
+        thread.join()
+
+    assert order == list(range(10))
+    assert client.zcard("{key-1}:queue") == 0
+
+
+def test_limit_fair_notify(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    blpop = mocker.spy(client, "blpop")
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_interval=0.01, limit_fair=True, limit_notify=True
+    )
+    order = []
+
+    def _function(index: int):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(), limit_configuration
+        ):
+            order.append(index)
+            time.sleep(0.01)
+
+    start = time.monotonic()
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        threads = []
+
+        for index in range(8):
+            threads.append(threading.Thread(target=_function, args=(index,)))
+            threads[-1].start()
+            time.sleep(0.02)
+
+    for thread in threads:
+        thread.join()
+
+    # Fair scopes poll instead of blocking, so the scope next in line never waits for a notification taken by another.
+    assert order == list(range(8))
+    assert blpop.call_count == 0
+    assert time.monotonic() - start < 1.0
+
+
+def test_limit_fair_prunes_expired_tickets(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    # A ticket of a scope that stopped waiting without removing it.
+    client.zadd("{key-1}:queue", {"ticket-1": time.time() - 10})
+    client.hset("{key-1}:tickets", "ticket-1", time.time() - 5)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0, limit_fair=True
+    )
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ) as slot_id:
+        assert slot_id == 1
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                pass  # pragma: no cover
+
+    # Neither the expired ticket nor the ticket of the timed out scope are left.
+    assert client.zcard("{key-1}:queue") == 0
+
+
+@pytest.mark.parametrize(
+    "limit_priority_aging,expected_order",
+    [
+        (None, [2, 4, 1, 3, 0]),
+        (0.01, [0, 1, 2, 3, 4]),
+    ],
+)
+def test_limit_priority(
+    mocker: pytest_mock.MockerFixture,
+    limit_priority_aging: float,
+    expected_order: list,
+):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1",
+        limit=1,
+        limit_interval=0.01,
+        limit_fair=True,
+        limit_priority_aging=limit_priority_aging,
+    )
+    order = []
+
+    def _function(index: int, priority: int):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            limit_configuration,
+            priority=priority,
+        ):
+            order.append(index)
+            time.sleep(0.02)
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        threads = []
+
+        # With an aging of 0.01 seconds per priority level, arriving 0.05 seconds earlier outweighs the priorities.
+        for index, priority in enumerate([0, 1, 2, 1, 2]):
+            threads.append(threading.Thread(target=_function, args=(index, priority)))
+            threads[-1].start()
+            time.sleep(0.05)
+
+    for thread in threads:
+        thread.join()
+
+    assert order == expected_order
+
+
+def test_limit_exceeded_timeout_clamps_interval(mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0.2, limit_interval=5
+    )
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        start = time.monotonic()
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                pass  # pragma: no cover
+
+        # The wait is cut short at the timeout instead of waiting the full interval.
+        assert time.monotonic() - start < 1
+
+
+@pytest.mark.parametrize(
+    "limit_backoff",
+    [
+        concurrency_limit.FixedBackoff(interval=0.01),
+        concurrency_limit.ExponentialBackoff(base=0.001, cap=0.05),
+        concurrency_limit.ExponentialBackoff(
+            base=0.001, cap=0.05, jitter="decorrelated"
+        ),
+    ],
+)
+def test_limit_backoff(
+    mocker: pytest_mock.MockerFixture, limit_backoff: concurrency_limit.Backoff
+):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    counter = 0
+
+    @concurrent(threads=20)
+    def _concurrent_function():
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=2, limit_backoff=limit_backoff
+            ),
+        ):
+            nonlocal counter
+
+            counter += 1
+            assert 1 <= counter <= 2
+
+            time.sleep(0.01)
+            counter -= 1
+
+    _concurrent_function()
+
+    assert client.hlen("key-1") == 0
+
+
+def test_limit_renew_missing_script():
+    client = RedisMock()
+    renewer = SlotRenewer()
+    renewer._add(client, "key-1", ["lock-1", "lock-2"], 60, "hash")
+
+    # Pipelines of Redis Cluster clients do not load scripts, which does not mean the execution slot is lost.
+    renewer._lost(
+        client,
+        [("key-1", "lock-1", 60, "hash"), ("key-1", "lock-2", 60, "hash")],
+        [redis.exceptions.NoScriptError("NOSCRIPT"), 0],
+    )
+
+    assert list(renewer._slots) == [(client, "key-1", "lock-1")]
+
+
+def test_limit_max_connections(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    evalsha = client.evalsha
+    attempts = []
+
+    # Clients without a blocking connection pool raise while all of their connections are in use.
+    def _evalsha(*args):
+        attempts.append(args)
+        if len(attempts) <= 2:
+            raise redis.exceptions.MaxConnectionsError()
+
+        return evalsha(*args)
+
+    mocker.patch.object(client, "evalsha", side_effect=_evalsha)
+
+    redis_configuration = concurrency_limit.RedisConfiguration()
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=2, limit_timeout=1, limit_interval=0.01
+    )
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+
+    assert len(attempts) > 2
+
+    mocker.patch.object(
+        client, "evalsha", side_effect=redis.exceptions.MaxConnectionsError()
+    )
+    mocker.patch.object(
+        client, "blpop", side_effect=redis.exceptions.MaxConnectionsError()
+    )
+
+    with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+        with concurrency_limit.limit(
+            redis_configuration,
+            dataclasses.replace(
+                limit_configuration, limit_timeout=0.1, limit_notify=True
+            ),
+        ):
+            pass
+
+
+def test_limit_circuit_breaker(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    mocker.patch("concurrency_limit._circuit.get_redis", return_value=client)
+    evalsha = mocker.patch.object(
+        client, "evalsha", side_effect=redis.exceptions.ConnectionError()
+    )
+    mocker.patch.object(client, "hdel", side_effect=redis.exceptions.ConnectionError())
+
+    redis_configuration = concurrency_limit.RedisConfiguration(
+        circuit_breaker=concurrency_limit.CircuitBreaker(
+            failure_threshold=2, reset_timeout=0.2, expected_nodes=2
+        )
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=4, limit_timeout=0
+    )
+
+    # The failed acquisition is raised, and with the failed release the circuit opens and falls back to the local
+    # limit.
+    with pytest.raises(redis.exceptions.ConnectionError):
+        with concurrency_limit.limit(redis_configuration, limit_configuration):
+            pass
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+
+        with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+            assert count == 2
+
+            # The local limit is the limit divided by the expected nodes.
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                with concurrency_limit.limit(redis_configuration, limit_configuration):
+                    pass
+
+    assert evalsha.call_count == 1
+
+    # The probe closes the circuit once Redis responds again.
+    mocker.stopall()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    time.sleep(0.5)
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+        assert client.hlen("key-1") == 1
+
+
+def test_limit_circuit_breaker_prefetch(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    mocker.patch("concurrency_limit._circuit.get_redis", return_value=client)
+
+    redis_configuration = concurrency_limit.RedisConfiguration(
+        circuit_breaker=concurrency_limit.CircuitBreaker(
+            failure_threshold=1, reset_timeout=0.3
+        )
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=10, limit_timeout=0, limit_prefetch=3
+    )
+    circuit = get_circuit(redis_configuration)
+    evalsha = mocker.spy(client, "evalsha")
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+
+        # The circuit opens while the scope holds a reserved execution slot.
+        circuit.record(0.0, failed=True)
+
+    assert circuit.is_open()
+    assert get_slots(client, limit_configuration)._in_use == 0
+
+    # Once the circuit closes, the execution slot is handed out by the pool again.
+    time.sleep(0.5)
+    assert not circuit.is_open()
+
+    with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+        assert count == 1
+
+    assert evalsha.call_count == 1
+    assert client.hlen("key-1") == 3
+
+
+def test_limit_circuit_breaker_fail(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+    mocker.patch("concurrency_limit._circuit.get_redis", return_value=client)
+    mocker.patch.object(client, "ping", side_effect=redis.exceptions.ConnectionError())
+    mocker.patch.object(
+        client, "evalsha", side_effect=redis.exceptions.ConnectionError()
+    )
+
+    redis_configuration = concurrency_limit.RedisConfiguration(
+        circuit_breaker=concurrency_limit.CircuitBreaker(
+            failure_threshold=1, reset_timeout=0.1, fallback="fail"
+        )
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(key="key-1", limit=1)
+
+    for _ in range(3):
+        with pytest.raises(concurrency_limit.ConcurrencyLimitUnavailableException):
+            with concurrency_limit.limit(redis_configuration, limit_configuration):
+                pass
+
+    # Failing probes keep the circuit open.
+    time.sleep(0.3)
+
+    with pytest.raises(concurrency_limit.ConcurrencyLimitUnavailableException):
+        with concurrency_limit.limit(redis_configuration, limit_configuration):
+            pass
+
+
+def test_limit_circuit_breaker_stalled_redis():
+    # A server accepting connections without ever responding, like a stalled Redis server.
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    redis_configuration = concurrency_limit.RedisConfiguration(
+        host="127.0.0.1",
+        port=server.getsockname()[1],
+        circuit_breaker=concurrency_limit.CircuitBreaker(
+            failure_threshold=1, reset_timeout=60, call_timeout=0.1
+        ),
+    )
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0
+    )
+
+    try:
+        start = time.monotonic()
+
+        # The stalled call times out, opens the circuit and falls back to the local limit.
+        with concurrency_limit.limit(redis_configuration, limit_configuration) as count:
+            assert count == 1
+
+        assert time.monotonic() - start < 5
+    finally:
+        server.close()
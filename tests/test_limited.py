@@ -0,0 +1,264 @@
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+import pytest
+import pytest_mock
+
+import concurrency_limit
+
+from test_base import *
+
+
+def test_limited(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    counter = 0
+
+    @concurrency_limit.limited(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=2, limit_interval=0.01),
+    )
+    def _function(value: int) -> int:
+        nonlocal counter
+
+        counter += 1
+        assert 1 <= counter <= 2
+
+        time.sleep(0.01)
+        counter -= 1
+
+        return value * 2
+
+    @concurrent(threads=10)
+    def _concurrent_function():
+        assert _function(21) == 42
+
+    _concurrent_function()
+
+    assert _function.__name__ == "_function"
+    assert client.hlen("key-1") == 0
+
+
+def test_limited_async(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    counter = 0
+
+    @concurrency_limit.limited(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=2, limit_interval=0.01),
+    )
+    async def _function(value: int) -> int:
+        nonlocal counter
+
+        counter += 1
+        assert 1 <= counter <= 2
+
+        await asyncio.sleep(0.01)
+        counter -= 1
+
+        return value * 2
+
+    async def _main():
+        return await asyncio.gather(*(_function(value) for value in range(10)))
+
+    assert asyncio.run(_main()) == [value * 2 for value in range(10)]
+    assert client.client.hlen("key-1") == 0
+
+
+def test_limited_executor(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    counter = 0
+    lock = threading.Lock()
+
+    def _function(value: int) -> int:
+        nonlocal counter
+
+        with lock:
+            counter += 1
+            assert 1 <= counter <= 3
+
+        time.sleep(0.01)
+
+        with lock:
+            counter -= 1
+
+        if value == 13:
+            raise ValueError(value)
+
+        return value * 2
+
+    with concurrency_limit.LimitedExecutor(
+        futures.ThreadPoolExecutor(10),
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=3, limit_interval=0.01),
+    ) as executor:
+        submitted = [executor.submit(_function, value) for value in range(20)]
+
+    assert [future.result() for future in submitted if future.exception() is None] == [
+        value * 2 for value in range(20) if value != 13
+    ]
+    assert isinstance(submitted[13].exception(), ValueError)
+    assert client.hlen("key-1") == 0
+
+
+def test_limited_executor_shutdown_without_wait(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    def _function(value: int) -> int:
+        time.sleep(0.05)
+        return value * 2
+
+    executor = concurrency_limit.LimitedExecutor(
+        futures.ThreadPoolExecutor(4),
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=1, limit_interval=0.01),
+    )
+    submitted = [executor.submit(_function, value) for value in range(4)]
+    executor.shutdown(wait=False)
+
+    # The queued tasks are still dispatched to the wrapped pool after the shutdown.
+    assert [future.result(timeout=5) for future in submitted] == [0, 2, 4, 6]
+    assert client.hlen("key-1") == 0
+
+
+def test_limited_executor_failed_task(mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+    adapt = mocker.patch("concurrency_limit.backends.adapt")
+
+    def _function(value: int):
+        if value == 1:
+            raise ValueError(value)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_adaptive=concurrency_limit.AdaptiveLimit()
+    )
+
+    with concurrency_limit.LimitedExecutor(
+        futures.ThreadPoolExecutor(1),
+        concurrency_limit.RedisConfiguration(),
+        limit_configuration,
+    ) as executor:
+        list(futures.wait([executor.submit(_function, value) for value in range(2)]))
+
+    # The failed task is passed to the scope, so the adaptive limit is cut.
+    assert [call.args[3] for call in adapt.call_args_list] == [False, True]
+
+
+def test_limited_executor_exceeded_limit(mocker: pytest_mock.MockerFixture):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        with concurrency_limit.LimitedExecutor(
+            futures.ThreadPoolExecutor(1),
+            concurrency_limit.RedisConfiguration(),
+            limit_configuration,
+        ) as executor:
+            future = executor.submit(time.sleep, 0)
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            future.result()
+
+
+def test_bounded_map(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    counter = 0
+
+    async def _function(value: int) -> int:
+        nonlocal counter
+
+        counter += 1
+        assert 1 <= counter <= 3
+
+        await asyncio.sleep(0.01)
+        counter -= 1
+
+        return value * 2
+
+    results = asyncio.run(
+        concurrency_limit.bounded_map(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=3, limit_interval=0.01
+            ),
+            _function,
+            range(20),
+        )
+    )
+
+    assert results == [value * 2 for value in range(20)]
+    assert client.client.hlen("key-1") == 0
+
+
+def test_bounded_map_failed(mocker: pytest_mock.MockerFixture):
+    client = AsyncRedisMock()
+    mocker.patch("concurrency_limit.backends.get_async_redis", return_value=client)
+
+    started = []
+
+    async def _function(value: int):
+        started.append(value)
+
+        if value == 2:
+            raise ValueError(value)
+
+        await asyncio.sleep(1)
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            concurrency_limit.bounded_map(
+                concurrency_limit.RedisConfiguration(),
+                concurrency_limit.LimitConfiguration(
+                    key="key-1", limit=3, limit_interval=0.01
+                ),
+                _function,
+                range(20),
+            )
+        )
+
+    # The remaining items are not dispatched, and the cancelled tasks released their execution slots.
+    assert started == [0, 1, 2]
+    assert client.client.hlen("key-1") == 0
+
+
+def test_bounded_map_failed_task(mocker: pytest_mock.MockerFixture):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis", return_value=AsyncRedisMock()
+    )
+    adapt = mocker.patch("concurrency_limit.backends.async_adapt")
+
+    async def _function(value: int):
+        if value == 1:
+            raise ValueError(value)
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            concurrency_limit.bounded_map(
+                concurrency_limit.RedisConfiguration(),
+                concurrency_limit.LimitConfiguration(
+                    key="key-1",
+                    limit=1,
+                    limit_adaptive=concurrency_limit.AdaptiveLimit(),
+                ),
+                _function,
+                range(2),
+            )
+        )
+
+    assert [call.args[3] for call in adapt.call_args_list] == [False, True]
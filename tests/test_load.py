@@ -0,0 +1,89 @@
+import pathlib
+
+import pytest
+import pytest_mock
+
+import concurrency_limit
+from concurrency_limit._load import run_load
+
+from test_base import *
+
+
+def test_load_threads(mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+
+    result = run_load(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=2, limit_interval=0.001
+        ),
+        workers=4,
+        duration=0.2,
+        scope_duration=0.001,
+    )
+
+    assert result["acquires"] > 0
+    assert (result["rejections"], result["errors"]) == (0, 0)
+    assert result["acquires_per_second"] > 0
+    assert result["wait_p50"] <= result["wait_p99"] <= result["wait_max"]
+
+
+def test_load_rejections(mocker: pytest_mock.MockerFixture):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+
+    result = run_load(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=1, limit_timeout=0),
+        workers=4,
+        duration=0.2,
+        scope_duration=0.01,
+    )
+
+    assert result["acquires"] > 0
+    assert result["rejections"] > 0
+
+
+def test_load_asyncio(mocker: pytest_mock.MockerFixture):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis",
+        return_value=AsyncRedisMock(),
+    )
+
+    result = run_load(
+        concurrency_limit.RedisConfiguration(),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=2, limit_interval=0.001
+        ),
+        workers=4,
+        duration=0.2,
+        mode="asyncio",
+    )
+
+    assert result["acquires"] > 0
+    assert result["errors"] == 0
+
+
+def test_load_processes(tmp_path: pathlib.Path):
+    result = run_load(
+        concurrency_limit.LocalConfiguration(path=str(tmp_path)),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=2, limit_interval=0.001
+        ),
+        workers=3,
+        duration=0.2,
+        mode="processes",
+    )
+
+    assert result["acquires"] > 0
+    assert result["errors"] == 0
+
+
+def test_load_unknown_mode():
+    with pytest.raises(ValueError):
+        run_load(
+            concurrency_limit.LocalConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+            workers=1,
+            duration=0,
+            mode="fibers",
+        )
@@ -0,0 +1,314 @@
+import asyncio
+import multiprocessing
+import os
+import pathlib
+import time
+
+import pytest
+import pytest_mock
+
+import concurrency_limit
+from concurrency_limit._local import _RECORD, _get_start_time, _pack
+
+from test_base import *
+
+
+def _configuration(path: pathlib.Path) -> concurrency_limit.LocalConfiguration:
+    return concurrency_limit.LocalConfiguration(path=str(path))
+
+
+def _dead_pid() -> int:
+    process = multiprocessing.Process(target=time.sleep, args=(0,))
+    process.start()
+    process.join()
+
+    return process.pid
+
+
+def _process_function(path: str, counter, lock):
+    with concurrency_limit.limit(
+        concurrency_limit.LocalConfiguration(path=path),
+        concurrency_limit.LimitConfiguration(
+            key="key-1", limit=2, limit_interval=0.001
+        ),
+    ):
+        with lock:
+            counter.value += 1
+            assert counter.value <= 2
+
+        time.sleep(0.01)
+
+        with lock:
+            counter.value -= 1
+
+
+def test_local_configuration_default_path():
+    assert (
+        concurrency_limit.LocalConfiguration().get_path().endswith("concurrency-limit")
+    )
+
+
+def test_local_limit(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=2, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration) as count_1:
+        with concurrency_limit.limit(configuration, limit_configuration) as count_2:
+            assert (count_1, count_2) == (1, 2)
+
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                with concurrency_limit.limit(configuration, limit_configuration):
+                    pass
+
+    with concurrency_limit.limit(configuration, limit_configuration) as count:
+        assert count == 1
+
+
+def test_local_limit_weight(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+
+    with concurrency_limit.limit(
+        configuration,
+        concurrency_limit.LimitConfiguration(key="key-1", limit=3, limit_weight=2),
+    ) as count:
+        assert count == 2
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                configuration,
+                concurrency_limit.LimitConfiguration(
+                    key="key-1", limit=3, limit_weight=2, limit_timeout=0
+                ),
+            ):
+                pass
+
+
+def test_local_limit_high_load(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    counter = 0
+
+    @concurrent(threads=20)
+    def _concurrent_function():
+        nonlocal counter
+
+        with concurrency_limit.limit(
+            configuration,
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=3, limit_interval=0.001
+            ),
+        ):
+            counter += 1
+            assert counter <= 3
+
+            time.sleep(0.01)
+            counter -= 1
+
+    _concurrent_function()
+
+    assert counter == 0
+
+
+def test_local_limit_processes(tmp_path: pathlib.Path):
+    context = multiprocessing.get_context("fork")
+    counter = context.Value("i", 0, lock=False)
+    lock = context.Lock()
+
+    processes = [
+        context.Process(target=_process_function, args=(str(tmp_path), counter, lock))
+        for _ in range(6)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 6
+    assert counter.value == 0
+
+
+def test_local_limit_prunes_dead_processes(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration):
+        pass
+
+    (tmp_path / "key-1.slots").write_bytes(_pack([(_dead_pid(), 0, "lock-1")]))
+
+    with concurrency_limit.limit(configuration, limit_configuration) as count:
+        assert count == 1
+
+
+def test_local_limit_prunes_reused_pids(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration):
+        pass
+
+    # The holder terminated, and this process started later using the same PID.
+    pid = os.getpid()
+    (tmp_path / "key-1.slots").write_bytes(
+        _pack([(pid, _get_start_time(pid) - 1, "lock-1")])
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration) as count:
+        assert count == 1
+
+
+def test_local_limit_prunes_lazily(
+    tmp_path: pathlib.Path, mocker: pytest_mock.MockerFixture
+):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=3, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration):
+        pass
+
+    parent = os.getppid()
+    (tmp_path / "key-1.slots").write_bytes(
+        _pack([(parent, _get_start_time(parent), "lock-1")])
+    )
+    get_start_time = mocker.patch(
+        "concurrency_limit._local._get_start_time", wraps=_get_start_time
+    )
+
+    # The holders are not checked while the limit is not exceeded.
+    with concurrency_limit.limit(configuration, limit_configuration) as count:
+        assert count == 2
+
+        with concurrency_limit.limit(configuration, limit_configuration) as count:
+            assert count == 3
+            assert get_start_time.call_count == 0
+
+            # Once the limit is reached, the other process is checked, but not the current one.
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                with concurrency_limit.limit(configuration, limit_configuration):
+                    pass
+
+            get_start_time.assert_called_once_with(parent)
+
+
+def test_local_limit_keeps_processes_of_other_users(
+    tmp_path: pathlib.Path, mocker: pytest_mock.MockerFixture
+):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration):
+        pass
+
+    (tmp_path / "key-1.slots").write_bytes(_pack([(1, 0, "lock-1")]))
+    mocker.patch("os.kill", side_effect=PermissionError())
+
+    with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+        with concurrency_limit.limit(configuration, limit_configuration):
+            pass
+
+
+def test_local_limit_ignores_truncated_records(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=2, limit_timeout=0
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration):
+        pass
+
+    # A process crashed after writing a single record, but before truncating the records written before.
+    pid = os.getpid()
+    (tmp_path / "key-1.slots").write_bytes(
+        _pack([(pid, 0, "lock-1")])
+        + _pack([(pid, 0, "lock-2"), (pid, 0, "lock-3")])[-_RECORD.size :]
+    )
+
+    with concurrency_limit.limit(configuration, limit_configuration) as count:
+        assert count == 2
+
+
+def test_local_alimit(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    counter = 0
+
+    async def _task():
+        nonlocal counter
+
+        async with concurrency_limit.alimit(
+            configuration,
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=2, limit_interval=0.001
+            ),
+        ):
+            counter += 1
+            assert counter <= 2
+
+            await asyncio.sleep(0.01)
+            counter -= 1
+
+    async def _main():
+        await asyncio.gather(*(_task() for _ in range(10)))
+
+    asyncio.run(_main())
+
+    assert counter == 0
+
+
+def test_local_limit_clean(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+    limit_configuration = concurrency_limit.LimitConfiguration(key="key-1", limit=3)
+
+    with concurrency_limit.limit(configuration, limit_configuration):
+        (tmp_path / "key-1.slots").write_bytes(
+            _pack([(_dead_pid(), 0, "lock-1"), (os.getpid(), 0, "lock-2")])
+        )
+
+        assert concurrency_limit.limit_clean(configuration, limit_configuration) == 1
+        assert concurrency_limit.limit_clean(configuration, limit_configuration) == 0
+
+
+def test_local_limit_iter(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+
+    assert list(concurrency_limit.limit_iter(_configuration(tmp_path / "x"), "*")) == []
+
+    for key in ["key-1", "key/2", "other", ".."]:
+        with concurrency_limit.limit(
+            configuration, concurrency_limit.LimitConfiguration(key=key, limit=1)
+        ):
+            pass
+
+    (tmp_path / "unrelated").touch()
+
+    assert sorted(concurrency_limit.limit_iter(configuration, "key*")) == [
+        "key-1",
+        "key/2",
+    ]
+    assert len(list(concurrency_limit.limit_iter(configuration, "*"))) == 4
+
+
+def test_local_limit_stats(tmp_path: pathlib.Path):
+    configuration = _configuration(tmp_path)
+
+    with concurrency_limit.limit(
+        configuration, concurrency_limit.LimitConfiguration(key="key-1", limit=3)
+    ):
+        (tmp_path / "key-2.slots").write_bytes(
+            _pack([(_dead_pid(), 0, "lock-1"), (os.getpid(), 0, "lock-2")])
+        )
+
+        assert sorted(
+            concurrency_limit.limit_stats(configuration, "*"), key=lambda item: item.key
+        ) == [
+            concurrency_limit.LimitStats(key="key-1", count=1, stale=0),
+            concurrency_limit.LimitStats(key="key-2", count=1, stale=1),
+        ]
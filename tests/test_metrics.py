@@ -0,0 +1,227 @@
+import asyncio
+
+import pytest
+import pytest_mock
+import redis
+
+import concurrency_limit
+
+from test_base import *
+
+
+@pytest.fixture
+def aggregator():
+    aggregator = concurrency_limit.MetricsAggregator()
+    concurrency_limit.add_observer(aggregator)
+
+    yield aggregator
+
+    concurrency_limit.remove_observer(aggregator)
+
+
+def test_metrics_acquired_released(
+    mocker: pytest_mock.MockerFixture, aggregator: concurrency_limit.MetricsAggregator
+):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+
+    for _ in range(3):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ):
+            pass
+
+    metrics = aggregator.snapshot()["key-1"]
+    assert (metrics.started, metrics.acquired, metrics.released) == (3, 3, 3)
+    assert (metrics.rejected, metrics.errors, metrics.attempts) == (0, 0, 3)
+    assert metrics.redis_commands == 3
+    assert metrics.wait_time.count == 3
+    assert metrics.hold_time.count == 3
+    assert metrics.hold_time.cumulative()[-1] == (float("inf"), 3)
+
+
+def test_metrics_rejected(
+    mocker: pytest_mock.MockerFixture, aggregator: concurrency_limit.MetricsAggregator
+):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0.05, limit_interval=0.01
+    )
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                pass
+
+    metrics = aggregator.snapshot()["key-1"]
+    assert (metrics.started, metrics.acquired, metrics.released) == (2, 1, 1)
+    assert (metrics.rejected, metrics.errors) == (1, 0)
+    assert metrics.attempts > 2
+    assert metrics.redis_commands == metrics.attempts
+
+
+def test_metrics_redis_commands(
+    mocker: pytest_mock.MockerFixture, aggregator: concurrency_limit.MetricsAggregator
+):
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=RedisMock())
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0.05, limit_notify=True
+    )
+
+    # The rejected scope sends an acquire script per attempt, and waits for a notification between the attempts.
+    with concurrency_limit.limit(
+        concurrency_limit.RedisConfiguration(), limit_configuration
+    ):
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                concurrency_limit.RedisConfiguration(), limit_configuration
+            ):
+                pass
+
+    metrics = aggregator.snapshot()["key-1"]
+    rejected_attempts = metrics.attempts - 1
+    assert metrics.redis_commands == 1 + rejected_attempts + (rejected_attempts - 1)
+
+    # Execution slots reserved by the process cost no Redis command.
+    aggregator.reset()
+
+    for _ in range(3):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(
+                key="key-2", limit=10, limit_prefetch=5
+            ),
+        ):
+            pass
+
+    metrics = aggregator.snapshot()["key-2"]
+    assert (metrics.attempts, metrics.redis_commands) == (3, 1)
+
+
+def test_metrics_errors(
+    mocker: pytest_mock.MockerFixture, aggregator: concurrency_limit.MetricsAggregator
+):
+    client = RedisMock()
+    mocker.patch("concurrency_limit.backends.get_redis", return_value=client)
+
+    # Exceptions of the scoped block are not counted as errors.
+    with pytest.raises(ValueError):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ):
+            raise ValueError()
+
+    mocker.patch.object(client, "evalsha", side_effect=redis.ConnectionError())
+
+    with pytest.raises(redis.ConnectionError):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ):
+            pass
+
+    metrics = aggregator.snapshot()["key-1"]
+    assert (metrics.started, metrics.acquired, metrics.released) == (2, 1, 1)
+    assert metrics.errors == 1
+
+    # Redis errors are reported to `on_error` as the exceptions of the client.
+    on_error = mocker.spy(aggregator, "on_error")
+
+    with pytest.raises(redis.ConnectionError):
+        with concurrency_limit.limit(
+            concurrency_limit.RedisConfiguration(),
+            concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+        ):
+            pass
+
+    assert isinstance(on_error.call_args.args[1], redis.RedisError)
+
+
+def test_metrics_alimit_all(
+    mocker: pytest_mock.MockerFixture, aggregator: concurrency_limit.MetricsAggregator
+):
+    mocker.patch(
+        "concurrency_limit.backends.get_async_redis",
+        return_value=AsyncRedisMock(),
+    )
+
+    async def _function():
+        async with concurrency_limit.alimit_all(
+            concurrency_limit.RedisConfiguration(),
+            [
+                concurrency_limit.LimitConfiguration(key="{key}:1", limit=1),
+                concurrency_limit.LimitConfiguration(key="{key}:2", limit=1),
+            ],
+        ):
+            pass
+
+    asyncio.run(_function())
+
+    metrics = aggregator.snapshot()
+    assert sorted(metrics) == ["{key}:1", "{key}:2"]
+    assert all(item.released == 1 for item in metrics.values())
+
+
+def test_metrics_export(mocker: pytest_mock.MockerFixture):
+    aggregator = concurrency_limit.MetricsAggregator(buckets=[0.1, 1.0])
+    limit_configurations = [concurrency_limit.LimitConfiguration(key='key"1', limit=1)]
+
+    aggregator.on_acquire_start(limit_configurations)
+    aggregator.on_acquired(limit_configurations, 0.5, 2, 3)
+    aggregator.on_released(limit_configurations, 2.0)
+
+    callback = mocker.Mock()
+    aggregator.collect(callback, prefix="app")
+    callback.assert_any_call("app_acquired_total", 1, {"key": 'key"1'})
+    callback.assert_any_call(
+        "app_wait_seconds_bucket", 1, {"key": 'key"1', "le": "1.0"}
+    )
+
+    lines = aggregator.to_prometheus().splitlines()
+    assert lines[:3] == [
+        "# HELP concurrency_limit_started_total Scopes that started to acquire execution slots.",
+        "# TYPE concurrency_limit_started_total counter",
+        'concurrency_limit_started_total{key="key\\"1"} 1',
+    ]
+    assert "# TYPE concurrency_limit_wait_seconds histogram" in lines
+    assert 'concurrency_limit_attempts_total{key="key\\"1"} 2' in lines
+    assert 'concurrency_limit_redis_commands_total{key="key\\"1"} 3' in lines
+    assert 'concurrency_limit_wait_seconds_bucket{key="key\\"1",le="0.1"} 0' in lines
+    assert 'concurrency_limit_hold_seconds_bucket{key="key\\"1",le="+Inf"} 1' in lines
+    assert 'concurrency_limit_hold_seconds_sum{key="key\\"1"} 2.0' in lines
+
+    aggregator.reset()
+    assert aggregator.snapshot() == {}
+
+
+def test_metrics_export_families():
+    aggregator = concurrency_limit.MetricsAggregator()
+
+    for key in ("key-1", "key-2"):
+        limit_configurations = [concurrency_limit.LimitConfiguration(key=key, limit=1)]
+        aggregator.on_acquired(limit_configurations, 0.5, 1)
+
+    lines = aggregator.to_prometheus().splitlines()
+
+    # The samples of both keys are grouped below a single `# TYPE` line per metric family.
+    assert lines.count("# TYPE concurrency_limit_acquired_total counter") == 1
+    index = lines.index("# TYPE concurrency_limit_acquired_total counter")
+    assert lines[index + 1 : index + 3] == [
+        'concurrency_limit_acquired_total{key="key-1"} 1',
+        'concurrency_limit_acquired_total{key="key-2"} 1',
+    ]
+
+
+def test_metrics_remove_observer():
+    aggregator = concurrency_limit.MetricsAggregator()
+
+    concurrency_limit.add_observer(aggregator)
+    assert concurrency_limit.get_observer().observers == (aggregator,)
+
+    concurrency_limit.remove_observer(aggregator)
+    assert type(concurrency_limit.get_observer()) is concurrency_limit.Observer
@@ -0,0 +1,260 @@
+import asyncio
+import time
+
+import pytest
+
+import concurrency_limit
+from concurrency_limit._adaptive import adapt
+from concurrency_limit._renewal import SlotRenewer
+
+# The tests of this module run the Lua scripts on an in-memory Redis server, unlike the `RedisMock` of the others.
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.mark.parametrize("storage", ["hash", "zset"])
+def test_acquire_release(client, storage: str):
+    backend = concurrency_limit.RedisBackend(client)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=2, limit_timeout=0, limit_storage=storage
+    )
+
+    with concurrency_limit.limit(backend, limit_configuration) as count:
+        assert count == 1
+
+        with concurrency_limit.limit(backend, limit_configuration) as count:
+            assert count == 2
+
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                with concurrency_limit.limit(backend, limit_configuration):
+                    pass
+
+        assert client.type("key-1") == storage
+        assert client.ttl("key-1") > 0
+
+    assert not client.exists("key-1")
+
+
+@pytest.mark.parametrize("storage", ["hash", "zset"])
+def test_acquire_prunes_expired_slots(client, storage: str):
+    backend = concurrency_limit.RedisBackend(client)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0, limit_storage=storage
+    )
+
+    if storage == "zset":
+        client.zadd("key-1", {"expired-1": int(time.time()) - 10})
+    else:
+        client.hset("key-1", "expired-1", int(time.time()) - 10)
+
+    with concurrency_limit.limit(backend, limit_configuration) as count:
+        assert count == 1
+
+
+def test_acquire_replaces_other_types(client):
+    client.set("key-1", "value")
+
+    with concurrency_limit.limit(
+        concurrency_limit.RedisBackend(client),
+        concurrency_limit.LimitConfiguration(key="key-1", limit=1),
+    ) as count:
+        assert count == 1
+        assert client.type("key-1") == "hash"
+
+
+def test_acquire_weight(client):
+    backend = concurrency_limit.RedisBackend(client)
+
+    with concurrency_limit.limit(
+        backend,
+        concurrency_limit.LimitConfiguration(key="key-1", limit=3, limit_weight=2),
+    ) as count:
+        assert count == 2
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(
+                backend,
+                concurrency_limit.LimitConfiguration(
+                    key="key-1", limit=3, limit_weight=2, limit_timeout=0
+                ),
+            ):
+                pass
+
+        assert client.hlen("key-1") == 2
+
+
+def test_acquire_all(client):
+    backend = concurrency_limit.RedisBackend(client)
+    limit_configurations = [
+        concurrency_limit.LimitConfiguration(key="{key}-1", limit=1, limit_timeout=0),
+        concurrency_limit.LimitConfiguration(key="{key}-2", limit=2, limit_timeout=0),
+    ]
+
+    with concurrency_limit.limit_all(backend, limit_configurations) as counts:
+        assert counts == (1, 1)
+
+        # The first key is saturated, so no execution slot is acquired on the second key either.
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit_all(backend, limit_configurations):
+                pass
+
+        assert client.hlen("{key}-2") == 1
+
+    assert not client.exists("{key}-1", "{key}-2")
+
+
+def test_acquire_fair(client):
+    backend = concurrency_limit.RedisBackend(client)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0, limit_fair=True
+    )
+
+    with concurrency_limit.limit(backend, limit_configuration) as count:
+        assert count == 1
+
+        with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+            with concurrency_limit.limit(backend, limit_configuration):
+                pass
+
+    # The tickets of the rejected scope were removed from the queue.
+    assert client.zcard(limit_configuration.get_queue_key()) == 0
+
+    with concurrency_limit.limit(backend, limit_configuration) as count:
+        assert count == 1
+
+
+def test_release_notify(client):
+    backend = concurrency_limit.RedisBackend(client)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=2, limit_notify=True
+    )
+
+    with concurrency_limit.limit(backend, limit_configuration):
+        pass
+
+    assert client.hlen("key-1") == 0
+    assert client.llen(limit_configuration.get_notify_key()) == 1
+
+
+@pytest.mark.parametrize("storage", ["hash", "zset"])
+def test_renew(client, storage: str):
+    backend = concurrency_limit.RedisBackend(client)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=2, limit_expire=10, limit_storage=storage
+    )
+
+    with concurrency_limit.limit(backend, limit_configuration):
+        if storage == "zset":
+            (lock_id, lock_expire), *_ = client.zrange("key-1", 0, -1, withscores=True)
+        else:
+            ((lock_id, lock_expire),) = client.hgetall("key-1").items()
+
+        SlotRenewer()._renew(
+            client,
+            [("key-1", lock_id, 60, storage), ("key-1", "released-1", 60, storage)],
+        )
+
+        if storage == "zset":
+            assert client.zscore("key-1", lock_id) > float(lock_expire) + 40
+            assert client.zcard("key-1") == 1
+        else:
+            assert int(client.hget("key-1", lock_id)) > int(lock_expire) + 40
+            assert client.hlen("key-1") == 1
+
+
+@pytest.mark.parametrize("storage", ["hash", "zset"])
+def test_clean_and_stats(client, storage: str):
+    backend = concurrency_limit.RedisBackend(client)
+    current = int(time.time())
+
+    for key in ("key-1", "key-2"):
+        if storage == "zset":
+            client.zadd(key, {"expired-1": current - 10, "valid-1": current + 60})
+        else:
+            client.hset(
+                key, mapping={"expired-1": current - 10, "valid-1": current + 60}
+            )
+
+    assert sorted(
+        (stats.key, stats.count, stats.stale, stats.oldest_expire)
+        for stats in concurrency_limit.limit_stats(backend, "key-*")
+    ) == [("key-1", 1, 1, current + 60), ("key-2", 1, 1, current + 60)]
+
+    assert (
+        concurrency_limit.limit_clean(
+            backend,
+            concurrency_limit.LimitConfiguration(
+                key="key-1", limit=1, limit_storage=storage
+            ),
+        )
+        == 1
+    )
+    assert concurrency_limit.limit_clean_many(backend, ["key-2"], storage) == {
+        "key-2": 1
+    }
+    assert [
+        stats.stale for stats in concurrency_limit.limit_stats(backend, "key-*")
+    ] == [0, 0]
+
+
+def test_adapt(client):
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1",
+        limit=10,
+        limit_adaptive=concurrency_limit.AdaptiveLimit(min_limit=2, max_limit=20),
+    )
+
+    adapt(client, limit_configuration, 0.1, failed=True)
+    assert float(client.hget(limit_configuration.get_adaptive_key(), "limit")) == 5
+
+    adapt(client, limit_configuration, 0.1, failed=False)
+    assert float(client.hget(limit_configuration.get_adaptive_key(), "limit")) == 5.2
+
+
+def test_adapt_rejected_refresh():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1",
+        limit=4,
+        limit_adaptive=concurrency_limit.AdaptiveLimit(min_limit=1),
+    )
+    slots = concurrency_limit.RedisBackend(client).get_slots(limit_configuration)
+
+    assert slots.acquire(["slot-1", "slot-2", "slot-3", "slot-4"])[0] == 4
+
+    # Another process cuts the limit, which the rejected scopes of this process read.
+    adapt(fakeredis.FakeRedis(server=server), limit_configuration, 0.1, failed=True)
+
+    assert slots.acquire(["slot-5"])[0] == 0
+    assert slots.limit_configuration.limit == 2
+
+    slots.release("slot-1", "slot-2", "slot-3")
+
+    assert slots.acquire(["slot-5"])[0] == 2
+    assert slots.acquire(["slot-6"])[0] == 0
+
+
+def test_async_acquire_release():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    backend = concurrency_limit.AsyncRedisBackend(client)
+    limit_configuration = concurrency_limit.LimitConfiguration(
+        key="key-1", limit=1, limit_timeout=0
+    )
+
+    async def _main():
+        async with concurrency_limit.alimit(backend, limit_configuration) as count:
+            assert count == 1
+
+            with pytest.raises(concurrency_limit.ConcurrencyLimitExceededException):
+                async with concurrency_limit.alimit(backend, limit_configuration):
+                    pass
+
+        assert not await client.exists("key-1")
+
+    asyncio.run(_main())